@@ -4,87 +4,283 @@ US Visa Appointment Scheduler - Main Entry Point
 
 import sys
 import time
+import uuid
+from typing import Dict, Optional
 from src.config import Config
-from src.utils import setup_logger, get_random_wait_time, setup_driver
-from src.auth import full_authentication
-from src.appointment_checker import check_target_month_appointments
+from src.utils import setup_logger, get_random_wait_time, setup_driver, timed, watch_driver
+from src.logs import log_context
+from src.tracing import trace_check
+from src.profiler import profile_check
+from src.metrics import MetricsServer, record_check, set_next_check, registry as metrics_registry
 from src.notifier import NotificationManager
+from src.history import HistoryStore
+from src.changes import AvailabilityTracker
+from src.polling import AdaptivePollingScheduler
+from src.session import AuthDurationEstimator, KeepaliveSession, sleep_until
+from src.resources import BrowserResourceMonitor
+from src.supervisor import StepSupervisor, abandoned, hung_step
+from src.pool import DriverPool
 
 # Initialize logger
 logger = setup_logger()
 
 
-def check_appointments_once() -> bool:
+def check_appointments_once(history: Optional[HistoryStore] = None,
+                            tracker: Optional[AvailabilityTracker] = None,
+                            notifier: Optional[NotificationManager] = None,
+                            check_at: Optional[float] = None,
+                            estimator: Optional[AuthDurationEstimator] = None,
+                            keepalive: Optional[KeepaliveSession] = None,
+                            pool: Optional[DriverPool] = None) -> bool:
     """
     Perform one complete check for appointments.
     
+    Args:
+        history: Store the outcome of the check is recorded in, if any
+        tracker: Change detector; when given, only newly opened slots are notified
+        notifier: Long-lived notification manager whose connections are reused
+        check_at: Unix time the calendar should be read at; the browser is
+            prepared first and then waits for it
+        estimator: Learns how long preparing the browser session takes
+        keepalive: Holds a logged-in browser across checks; when it has one,
+            the check only reloads the calendar
+        pool: Hands out a pre-started browser instead of launching one
+    
     Returns:
         True if check completed successfully, False otherwise
     """
+    # The browser automation stack (selenium, OCR, captcha solvers) loads on the first check
+    from src.auth import full_authentication
+    from src.appointment_checker import check_target_month_appointments
+    from src.booking import book_earliest_appointment
+    
     driver = None
+    check_id = uuid.uuid4().hex[:12]
+    started = time.perf_counter()
+    steps: Dict[str, float] = {}
+    success = False
+    message = ""
+    appointments = []
     
-    try:
-        logger.info("Initializing Chrome WebDriver...")
-        driver = setup_driver()
-        
-        # Step 1: Authenticate
-        logger.info("Step 1/3: Authenticating...")
-        if not full_authentication(driver):
-            logger.error("Authentication failed")
-            return False
-        
-        logger.info("Authentication successful!")
-        time.sleep(2)
-        
-        # Step 2: Check appointments
-        logger.info("Step 2/3: Checking appointments...")
-        result = check_target_month_appointments(driver)
-        
-        if not result["success"]:
-            logger.error(f"Appointment check failed: {result['message']}")
+    with log_context(check_id=check_id), trace_check(check_id), profile_check(check_id):
+        try:
+            result = None
+            
+            # Reuse the kept browser: a single calendar reload instead of login and navigation
+            if keepalive and keepalive.driver:
+                logger.info("Step 2/3: Refreshing calendar in the kept session...")
+                driver = keepalive.driver
+                watch_driver(driver)
+                with timed(steps, "calendar_refresh"):
+                    result = check_target_month_appointments(driver, refresh_only=True)
+                
+                if not result["success"]:
+                    logger.warning(f"Kept session unusable ({result['message']}), logging in again")
+                    keepalive.close()
+                    driver = None
+                    result = None
+            
+            if result is None:
+                logger.info("Initializing Chrome WebDriver...")
+                with timed(steps, "driver_setup"):
+                    driver = pool.acquire() if pool else setup_driver()
+                
+                # Step 1: Authenticate
+                logger.info("Step 1/3: Authenticating...")
+                with timed(steps, "authentication"):
+                    authenticated = full_authentication(driver)
+                if not authenticated:
+                    message = "Authentication failed"
+                    logger.error(message)
+                    return False
+                
+                logger.info("Authentication successful!")
+                time.sleep(2)
+                
+                if estimator:
+                    estimator.update(steps["driver_setup"] + steps["authentication"])
+                
+                # Hold the ready session until the planned check time
+                if check_at:
+                    early = sleep_until(check_at)
+                    steps["start_delay"] = round(max(time.time() - check_at, 0.0), 3)
+                    if early:
+                        logger.info(f"Session ready {early:.0f}s early, read calendar at the planned time")
+                    else:
+                        logger.warning(f"Session ready {steps['start_delay']:.0f}s after the planned check time")
+                
+                # Step 2: Check appointments
+                logger.info("Step 2/3: Checking appointments...")
+                with timed(steps, "calendar_check"):
+                    result = check_target_month_appointments(driver)
+                
+                # Park the browser on the calendar page for the next check
+                if keepalive and result["success"] and not abandoned():
+                    keepalive.adopt(driver)
+            
+            message = result["message"]
+            
+            # A check given up on by the supervisor must not touch state shared with the next check
+            if abandoned():
+                message = "Finished after the supervisor abandoned the check, results discarded"
+                logger.warning(message)
+                return False
+            
+            if not result["success"]:
+                logger.error(f"Appointment check failed: {result['message']}")
+                return False
+            
+            appointments = result["appointments"]
+            
+            # Step 3: Handle results
+            logger.info("Step 3/3: Processing results...")
+            
+            booking = None
+            if result["appointments_found"]:
+                logger.info("🎉 " + "=" * 56 + " 🎉")
+                logger.info("🎉 APPOINTMENTS AVAILABLE! 🎉")
+                logger.info("🎉 " + "=" * 56 + " 🎉")
+                
+                # Try to book right away, before anything else can take the slot
+                if Config.AUTO_BOOK:
+                    logger.info("Auto-booking enabled, booking earliest acceptable slot...")
+                    with timed(steps, "booking"):
+                        booking = book_earliest_appointment(driver, result["appointments"], result["elements"])
+                
+                logger.info(f"Found {len(result['appointments'])} available appointment(s)")
+            else:
+                logger.info("No appointments available at this time")
+            
+            # Send notifications, only for changes when a tracker is in use
+            if tracker is None:
+                if result["appointments_found"]:
+                    with timed(steps, "notification"):
+                        notifier = notifier or NotificationManager()
+                        notifier.notify_within(Config.NOTIFY_DEADLINE, notifier.notify_appointments_found,
+                                               result["appointments"], booking)
+            else:
+                change = tracker.update(Config.CONSULAR_POST, Config.TARGET_YEAR, Config.TARGET_MONTH, appointments)
+                booked = bool(booking and booking["success"] and not booking["dry_run"])
+                
+                if change:
+                    logger.info(f"Availability changed: {len(change.added)} opened, {len(change.removed)} closed")
+                    with timed(steps, "notification"):
+                        notifier = notifier or NotificationManager()
+                        notifier.notify_within(Config.NOTIFY_DEADLINE, notifier.notify_availability_changed,
+                                               change, booking)
+                elif booked:
+                    logger.info(f"Availability unchanged but an appointment was booked: {booking['message']}")
+                    with timed(steps, "notification"):
+                        notifier = notifier or NotificationManager()
+                        notifier.notify_within(Config.NOTIFY_DEADLINE, notifier.notify_booking, booking)
+                elif result["appointments_found"]:
+                    logger.info("No newly opened slots since the last check, not notifying")
+            
+            success = True
+            return True
+            
+        except Exception as e:
+            step = hung_step()
+            message = f"Step '{step}' hung, browser killed" if step else f"Error: {e}"
+            logger.error(f"Error during check: {e}", exc_info=not step)
             return False
-        
-        # Step 3: Handle results
-        logger.info("Step 3/3: Processing results...")
-        
-        if result["appointments_found"]:
-            logger.info("🎉 " + "=" * 56 + " 🎉")
-            logger.info("🎉 APPOINTMENTS AVAILABLE! 🎉")
-            logger.info("🎉 " + "=" * 56 + " 🎉")
             
-            # Send notifications
-            notifier = NotificationManager()
-            notifier.notify_appointments_found(result["appointments"])
+        finally:
+            # Keep the browser of a successful check in keepalive mode, otherwise clean it up
+            if keepalive and driver is not None and driver is keepalive.driver:
+                if not success:
+                    keepalive.close()
+            elif driver:
+                try:
+                    logger.info("Closing browser...")
+                    with timed(steps, "driver_quit"):
+                        driver.quit()
+                except Exception as e:
+                    logger.error(f"Error closing driver: {e}")
             
-            logger.info(f"Found {len(result['appointments'])} available appointment(s)")
-        else:
-            logger.info("No appointments available at this time")
-        
-        return True
-        
-    except Exception as e:
-        logger.error(f"Error during check: {e}", exc_info=True)
-        return False
-        
-    finally:
-        # Always clean up the driver
-        if driver:
-            try:
-                logger.info("Closing browser...")
-                driver.quit()
-            except Exception as e:
-                logger.error(f"Error closing driver: {e}")
+            # run_check() records an abandoned check; its late finish is not recorded again
+            if not abandoned():
+                record_check("success" if success else ("hung" if hung_step() else "failure"),
+                             time.perf_counter() - started)
+            
+            if history and not abandoned():
+                try:
+                    history.record_check(
+                        check_id, Config.CONSULAR_POST, Config.TARGET_YEAR, Config.TARGET_MONTH,
+                        success, message, appointments, steps,
+                        duration=round(time.perf_counter() - started, 3),
+                    )
+                except Exception as e:
+                    logger.error(f"Error recording check history: {e}")
+
+
+def run_check(history: Optional[HistoryStore] = None,
+              tracker: Optional[AvailabilityTracker] = None,
+              notifier: Optional[NotificationManager] = None,
+              check_at: Optional[float] = None,
+              estimator: Optional[AuthDurationEstimator] = None,
+              keepalive: Optional[KeepaliveSession] = None,
+              pool: Optional[DriverPool] = None) -> bool:
+    """
+    Run one check, under the step deadline supervisor when it is enabled.
+    
+    Takes the same arguments as check_appointments_once().
+    
+    Returns:
+        True if check completed successfully, False otherwise
+    """
+    if not Config.STEP_WATCHDOG:
+        return check_appointments_once(history, tracker, notifier, check_at, estimator, keepalive, pool)
+    
+    # The wait for the planned check time does not count against the deadline
+    deadline = Config.CHECK_DEADLINE + (max(0.0, check_at - time.time()) if check_at else 0.0)
+    outcome = StepSupervisor().run(
+        check_appointments_once, history, tracker, notifier, check_at, estimator, keepalive, pool,
+        deadline=deadline,
+    )
+    
+    if outcome.hung_step:
+        logger.error(f"Check aborted after {outcome.elapsed:.0f}s: step '{outcome.hung_step}' hung")
+        if not outcome.completed:
+            record_check("hung", outcome.elapsed)
+            if keepalive:
+                keepalive.discard()
+    
+    return bool(outcome.value)
 
 
-def run_continuous_monitoring():
-    """Run the scheduler in continuous monitoring mode."""
+def run_continuous_monitoring(history: Optional[HistoryStore] = None,
+                              tracker: Optional[AvailabilityTracker] = None,
+                              notifier: Optional[NotificationManager] = None,
+                              scheduler: Optional[AdaptivePollingScheduler] = None,
+                              estimator: Optional[AuthDurationEstimator] = None,
+                              keepalive: Optional[KeepaliveSession] = None,
+                              pool: Optional[DriverPool] = None):
+    """
+    Run the scheduler in continuous monitoring mode.
+    
+    Args:
+        history: Store each check's outcome is recorded in, if any
+        tracker: Change detector so repeated slots do not re-alert every check
+        notifier: Notification manager shared by all checks
+        scheduler: Picks the wait between checks; a fixed random interval if None
+        estimator: When given, browser launch and login start this far ahead of
+            each planned check so the calendar is read on time
+        keepalive: Keeps the logged-in browser on the calendar page between checks
+        pool: Keeps browsers started ahead, refilled while the loop waits
+    """
     logger.info("Starting continuous monitoring mode...")
     logger.info(f"Target: {Config.CONSULAR_POST} - {Config.TARGET_MONTH}/{Config.TARGET_YEAR}")
-    logger.info(f"Check interval: {Config.CHECK_INTERVAL_MIN}-{Config.CHECK_INTERVAL_MAX} minutes")
+    if scheduler:
+        logger.info(f"Adaptive polling: {Config.DAILY_CHECK_BUDGET:g} checks/day, "
+                    f"{Config.MIN_CHECK_SPACING_MINUTES:g}-{Config.MAX_CHECK_SPACING_MINUTES:g} minutes apart")
+    else:
+        logger.info(f"Check interval: {Config.CHECK_INTERVAL_MIN}-{Config.CHECK_INTERVAL_MAX} minutes")
     logger.info("Press Ctrl+C to stop")
     logger.info("=" * 60)
     
     check_count = 0
+    check_at = None  # The first check runs right away
     
     while True:
         try:
@@ -95,15 +291,28 @@ def run_continuous_monitoring():
             logger.info("=" * 60)
             
             # Perform the check
-            success = check_appointments_once()
+            success = run_check(history, tracker, notifier, check_at, estimator, keepalive, pool)
+            
+            if history:
+                history.flush()
             
             if success:
                 logger.info(f"Check #{check_count} completed successfully")
             else:
                 logger.warning(f"Check #{check_count} completed with errors")
             
+            # Between checks is the safe point to recycle a browser that grew too large
+            if keepalive:
+                keepalive.check_resources()
+            
+            # Start the next check's browser while waiting, unless the kept session makes it unneeded
+            if pool and keepalive and keepalive.driver:
+                pool.pause()
+            elif pool:
+                pool.refill()
+            
             # Calculate wait time
-            wait_seconds = get_random_wait_time()
+            wait_seconds = scheduler.next_wait() if scheduler else get_random_wait_time()
             wait_minutes = wait_seconds // 60
             
             logger.info("")
@@ -112,8 +321,19 @@ def run_continuous_monitoring():
             logger.info(f"Next check will be check #{check_count + 1}")
             logger.info("=" * 60)
             
-            # Wait
-            time.sleep(wait_seconds)
+            # Wait, keeping the parked session alive or starting browser launch and
+            # login early enough to read the calendar on time
+            check_at = time.time() + wait_seconds
+            set_next_check(check_at)
+            if keepalive and keepalive.idle_until(check_at):
+                pass
+            elif estimator:
+                lead = estimator.lead_time()
+                logger.info(f"Preparing the session {lead:.0f}s before the planned check "
+                            f"at {time.strftime('%H:%M:%S', time.localtime(check_at))}")
+                sleep_until(check_at - lead)
+            else:
+                sleep_until(check_at)
             
         except KeyboardInterrupt:
             logger.info("\n" + "=" * 60)
@@ -141,25 +361,64 @@ def main():
         logger.info(f"✓ Check interval: {Config.CHECK_INTERVAL_MIN}-{Config.CHECK_INTERVAL_MAX} minutes")
         logger.info(f"✓ Browser mode: {'Headless' if Config.HEADLESS else 'Visible'}")
         
+        history = HistoryStore(Config.HISTORY_DB)
+        logger.info(f"✓ Recording check history to {Config.HISTORY_DB}")
+        
         # Ask user for mode
         print("\n" + "=" * 60)
         print("Select mode:")
         print("1. Single check (run once)")
-        print("2. Continuous monitoring (run every 50-70 minutes)")
+        print(f"2. Continuous monitoring (run every {Config.CHECK_INTERVAL_MIN}-{Config.CHECK_INTERVAL_MAX} minutes"
+              f"{', adapting to release patterns' if Config.ADAPTIVE_POLLING else ''})")
         print("=" * 60)
         
         choice = input("Enter choice (1 or 2) [default: 2]: ").strip() or "2"
         
         if choice == "1":
             logger.info("Running single check mode...")
-            success = check_appointments_once()
+            notifier = NotificationManager()
+            try:
+                success = run_check(history, notifier=notifier)
+            finally:
+                # Closing flushes the outbox so queued alerts go out before exit
+                notifier.close()
+                history.close()
             if success:
                 logger.info("Check completed successfully!")
             else:
                 logger.error("Check failed. See logs for details.")
                 sys.exit(1)
         else:
-            run_continuous_monitoring()
+            notifier = NotificationManager()
+            keepalive = KeepaliveSession(monitor=BrowserResourceMonitor()) if Config.SESSION_KEEPALIVE else None
+            pool = DriverPool() if Config.DRIVER_POOL_SIZE > 0 else None
+            metrics_server = MetricsServer() if Config.METRICS_PORT else None
+            try:
+                if pool:
+                    pool.start()
+                if metrics_server:
+                    metrics_registry.add_collector("notifier", notifier.metrics, label="channel")
+                    if keepalive and keepalive.monitor:
+                        metrics_registry.add_collector("", keepalive.monitor.metrics)
+                    if pool:
+                        metrics_registry.add_collector("", pool.metrics)
+                    metrics_server.start()
+                scheduler = AdaptivePollingScheduler(history) if Config.ADAPTIVE_POLLING else None
+                estimator = None
+                if Config.PREWARM_AUTH:
+                    estimator = AuthDurationEstimator()
+                    estimator.seed_from_history(history)
+                run_continuous_monitoring(history, AvailabilityTracker(), notifier, scheduler, estimator,
+                                          keepalive, pool)
+            finally:
+                if keepalive:
+                    keepalive.close()
+                if pool:
+                    pool.close()
+                if metrics_server:
+                    metrics_server.close()
+                notifier.close()
+                history.close()
         
     except ValueError as e:
         logger.error(f"Configuration error: {e}")
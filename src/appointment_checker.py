@@ -3,22 +3,50 @@ Appointment checking module for US Visa Scheduler.
 Handles navigation to scheduling page and checking availability.
 """
 
+import re
+import json
 import time
 import logging
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime
+from urllib.parse import urlparse
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import Select
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.webdriver.remote.webelement import WebElement
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, StaleElementReferenceException
 from src.config import Config
-from src.utils import save_screenshot
+from src.utils import save_screenshot, format_date
+from src.models import Appointment
+from src.dom import SelectorBundle
+from src.tracing import traced
 
 logger = logging.getLogger("visa_scheduler")
 
 
+# Look for date cells that are NOT disabled/grayed out
+# Available dates typically don't have 'disabled' class and are clickable
+_DATE_SELECTORS = [
+    # Look for <td> or <a> elements that don't have 'disabled' class
+    (By.XPATH, "//td[not(contains(@class, 'disabled')) and not(contains(@class, 'ui-state-disabled'))]//a"),
+    (By.XPATH, "//td[contains(@class, 'available')]//a"),
+    (By.XPATH, "//a[contains(@class, 'ui-state-default') and not(contains(@class, 'ui-state-disabled'))]"),
+    # Try finding by data attributes
+    (By.XPATH, "//td[@data-handler='selectDay' and not(contains(@class, 'disabled'))]"),
+    # Generic clickable dates
+    (By.XPATH, "//td[not(contains(@class, 'disabled'))]//a[contains(@href, '#')]"),
+]
+
+# Visible cells with a day number whose own or parent classes are not disabled
+_AVAILABLE_DATE_CONDITION = (
+    "/^\\d+$/.test(text) && !/disabled/i.test(el.className) && "
+    "!(el.parentElement && /disabled/i.test(el.parentElement.className))"
+)
+
+
+@traced("navigation")
 def navigate_to_scheduling(driver: webdriver.Chrome) -> bool:
     """
     Navigate to the appointment scheduling page.
@@ -43,8 +71,6 @@ def navigate_to_scheduling(driver: webdriver.Chrome) -> bool:
         driver.execute_script("window.scrollTo(0, document.body.scrollHeight / 2);")
         time.sleep(1)
 
-        wait = WebDriverWait(driver, 20)
-
         # Look for "Reschedule Appointment" link/button (or "Schedule Appointment" as fallback)
         schedule_selectors = [
             (By.XPATH, "//a[contains(text(), 'Reschedule Appointment')]"),
@@ -62,31 +88,37 @@ def navigate_to_scheduling(driver: webdriver.Chrome) -> bool:
             (By.XPATH, "//a[contains(text(), 'Continue')]"),
             (By.XPATH, "//button[contains(text(), 'Continue')]"),
         ]
+        schedule_bundle = SelectorBundle(schedule_selectors, clickable=True)
 
-        for by, selector in schedule_selectors:
+        # Try every matching selector in priority order until a click leaves the page
+        candidates = schedule_bundle.candidates(driver) if schedule_bundle.wait(driver, 20) else []
+        for match in candidates:
             try:
-                logger.info(f"Trying selector: {selector}")
-                schedule_button = wait.until(
-                    EC.element_to_be_clickable((by, selector))
-                )
-                logger.info(f"✓ Found button using: {selector}")
+                logger.info(f"✓ Found button using: {schedule_bundle.describe(match.index)}")
 
                 # Scroll to the button to make sure it's visible
-                driver.execute_script("arguments[0].scrollIntoView(true);", schedule_button)
+                driver.execute_script("arguments[0].scrollIntoView(true);", match.element)
                 time.sleep(1)
 
-                schedule_button.click()
+                url = driver.current_url
+                match.element.click()
                 logger.info("Clicked appointment button")
+
+                try:
+                    WebDriverWait(driver, 5).until(
+                        lambda d: d.current_url != url or EC.staleness_of(match.element)(d)
+                    )
+                except TimeoutException:
+                    logger.warning(f"Page did not change after clicking {schedule_bundle.describe(match.index)}, "
+                                   f"trying the next button")
+                    continue
                 time.sleep(3)
 
                 save_screenshot(driver, "after_clicking_appointment_button")
                 logger.info("Successfully navigated to scheduling page")
                 return True
-            except TimeoutException:
-                continue
             except Exception as e:
-                logger.debug(f"Error with selector {selector}: {e}")
-                continue
+                logger.debug(f"Error clicking {schedule_bundle.describe(match.index)}: {e}")
 
         logger.error("Could not find Schedule/Reschedule Appointment button")
         logger.info("Taking screenshot and dumping page source...")
@@ -111,6 +143,16 @@ def navigate_to_scheduling(driver: webdriver.Chrome) -> bool:
         return False
 
 
+# The consular posts dropdown; based on screenshots, it's likely a <select> element
+POST_DROPDOWN_BUNDLE = SelectorBundle([
+    (By.XPATH, "//select[contains(@class, 'consular') or contains(@id, 'consular')]"),
+    (By.XPATH, "//select"),  # Fallback to any select element
+    (By.ID, "consularPost"),
+    (By.NAME, "consularPost"),
+], displayed=False)
+
+
+@traced("post_selection")
 def select_consular_post(driver: webdriver.Chrome, post_name: str = "ISTANBUL") -> bool:
     """
     Select the consular post from the dropdown.
@@ -125,25 +167,12 @@ def select_consular_post(driver: webdriver.Chrome, post_name: str = "ISTANBUL")
     try:
         logger.info(f"Selecting consular post: {post_name}")
         
-        wait = WebDriverWait(driver, 15)
-        
-        # Look for the consular posts dropdown
-        # Based on screenshots, it's likely a <select> element
-        dropdown_selectors = [
-            (By.XPATH, "//select[contains(@class, 'consular') or contains(@id, 'consular')]"),
-            (By.XPATH, "//select"),  # Fallback to any select element
-            (By.ID, "consularPost"),
-            (By.NAME, "consularPost"),
-        ]
-        
-        for by, selector in dropdown_selectors:
+        dropdown_bundle = POST_DROPDOWN_BUNDLE
+        match = dropdown_bundle.wait(driver, 15)
+        if match:
             try:
-                dropdown_element = wait.until(
-                    EC.presence_of_element_located((by, selector))
-                )
-                
                 # Try to select using Select class
-                select = Select(dropdown_element)
+                select = Select(match.element)
                 
                 # Try different methods to select Istanbul
                 try:
@@ -167,11 +196,8 @@ def select_consular_post(driver: webdriver.Chrome, post_name: str = "ISTANBUL")
                 logger.info("Consular post selected successfully")
                 return True
                 
-            except TimeoutException:
-                continue
             except Exception as e:
-                logger.warning(f"Error with selector {selector}: {e}")
-                continue
+                logger.warning(f"Error with selector {dropdown_bundle.describe(match.index)}: {e}")
         
         logger.error("Could not find or select consular post dropdown")
         save_screenshot(driver, "consular_post_error")
@@ -183,123 +209,228 @@ def select_consular_post(driver: webdriver.Chrome, post_name: str = "ISTANBUL")
         return False
 
 
-def navigate_to_target_month(driver: webdriver.Chrome, target_month: int, target_year: int) -> bool:
+@traced("calendar_reload")
+def refresh_calendar(driver: webdriver.Chrome, timeout: int = 15) -> bool:
     """
-    Navigate the calendar to the target month and year using dropdown selectors.
+    Reload the scheduling page the browser is parked on.
 
     Args:
-        driver: Selenium WebDriver instance
-        target_month: Target month (1-12)
-        target_year: Target year
+        driver: Selenium WebDriver instance showing the calendar
+        timeout: Maximum seconds to wait for the page to come back
 
     Returns:
-        True if navigation successful, False otherwise
+        True if the calendar page is back, False if it did not load or the
+        session has expired (e.g. the reload landed on the login page)
     """
     try:
-        logger.info(f"Navigating to {target_month}/{target_year}")
+        calendar_path = urlparse(driver.current_url).path
+        driver.refresh()
+        # The dropdown bundle accepts any <select>, so also insist on still being on the scheduling page
+        if POST_DROPDOWN_BUNDLE.wait(driver, timeout) and urlparse(driver.current_url).path == calendar_path:
+            return True
+        logger.warning(f"Calendar page did not come back after reload (now at {driver.current_url})")
+        return False
+    except Exception as e:
+        logger.warning(f"Error reloading calendar page: {e}")
+        return False
 
-        wait = WebDriverWait(driver, 10)
 
-        # Month names for mapping
-        month_names = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
-                      'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-        target_month_name = month_names[target_month - 1]
+_MONTH_NAMES = ['january', 'february', 'march', 'april', 'may', 'june',
+                'july', 'august', 'september', 'october', 'november', 'december']
 
-        # Method 1: Try to find month and year dropdowns
-        try:
-            logger.info("Looking for month dropdown...")
-            # Find the month dropdown (usually a <select> element)
-            month_dropdown = None
-            month_selectors = [
-                (By.XPATH, "//select[contains(@class, 'month') or contains(@id, 'month')]"),
-                (By.XPATH, "//select[option[contains(text(), 'Jan') or contains(text(), 'Feb')]]"),
-                (By.XPATH, "//select[1]"),  # First select element
-            ]
-
-            for by, selector in month_selectors:
-                try:
-                    month_dropdown = driver.find_element(by, selector)
-                    logger.info(f"Found month dropdown with selector: {selector}")
-                    break
-                except:
-                    continue
+# Sets the calendar's month and year dropdowns and fires their change events
+# in a single round trip. The datepicker re-renders on every change, so each
+# dropdown is looked up again right before it is set.
+_MONTH_JUMP_SCRIPT = """
+var monthPrefix = arguments[0].toLowerCase(), year = String(arguments[1]);
 
-            if month_dropdown:
-                # Select the target month
-                month_select = Select(month_dropdown)
-                logger.info(f"Selecting month: {target_month_name}")
-                try:
-                    month_select.select_by_visible_text(target_month_name)
-                except:
-                    # Try with full month name
-                    full_month_names = ['January', 'February', 'March', 'April', 'May', 'June',
-                                       'July', 'August', 'September', 'October', 'November', 'December']
-                    month_select.select_by_visible_text(full_month_names[target_month - 1])
+function firstSelect(xpaths) {
+    for (var i = 0; i < xpaths.length; i++) {
+        var node = document.evaluate(xpaths[i], document, null,
+            XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+        if (node) { return node; }
+    }
+    return null;
+}
+
+var changed = false;
+
+function choose(select, matches) {
+    if (!select) { return false; }
+    for (var i = 0; i < select.options.length; i++) {
+        if (matches(select.options[i].text.trim().toLowerCase())) {
+            if (select.selectedIndex !== i) {
+                select.selectedIndex = i;
+                select.dispatchEvent(new Event('change', {bubbles: true}));
+                changed = true;
+            }
+            return true;
+        }
+    }
+    return false;
+}
 
-                logger.info(f"✓ Month set to: {target_month_name}")
-                time.sleep(1)
+var monthSet = choose(firstSelect([
+    "//select[contains(@class, 'month') or contains(@id, 'month')]",
+    "//select[option[contains(text(), 'Jan') or contains(text(), 'Feb')]]"
+]), function (text) { return text.indexOf(monthPrefix) === 0; });
 
-            # Find the year dropdown
-            logger.info("Looking for year dropdown...")
-            year_dropdown = None
-            year_selectors = [
-                (By.XPATH, "//select[contains(@class, 'year') or contains(@id, 'year')]"),
-                (By.XPATH, "//select[option[contains(text(), '202')]]"),
-                (By.XPATH, "//select[2]"),  # Second select element
-            ]
+var yearSet = choose(firstSelect([
+    "//select[contains(@class, 'year') or contains(@id, 'year')]",
+    "//select[option[contains(text(), '202')]]"
+]), function (text) { return text === year; });
 
-            for by, selector in year_selectors:
-                try:
-                    year_dropdown = driver.find_element(by, selector)
-                    logger.info(f"Found year dropdown with selector: {selector}")
-                    break
-                except:
-                    continue
+return {month: monthSet, year: yearSet, changed: changed};
+"""
 
-            if year_dropdown:
-                # Select the target year
-                year_select = Select(year_dropdown)
-                logger.info(f"Selecting year: {target_year}")
-                year_select.select_by_visible_text(str(target_year))
-                logger.info(f"✓ Year set to: {target_year}")
-                time.sleep(2)  # Wait for calendar to reload
+# Tags the calendar's title and first day cell, or reports whether the tagged
+# nodes are still shown. Both are replaced when the datepicker renders another
+# month, so a missing tag proves the grid was re-rendered; the month/year
+# dropdowns themselves prove nothing, since the jump script just set them.
+# Returns null when the calendar has neither node.
+_CALENDAR_RENDER_SCRIPT = """
+var mark = arguments[0], nodes = [], i;
+var xpaths = [
+    "//*[contains(@class, 'ui-datepicker-title') or contains(@class, 'calendar-header')]",
+    "(//table[contains(@class, 'ui-datepicker-calendar') or contains(@class, 'calendar')]//td)[1]"
+];
+for (i = 0; i < xpaths.length; i++) {
+    var node = document.evaluate(xpaths[i], document, null,
+        XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    if (node) { nodes.push(node); }
+}
+if (!nodes.length) { return null; }
+
+var stale = false;
+for (i = 0; i < nodes.length; i++) {
+    stale = stale || nodes[i].hasAttribute('data-vs-stale');
+    if (mark) { nodes[i].setAttribute('data-vs-stale', '1'); }
+}
+return stale;
+"""
 
-                save_screenshot(driver, f"calendar_{target_month}_{target_year}")
-                logger.info(f"✓ Successfully navigated to {target_month_name} {target_year}")
-                return True
+# Reads the month/year currently shown by the calendar in a single round trip.
+# Dropdown-style headers report their selected options; otherwise the first
+# short text that mentions a month name or a year is returned.
+_READ_CALENDAR_MONTH_SCRIPT = """
+var monthNames = arguments[0];
+
+function looksLikeMonth(text) {
+    if (!text || text.length >= 50) { return false; }
+    var lower = text.toLowerCase();
+    for (var i = 0; i < monthNames.length; i++) {
+        if (lower.indexOf(monthNames[i]) !== -1) { return true; }
+    }
+    return /20\\d\\d/.test(text);
+}
+
+var monthSelect = document.evaluate(
+    "//select[contains(@class, 'month') or contains(@id, 'month')]",
+    document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+var yearSelect = document.evaluate(
+    "//select[contains(@class, 'year') or contains(@id, 'year')]",
+    document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+if (monthSelect && yearSelect && monthSelect.selectedIndex >= 0 && yearSelect.selectedIndex >= 0) {
+    return monthSelect.options[monthSelect.selectedIndex].text.trim() + ' ' +
+           yearSelect.options[yearSelect.selectedIndex].text.trim();
+}
+
+var xpaths = [
+    "//*[contains(@class, 'month')]",
+    "//*[contains(@class, 'calendar-header')]",
+    "//select[@name='month']",
+    "//h3 | //h4 | //h5"
+];
+for (var i = 0; i < xpaths.length; i++) {
+    var result = document.evaluate(xpaths[i], document, null,
+        XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    for (var j = 0; j < result.snapshotLength; j++) {
+        var text = (result.snapshotItem(j).innerText || '').trim();
+        if (looksLikeMonth(text)) { return text; }
+    }
+}
+return null;
+"""
+
+
+@traced("month_navigation")
+def navigate_to_target_month(driver: webdriver.Chrome, target_month: int, target_year: int) -> bool:
+    """
+    Navigate the calendar to the target month and year.
+
+    Jumps straight to the target by setting the month and year dropdowns in
+    one script. If the calendar has no dropdowns, clicks the next-month button
+    as many times as the current header says is needed. Either way the
+    calendar grid must re-render before the shown month is trusted.
+
+    Args:
+        driver: Selenium WebDriver instance
+        target_month: Target month (1-12)
+        target_year: Target year
+
+    Returns:
+        True if navigation successful, False otherwise
+    """
+    try:
+        target_month_name = _MONTH_NAMES[target_month - 1].capitalize()
+        logger.info(f"Navigating to {target_month}/{target_year}")
+
+        # Method 1: Set both dropdowns and fire their change events at once
+        try:
+            before = mark_calendar_render(driver)
+            selected = driver.execute_script(
+                _MONTH_JUMP_SCRIPT, target_month_name[:3], target_year
+            ) or {}
+            logger.info(f"Dropdown jump: month set={selected.get('month')}, year set={selected.get('year')}")
+
+            if selected.get("month") or selected.get("year"):
+                rendered = not selected.get("changed") or wait_for_calendar_render(driver, before)
+                if rendered and wait_for_calendar_month(driver, target_month, target_year):
+                    save_screenshot(driver, f"calendar_{target_month}_{target_year}")
+                    logger.info(f"✓ Successfully navigated to {target_month_name} {target_year}")
+                    return True
+                logger.warning("Calendar header did not reflect the dropdown selection")
             else:
-                logger.warning("Could not find year dropdown")
+                logger.warning("Could not find month/year dropdowns")
 
         except Exception as e:
             logger.warning(f"Dropdown method failed: {e}")
 
-        # Method 2: Fallback to clicking next/previous buttons (old method)
+        # Method 2: Fallback to clicking the next button a computed number of times
         logger.info("Trying fallback method with next/previous buttons...")
         max_clicks = 24
-        clicks = 0
 
-        while clicks < max_clicks:
-            current_month_text = get_current_calendar_month(driver)
+        current_month_text = get_current_calendar_month(driver)
+        current = parse_calendar_month(current_month_text) if current_month_text else None
 
-            if not current_month_text:
-                logger.error("Could not determine current calendar month")
-                return False
+        if not current:
+            logger.error("Could not determine current calendar month")
+            return False
 
-            logger.info(f"Current calendar shows: {current_month_text}")
+        logger.info(f"Current calendar shows: {current_month_text}")
 
-            if is_target_month(current_month_text, target_month, target_year):
-                logger.info("Reached target month!")
-                save_screenshot(driver, f"calendar_{target_month}_{target_year}")
-                return True
+        current_month, current_year = current
+        clicks_needed = (target_year - current_year) * 12 + (target_month - current_month)
 
+        if clicks_needed < 0 or clicks_needed > max_clicks:
+            logger.error(f"Target month is {clicks_needed} months away, cannot navigate there")
+            return False
+
+        for _ in range(clicks_needed):
+            before = mark_calendar_render(driver)
             if not click_next_month(driver):
                 logger.error("Could not click next month button")
                 return False
+            if not wait_for_calendar_render(driver, before):
+                logger.error("Calendar did not re-render after clicking next month")
+                return False
 
-            clicks += 1
-            time.sleep(1)
+        if wait_for_calendar_month(driver, target_month, target_year):
+            logger.info(f"Reached target month after {clicks_needed} clicks!")
+            save_screenshot(driver, f"calendar_{target_month}_{target_year}")
+            return True
 
-        logger.error(f"Could not reach target month after {clicks} attempts")
+        logger.error(f"Calendar did not show target month after {clicks_needed} clicks")
         return False
 
     except Exception as e:
@@ -308,6 +439,69 @@ def navigate_to_target_month(driver: webdriver.Chrome, target_month: int, target
         return False
 
 
+def mark_calendar_render(driver: webdriver.Chrome) -> Optional[str]:
+    """
+    Tag the calendar as rendered now, before changing its month.
+
+    Args:
+        driver: Selenium WebDriver instance
+
+    Returns:
+        The header text, used by wait_for_calendar_render() when the
+        calendar has no title or day cell to tag
+    """
+    driver.execute_script(_CALENDAR_RENDER_SCRIPT, True)
+    return get_current_calendar_month(driver)
+
+
+def wait_for_calendar_render(driver: webdriver.Chrome, before: Optional[str], timeout: float = 5) -> bool:
+    """
+    Wait until the calendar tagged by mark_calendar_render() has been re-rendered.
+
+    Args:
+        driver: Selenium WebDriver instance
+        before: Header text returned by mark_calendar_render()
+        timeout: Maximum seconds to wait
+
+    Returns:
+        True if the calendar was re-rendered before the timeout
+    """
+    def rendered(d: webdriver.Chrome) -> bool:
+        stale = d.execute_script(_CALENDAR_RENDER_SCRIPT, False)
+        if stale is None:
+            return get_current_calendar_month(d) != before
+        return not stale
+
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.1).until(rendered)
+        return True
+    except TimeoutException:
+        return False
+
+
+def wait_for_calendar_month(driver: webdriver.Chrome, target_month: int, target_year: int,
+                            timeout: float = 5) -> bool:
+    """
+    Wait until the calendar header shows the target month.
+
+    Args:
+        driver: Selenium WebDriver instance
+        target_month: Target month (1-12)
+        target_year: Target year
+        timeout: Maximum seconds to wait
+
+    Returns:
+        True if the target month is shown before the timeout
+    """
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.1).until(
+            lambda d: is_target_month(get_current_calendar_month(d) or "", target_month, target_year)
+        )
+        return True
+    except TimeoutException:
+        return False
+
+
 def get_current_calendar_month(driver: webdriver.Chrome) -> Optional[str]:
     """
     Get the current month/year displayed in the calendar.
@@ -319,36 +513,34 @@ def get_current_calendar_month(driver: webdriver.Chrome) -> Optional[str]:
         String with month/year or None if not found
     """
     try:
-        # Look for month/year display element
-        month_selectors = [
-            (By.XPATH, "//*[contains(@class, 'month')]"),
-            (By.XPATH, "//*[contains(@class, 'calendar-header')]"),
-            (By.XPATH, "//select[@name='month']"),
-            (By.XPATH, "//h3 | //h4 | //h5"),  # Headers often show month
-        ]
-        
-        for by, selector in month_selectors:
-            try:
-                elements = driver.find_elements(by, selector)
-                for element in elements:
-                    text = element.text.strip()
-                    if text and (len(text) < 50):  # Reasonable length for month display
-                        # Check if it contains month name or number
-                        if any(month in text.lower() for month in 
-                              ['january', 'february', 'march', 'april', 'may', 'june',
-                               'july', 'august', 'september', 'october', 'november', 'december']) or \
-                           any(str(year) in text for year in range(2024, 2027)):
-                            return text
-            except:
-                continue
-        
-        return None
-        
+        return driver.execute_script(_READ_CALENDAR_MONTH_SCRIPT, _MONTH_NAMES)
     except Exception as e:
         logger.error(f"Error getting current month: {e}")
         return None
 
 
+def parse_calendar_month(month_text: str) -> Optional[Tuple[int, int]]:
+    """
+    Parse the month and year out of a calendar header.
+
+    Args:
+        month_text: Text showing current month, e.g. "December 2025" or "Dec 2025"
+
+    Returns:
+        Tuple of (month, year) or None if the text cannot be parsed
+    """
+    year_match = re.search(r'\b(20\d\d)\b', month_text)
+    if not year_match:
+        return None
+
+    month_text_lower = month_text.lower()
+    for index, month_name in enumerate(_MONTH_NAMES):
+        if re.search(rf'\b{month_name[:3]}', month_text_lower):
+            return index + 1, int(year_match.group(1))
+
+    return None
+
+
 def is_target_month(month_text: str, target_month: int, target_year: int) -> bool:
     """
     Check if the displayed month matches our target.
@@ -362,20 +554,7 @@ def is_target_month(month_text: str, target_month: int, target_year: int) -> boo
         True if this is the target month
     """
     try:
-        month_text_lower = month_text.lower()
-        
-        # Month names
-        month_names = ['january', 'february', 'march', 'april', 'may', 'june',
-                      'july', 'august', 'september', 'october', 'november', 'december']
-        
-        target_month_name = month_names[target_month - 1]
-        
-        # Check if target month name and year are in the text
-        has_month = target_month_name in month_text_lower
-        has_year = str(target_year) in month_text
-        
-        return has_month and has_year
-        
+        return parse_calendar_month(month_text) == (target_month, target_year)
     except Exception as e:
         logger.error(f"Error checking target month: {e}")
         return False
@@ -401,14 +580,10 @@ def click_next_month(driver: webdriver.Chrome) -> bool:
             (By.XPATH, "//a[contains(@class, 'next')]"),
         ]
         
-        for by, selector in next_selectors:
-            try:
-                button = driver.find_element(by, selector)
-                if button.is_displayed() and button.is_enabled():
-                    button.click()
-                    return True
-            except:
-                continue
+        match = SelectorBundle(next_selectors, clickable=True).find(driver)
+        if match:
+            match.element.click()
+            return True
         
         return False
         
@@ -417,119 +592,275 @@ def click_next_month(driver: webdriver.Chrome) -> bool:
         return False
 
 
-def check_availability(driver: webdriver.Chrome) -> List[Dict[str, str]]:
+@traced("availability_parse")
+def check_availability(driver: webdriver.Chrome, post: str, month: int,
+                       year: int) -> Tuple[List[Appointment], Dict[int, WebElement]]:
     """
     Check for available appointment slots in the current calendar view.
 
     Args:
         driver: Selenium WebDriver instance
+        post: Consular post the calendar belongs to
+        month: Month shown by the calendar (1-12)
+        year: Year shown by the calendar
 
     Returns:
-        List of available appointments with date and time info
+        Tuple of (available appointments, calendar cell of each available day).
+        The element map is only valid while the page stays loaded.
     """
     try:
         logger.info("Checking for available appointments...")
 
         appointments = []
+        elements = {}
+        observed_at = datetime.now()
 
         # Take a screenshot to see calendar state
         save_screenshot(driver, "checking_availability")
 
-        # Look for date cells that are NOT disabled/grayed out
-        # Available dates typically don't have 'disabled' class and are clickable
-        date_selectors = [
-            # Look for <td> or <a> elements that don't have 'disabled' class
-            (By.XPATH, "//td[not(contains(@class, 'disabled')) and not(contains(@class, 'ui-state-disabled'))]//a"),
-            (By.XPATH, "//td[contains(@class, 'available')]//a"),
-            (By.XPATH, "//a[contains(@class, 'ui-state-default') and not(contains(@class, 'ui-state-disabled'))]"),
-            # Try finding by data attributes
-            (By.XPATH, "//td[@data-handler='selectDay' and not(contains(@class, 'disabled'))]"),
-            # Generic clickable dates
-            (By.XPATH, "//td[not(contains(@class, 'disabled'))]//a[contains(@href, '#')]"),
-        ]
+        date_bundle = SelectorBundle(_DATE_SELECTORS, where=_AVAILABLE_DATE_CONDITION)
 
-        for by, selector in date_selectors:
-            try:
-                date_elements = driver.find_elements(by, selector)
-                logger.info(f"Found {len(date_elements)} date elements with selector: {selector}")
+        matches = date_bundle.find_all(driver)
+        if matches:
+            logger.info(f"Found {len(matches)} date elements with selector: {date_bundle.describe(matches[0].index)}")
 
-                for element in date_elements:
-                    try:
-                        # Check if visible and enabled
-                        if not element.is_displayed():
-                            continue
-
-                        # Get date information
-                        date_text = element.text.strip()
-                        classes = element.get_attribute("class") or ""
-                        parent_classes = ""
-
-                        # Also check parent <td> classes
-                        try:
-                            parent = element.find_element(By.XPATH, "..")
-                            parent_classes = parent.get_attribute("class") or ""
-                        except:
-                            pass
-
-                        # Skip if disabled
-                        if "disabled" in classes.lower() or "disabled" in parent_classes.lower():
-                            continue
-                        if "ui-state-disabled" in classes or "ui-state-disabled" in parent_classes:
-                            continue
-
-                        if date_text and date_text.isdigit():
-                            appointments.append({
-                                "date": date_text,
-                                "element": element,
-                                "classes": classes,
-                                "parent_classes": parent_classes
-                            })
-                            logger.info(f"  Found available date: {date_text}")
-                    except Exception as e:
-                        logger.debug(f"Error processing date element: {e}")
-                        continue
-
-                if appointments:
-                    break  # Found appointments with this selector
-
-            except Exception as e:
-                logger.debug(f"Error with selector {selector}: {e}")
+        for match in matches:
+            day = int(match.text)
+            if day in elements:
                 continue
 
+            appointments.append(Appointment(post, year, month, day, observed_at=observed_at))
+            elements[day] = match.element
+            logger.info(f"  Found available date: {day}")
+
         if appointments:
             logger.info(f"✓ Found {len(appointments)} available dates")
             save_screenshot(driver, "appointments_found")
         else:
-            logger.info("No available appointments found in December 2025")
+            logger.info(f"No available appointments found in {format_date(month, year)}")
             logger.info("All dates appear to be unavailable/grayed out")
 
-        return appointments
+        return appointments, elements
 
     except Exception as e:
         logger.error(f"Error checking availability: {e}", exc_info=True)
-        return []
+        return [], {}
+
+
+# Returns the time slots offered for the selected date as [element, label, stale]
+# rows in one round trip. Time <select> options, time radio inputs and slot
+# buttons are supported. With arguments[0] set, the returned slots are tagged
+# so a later read can tell whether the list was re-rendered for another date.
+_TIME_SLOTS_SCRIPT = """
+var markStale = arguments[0], rows = [], i;
+
+function first(xpath) {
+    return document.evaluate(xpath, document, null,
+        XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+}
+
+function all(xpath) {
+    var result = document.evaluate(xpath, document, null,
+        XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null), nodes = [];
+    for (var k = 0; k < result.snapshotLength; k++) { nodes.push(result.snapshotItem(k)); }
+    return nodes;
+}
+
+function labelFor(input) {
+    var label = input.id ? document.querySelector('label[for="' + input.id + '"]') : null;
+    label = label || input.closest('label');
+    return label ? label.innerText.trim() : (input.value || '');
+}
+
+var select = first("//select[contains(@id, 'time') or contains(@name, 'time') or contains(@class, 'time')]");
+if (select) {
+    for (i = 0; i < select.options.length; i++) {
+        var option = select.options[i];
+        if (option.value && !option.disabled) { rows.push([option, option.text.trim()]); }
+    }
+} else {
+    var radios = all("//input[@type='radio' and (contains(@name, 'time') or contains(@id, 'time'))]");
+    for (i = 0; i < radios.length; i++) {
+        if (!radios[i].disabled) { rows.push([radios[i], labelFor(radios[i])]); }
+    }
+    if (!rows.length) {
+        var buttons = all("//*[contains(@class, 'time-slot') or contains(@class, 'timeslot')]" +
+                          "[not(contains(@class, 'disabled'))]");
+        for (i = 0; i < buttons.length; i++) { rows.push([buttons[i], buttons[i].innerText.trim()]); }
+    }
+}
+
+for (i = 0; i < rows.length; i++) {
+    rows[i].push(rows[i][0].hasAttribute('data-vs-stale'));
+    if (markStale) { rows[i][0].setAttribute('data-vs-stale', '1'); }
+}
+return rows;
+"""
+
+
+# Whether a calendar cell is the date currently selected, in which case
+# clicking it again does not re-render the time slots.
+_DATE_SELECTED_SCRIPT = """
+var cell = arguments[0], td = cell.closest('td') || cell;
+var classes = ' ' + (cell.getAttribute('class') || '') + ' ' + (td.getAttribute('class') || '') + ' ';
+return /\\s(ui-state-active|ui-datepicker-current-day|selected|active)\\s/.test(classes) ||
+       cell.getAttribute('aria-selected') === 'true' || td.getAttribute('aria-selected') === 'true';
+"""
 
 
-def check_target_month_appointments(driver: webdriver.Chrome) -> Dict[str, any]:
+def load_time_slots(driver: webdriver.Chrome, date_element: WebElement,
+                    timeout: float = 5) -> Optional[List[Tuple[WebElement, str]]]:
+    """
+    Click a calendar date and wait for its time slots to be listed.
+
+    Slots rendered for a previously clicked date are never returned: if the
+    list still shows them when the timeout expires, the date counts as not
+    loaded. A date that is already selected is read without waiting for a
+    re-render.
+
+    Args:
+        driver: Selenium WebDriver instance
+        date_element: Calendar cell of the date to load
+        timeout: Maximum seconds to wait for the slot list
+
+    Returns:
+        List of (element, label) pairs (empty if the date offers none), or
+        None if the slots of this date could not be told apart in time
+    """
+    if driver.execute_script(_DATE_SELECTED_SCRIPT, date_element):
+        rows = driver.execute_script(_TIME_SLOTS_SCRIPT, False) or []
+        return [(element, label) for element, label, _ in rows]
+
+    driver.execute_script(_TIME_SLOTS_SCRIPT, True)
+    date_element.click()
+
+    rows = []
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        rows = driver.execute_script(_TIME_SLOTS_SCRIPT, False) or []
+        if rows and not any(stale for _, _, stale in rows):
+            return [(element, label) for element, label, _ in rows]
+        time.sleep(0.1)
+
+    if any(stale for _, _, stale in rows):
+        logger.warning("Time slots were not re-rendered for the clicked date")
+        return None
+    return []
+
+
+def find_date_element(driver: webdriver.Chrome, day: int) -> Optional[WebElement]:
+    """
+    Find the calendar cell of an available day.
+
+    Clicking a date re-renders many calendars, so previously found cells
+    can go stale; this resolves a fresh one in a single round trip.
+
+    Args:
+        driver: Selenium WebDriver instance
+        day: Day of month as shown in the calendar
+
+    Returns:
+        The date element or None if the day is no longer available
+    """
+    bundle = SelectorBundle(
+        _DATE_SELECTORS,
+        where=f"{_AVAILABLE_DATE_CONDITION} && text === {json.dumps(str(day))}",
+    )
+    match = bundle.find(driver)
+    return match.element if match else None
+
+
+@traced("time_slots")
+def attach_time_slots(driver: webdriver.Chrome, appointments: List[Appointment],
+                      elements: Dict[int, WebElement], budget_seconds: float) -> List[Appointment]:
+    """
+    Load the time slots of every available date and attach them to its record.
+
+    Dates are clicked one after another in calendar order, and the whole stage
+    is bounded by a time budget; dates not reached are returned without times.
+
+    Args:
+        driver: Selenium WebDriver instance
+        appointments: Available appointments as returned by check_availability()
+        elements: Calendar cell of each available day; refreshed in place
+        budget_seconds: Maximum seconds to spend on the whole month
+
+    Returns:
+        The appointments, with times attached where they could be loaded
+    """
+    deadline = time.monotonic() + budget_seconds
+    loaded = 0
+    result = []
+
+    for apt in appointments:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            result.append(apt)
+            continue
+
+        try:
+            try:
+                slots = load_time_slots(driver, elements[apt.day], timeout=min(5, remaining))
+            except StaleElementReferenceException:
+                element = find_date_element(driver, apt.day)
+                if not element:
+                    logger.info(f"  Day {apt.day} is no longer available")
+                    result.append(apt)
+                    continue
+                elements[apt.day] = element
+                slots = load_time_slots(driver, element, timeout=min(5, remaining))
+
+            if slots is None:
+                logger.info(f"  Day {apt.day}: time slots did not load")
+                result.append(apt)
+                continue
+
+            apt = apt.with_times(label for _, label in slots)
+            loaded += 1
+            logger.info(f"  Day {apt.day}: {', '.join(apt.times) or 'no time slots'}")
+
+        except Exception as e:
+            logger.debug(f"Error loading time slots for day {apt.day}: {e}")
+
+        result.append(apt)
+
+    if loaded < len(appointments):
+        logger.warning(f"Loaded time slots for {loaded}/{len(appointments)} dates within {budget_seconds}s")
+    else:
+        logger.info(f"Loaded time slots for all {loaded} dates")
+
+    return result
+
+
+def check_target_month_appointments(driver: webdriver.Chrome, refresh_only: bool = False) -> Dict[str, any]:
     """
     Complete flow: navigate to target month and check for appointments.
     
     Args:
         driver: Selenium WebDriver instance
+        refresh_only: The browser is already on the calendar page; reload it
+            instead of navigating there from the dashboard
         
     Returns:
-        Dictionary with results
+        Dictionary with results. "appointments" holds Appointment records and
+        "elements" the transient calendar cell of each available day.
     """
     result = {
         "success": False,
         "appointments_found": False,
         "appointments": [],
+        "elements": {},
         "message": ""
     }
     
     try:
+        if refresh_only:
+            if not refresh_calendar(driver):
+                result["message"] = "Failed to reload calendar page"
+                return result
+        
         # Navigate to scheduling page
-        if not navigate_to_scheduling(driver):
+        elif not navigate_to_scheduling(driver):
             result["message"] = "Failed to navigate to scheduling page"
             return result
         
@@ -544,10 +875,17 @@ def check_target_month_appointments(driver: webdriver.Chrome) -> Dict[str, any]:
             return result
         
         # Check availability
-        appointments = check_availability(driver)
+        appointments, elements = check_availability(
+            driver, Config.CONSULAR_POST, Config.TARGET_MONTH, Config.TARGET_YEAR
+        )
+        
+        # Load the offered times of every available date
+        if appointments and Config.FETCH_TIME_SLOTS:
+            appointments = attach_time_slots(driver, appointments, elements, Config.TIME_SLOT_BUDGET)
         
         result["success"] = True
         result["appointments"] = appointments
+        result["elements"] = elements
         result["appointments_found"] = len(appointments) > 0
         result["message"] = f"Found {len(appointments)} available appointments" if appointments else "No appointments available"
         
@@ -10,24 +10,24 @@ from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.common.exceptions import TimeoutException
 from src.config import Config
 from src.utils import save_screenshot
-from PIL import Image
-import pytesseract
+from src.dom import find_all, find_first, no_implicit_wait
+from src.tracing import traced
+from src.metrics import measured_captcha
 import io
 import base64
 import re
+import importlib.util
 
-try:
-    from anthropic import Anthropic
-    ANTHROPIC_AVAILABLE = True
-except ImportError:
-    ANTHROPIC_AVAILABLE = False
+# Captcha solver libraries are imported by the solvers on first use
+ANTHROPIC_AVAILABLE = importlib.util.find_spec("anthropic") is not None
 
 logger = logging.getLogger("visa_scheduler")
 
 
+@traced("cloudflare")
 def handle_cloudflare_challenge(driver: webdriver.Chrome, timeout: int = 30) -> bool:
     """
     Handle Cloudflare security challenge by automatically clicking the checkbox.
@@ -56,9 +56,16 @@ def handle_cloudflare_challenge(driver: webdriver.Chrome, timeout: int = 30) ->
                 logger.info("Looking for Cloudflare iframe...")
 
                 # Find all iframes
-                iframes = driver.find_elements(By.TAG_NAME, "iframe")
+                iframes = find_all(driver, By.TAG_NAME, "iframe")
                 logger.info(f"Found {len(iframes)} iframes")
 
+                checkbox_selectors = [
+                    (By.CSS_SELECTOR, "input[type='checkbox']"),
+                    (By.CSS_SELECTOR, "#challenge-stage input"),
+                    (By.XPATH, "//input[@type='checkbox']"),
+                    (By.CSS_SELECTOR, "label input"),
+                ]
+
                 for idx, iframe in enumerate(iframes):
                     try:
                         # Switch to iframe
@@ -66,31 +73,17 @@ def handle_cloudflare_challenge(driver: webdriver.Chrome, timeout: int = 30) ->
                         logger.info(f"Switched to iframe {idx}")
 
                         # Try to find the checkbox
-                        checkbox_selectors = [
-                            (By.CSS_SELECTOR, "input[type='checkbox']"),
-                            (By.CSS_SELECTOR, "#challenge-stage input"),
-                            (By.XPATH, "//input[@type='checkbox']"),
-                            (By.CSS_SELECTOR, "label input"),
-                        ]
-
-                        for by, selector in checkbox_selectors:
-                            try:
-                                checkbox = driver.find_element(by, selector)
-                                if checkbox.is_displayed():
-                                    logger.info(f"Found checkbox with selector: {selector}")
-                                    # Wait 2 seconds before clicking to appear more human
-                                    logger.info("Waiting 2 seconds before clicking...")
-                                    time.sleep(2)
-                                    # Click it
-                                    checkbox.click()
-                                    logger.info("✓ Clicked Cloudflare checkbox!")
-                                    save_screenshot(driver, "cloudflare_checkbox_clicked")
-
-                                    # Switch back to main content
-                                    driver.switch_to.default_content()
-                                    break
-                            except:
-                                continue
+                        found = find_first(driver, checkbox_selectors)
+                        if found:
+                            checkbox, index = found
+                            logger.info(f"Found checkbox with selector: {checkbox_selectors[index][1]}")
+                            # Wait 2 seconds before clicking to appear more human
+                            logger.info("Waiting 2 seconds before clicking...")
+                            time.sleep(2)
+                            # Click it
+                            checkbox.click()
+                            logger.info("✓ Clicked Cloudflare checkbox!")
+                            save_screenshot(driver, "cloudflare_checkbox_clicked")
 
                         # Switch back to main content
                         driver.switch_to.default_content()
@@ -132,6 +125,7 @@ def handle_cloudflare_challenge(driver: webdriver.Chrome, timeout: int = 30) ->
         return False
 
 
+@traced("login")
 def login(driver: webdriver.Chrome, username: str, password: str) -> bool:
     """
     Perform login on the visa scheduling website.
@@ -206,16 +200,16 @@ def login(driver: webdriver.Chrome, username: str, password: str) -> bool:
             return True
         except TimeoutException:
             # Check if we're still on login page (error)
-            try:
-                error_msg = driver.find_element(By.CLASS_NAME, "error")
-                logger.error(f"Login failed: {error_msg.text}")
+            error_msgs = find_all(driver, By.CLASS_NAME, "error")
+            if error_msgs:
+                logger.error(f"Login failed: {error_msgs[0].text}")
                 save_screenshot(driver, "login_failed")
                 return False
-            except NoSuchElementException:
-                # No error message, might have logged in successfully
-                logger.info("Login appears successful (no error message)")
-                save_screenshot(driver, "after_login")
-                return True
+
+            # No error message, might have logged in successfully
+            logger.info("Login appears successful (no error message)")
+            save_screenshot(driver, "after_login")
+            return True
                 
     except Exception as e:
         logger.error(f"Login error: {e}", exc_info=True)
@@ -223,6 +217,8 @@ def login(driver: webdriver.Chrome, username: str, password: str) -> bool:
         return False
 
 
+@traced("captcha.claude")
+@measured_captcha("claude")
 def solve_captcha_with_claude(driver: webdriver.Chrome) -> Optional[str]:
     """
     Attempt to solve captcha using Claude's vision API.
@@ -251,6 +247,9 @@ def solve_captcha_with_claude(driver: webdriver.Chrome) -> Optional[str]:
         # Get the image as screenshot
         captcha_png = captcha_img_element.screenshot_as_png
 
+        from anthropic import Anthropic
+        from PIL import Image
+
         # Convert to base64
         captcha_base64 = base64.b64encode(captcha_png).decode('utf-8')
 
@@ -308,6 +307,8 @@ def solve_captcha_with_claude(driver: webdriver.Chrome) -> Optional[str]:
         return None
 
 
+@traced("captcha.ocr")
+@measured_captcha("ocr")
 def solve_captcha_with_ocr(driver: webdriver.Chrome) -> Optional[str]:
     """
     Attempt to solve captcha using Tesseract OCR.
@@ -327,6 +328,9 @@ def solve_captcha_with_ocr(driver: webdriver.Chrome) -> Optional[str]:
         # Get the image as screenshot
         captcha_png = captcha_img_element.screenshot_as_png
 
+        from PIL import Image
+        import pytesseract
+
         # Convert to PIL Image
         image = Image.open(io.BytesIO(captcha_png))
 
@@ -368,30 +372,45 @@ def solve_captcha_with_ocr(driver: webdriver.Chrome) -> Optional[str]:
         return None
 
 
-def handle_captcha(driver: webdriver.Chrome) -> bool:
+@traced("captcha")
+def handle_captcha(driver: webdriver.Chrome, timeout: int = 5) -> bool:
     """
     Handle the captcha on the login page.
     First tries OCR, then falls back to manual entry.
 
     Args:
         driver: Selenium WebDriver instance
+        timeout: Seconds to wait for the captcha to render before concluding there is none
 
     Returns:
         True if captcha was solved, False otherwise
     """
     try:
+        # The captcha can render after the login form, so wait briefly for the field or image
+        try:
+            with no_implicit_wait(driver):
+                WebDriverWait(driver, timeout).until(EC.presence_of_element_located(
+                    (By.CSS_SELECTOR, "#extension_atlasCaptchaResponse, #captchaImage")
+                ))
+        except TimeoutException:
+            logger.info("No captcha field found")
+            return True
+
         # Look for captcha input field
-        captcha_field = driver.find_element(By.ID, "extension_atlasCaptchaResponse")
+        captcha_fields = find_all(driver, By.ID, "extension_atlasCaptchaResponse")
+        if not captcha_fields:
+            logger.info("No captcha field found")
+            return True
+        captcha_field = captcha_fields[0]
 
         if captcha_field.is_displayed():
             logger.info("Captcha detected!")
 
             # Try to get the captcha image for reference
-            try:
-                captcha_img = driver.find_element(By.ID, "captchaImage")
+            if find_all(driver, By.ID, "captchaImage"):
                 logger.info("Captcha image found")
                 save_screenshot(driver, "captcha_to_solve")
-            except NoSuchElementException:
+            else:
                 logger.warning("Could not find captcha image element")
 
             # Use Claude Vision API to solve captcha
@@ -445,14 +464,12 @@ def handle_captcha(driver: webdriver.Chrome) -> bool:
             logger.info("No captcha required")
             return True
             
-    except NoSuchElementException:
-        logger.info("No captcha field found")
-        return True
     except Exception as e:
         logger.error(f"Error handling captcha: {e}")
         return False
 
 
+@traced("security_questions")
 def answer_security_questions(driver: webdriver.Chrome) -> bool:
     """
     Answer the security questions on the login page.
@@ -593,18 +610,15 @@ def answer_security_questions(driver: webdriver.Chrome) -> bool:
                 (By.XPATH, "//button[@type='button' and not(contains(text(), 'Continue'))]"),
             ]
 
-            for by, selector in cancel_selectors:
-                try:
-                    cancel_button = driver.find_element(by, selector)
-                    if cancel_button.is_displayed():
-                        logger.info(f"Found Cancel button with: {selector}")
-                        cancel_button.click()
-                        logger.info("Clicked Cancel - going back to retry")
-                        time.sleep(2)
-                        save_screenshot(driver, "clicked_cancel_retry")
-                        return "RETRY"  # Special return code for retry
-                except:
-                    continue
+            found = find_first(driver, cancel_selectors)
+            if found:
+                cancel_button, index = found
+                logger.info(f"Found Cancel button with: {cancel_selectors[index][1]}")
+                cancel_button.click()
+                logger.info("Clicked Cancel - going back to retry")
+                time.sleep(2)
+                save_screenshot(driver, "clicked_cancel_retry")
+                return "RETRY"  # Special return code for retry
 
             logger.error("Could not find Cancel button to retry")
             save_screenshot(driver, "no_cancel_button")
@@ -628,14 +642,10 @@ def answer_security_questions(driver: webdriver.Chrome) -> bool:
             ]
 
             continue_button = None
-            for by, selector in continue_selectors:
-                try:
-                    continue_button = driver.find_element(by, selector)
-                    if continue_button.is_displayed():
-                        logger.info(f"Found Continue button with: {selector}")
-                        break
-                except:
-                    continue
+            found = find_first(driver, continue_selectors)
+            if found:
+                continue_button, index = found
+                logger.info(f"Found Continue button with: {continue_selectors[index][1]}")
 
             if continue_button:
                 logger.info("Clicking Continue button...")
@@ -661,6 +671,7 @@ def answer_security_questions(driver: webdriver.Chrome) -> bool:
         return False
 
 
+@traced("verify_login")
 def verify_logged_in(driver: webdriver.Chrome) -> bool:
     """
     Verify that we are successfully logged in.
@@ -0,0 +1,245 @@
+"""
+Auto-booking module for US Visa Scheduler.
+Books the earliest acceptable appointment in the same browser session
+right after it is found, timing every step.
+"""
+
+import re
+import time
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.remote.webelement import WebElement
+from selenium.common.exceptions import StaleElementReferenceException
+from src.config import Config
+from src.dom import SelectorBundle
+from src.models import Appointment
+from src.appointment_checker import load_time_slots, find_date_element
+from src.utils import save_screenshot, timed
+
+logger = logging.getLogger("visa_scheduler")
+
+# Selects a time slot: options are chosen on their <select> with a change
+# event, anything else (radio inputs, slot buttons) is clicked.
+_CHOOSE_SLOT_SCRIPT = """
+var el = arguments[0];
+if (el.tagName === 'OPTION') {
+    var select = el.closest('select');
+    select.value = el.value;
+    select.dispatchEvent(new Event('change', {bubbles: true}));
+} else {
+    el.click();
+}
+"""
+
+SUBMIT_BUNDLE = SelectorBundle([
+    (By.XPATH, "//button[contains(text(), 'Submit')]"),
+    (By.XPATH, "//input[@type='submit']"),
+    (By.XPATH, "//button[contains(text(), 'Reschedule')]"),
+    (By.XPATH, "//button[contains(text(), 'Schedule')]"),
+    (By.XPATH, "//button[contains(text(), 'Book')]"),
+    (By.XPATH, "//button[@type='submit']"),
+], clickable=True)
+
+CONFIRM_BUNDLE = SelectorBundle([
+    (By.XPATH, "//button[contains(text(), 'Confirm')]"),
+    (By.XPATH, "//a[contains(text(), 'Confirm')]"),
+    (By.XPATH, "//input[@value='Confirm']"),
+], clickable=True)
+
+_CONFIRMED_XPATHS = [
+    "//*[contains(translate(text(), 'CONFIRMED', 'confirmed'), 'confirmed')]",
+    "//*[contains(text(), 'successfully scheduled') or contains(text(), 'Successfully Scheduled')]",
+]
+
+# Only confirmations rendered after the submit count: the reschedule page
+# already shows the current, confirmed appointment.
+CONFIRMED_BUNDLE = SelectorBundle(
+    [(By.XPATH, xpath) for xpath in _CONFIRMED_XPATHS],
+    where="!el.hasAttribute('data-vs-seen')",
+)
+
+# Tags every confirmation text already on the page before submitting.
+_MARK_CONFIRMED_SCRIPT = """
+var xpaths = arguments[0];
+for (var i = 0; i < xpaths.length; i++) {
+    var result = document.evaluate(xpaths[i], document, null,
+        XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    for (var j = 0; j < result.snapshotLength; j++) {
+        result.snapshotItem(j).setAttribute('data-vs-seen', '1');
+    }
+}
+"""
+
+
+def parse_time_of_day(text: str) -> Optional[int]:
+    """
+    Parse a time-slot label into minutes since midnight.
+
+    Args:
+        text: Label such as "09:30", "9:30 AM" or "14:15 - 14:30"
+
+    Returns:
+        Minutes since midnight, or None if no time is found
+    """
+    match = re.search(r'(\d{1,2}):(\d{2})\s*([AaPp][Mm])?', text)
+    if not match:
+        return None
+
+    hours, minutes = int(match.group(1)), int(match.group(2))
+    meridiem = (match.group(3) or "").lower()
+    if meridiem == "pm" and hours < 12:
+        hours += 12
+    elif meridiem == "am" and hours == 12:
+        hours = 0
+
+    return hours * 60 + minutes
+
+
+def is_acceptable_day(day: int) -> bool:
+    """Check a calendar day against the configured booking window."""
+    return Config.BOOKING_EARLIEST_DAY <= day <= Config.BOOKING_LATEST_DAY
+
+
+def is_acceptable_time(label: str) -> bool:
+    """Check a time-slot label against the configured booking time window."""
+    minutes = parse_time_of_day(label)
+    if minutes is None:
+        return False
+
+    earliest = parse_time_of_day(Config.BOOKING_TIME_FROM) or 0
+    latest = parse_time_of_day(Config.BOOKING_TIME_TO)
+    latest = 24 * 60 - 1 if latest is None else latest
+    return earliest <= minutes <= latest
+
+
+def pick_time_slot(slots: List[Tuple[WebElement, str]]) -> Optional[Tuple[WebElement, str]]:
+    """
+    Pick the earliest acceptable slot from a list of time slots.
+
+    Args:
+        slots: List of (element, label) pairs
+
+    Returns:
+        The chosen (element, label) pair or None if no slot fits
+    """
+    acceptable = [slot for slot in slots if is_acceptable_time(slot[1])]
+    if not acceptable:
+        return None
+    return min(acceptable, key=lambda slot: parse_time_of_day(slot[1]))
+
+
+def book_earliest_appointment(driver: webdriver.Chrome, appointments: List[Appointment],
+                              elements: Dict[int, WebElement]) -> Dict[str, Any]:
+    """
+    Book the earliest acceptable date and time slot.
+
+    Runs in the already authenticated driver, directly on the calendar that
+    check_availability() just read. In dry-run mode the date and time slot are
+    selected and the submit button is located, but nothing is submitted.
+
+    Args:
+        driver: Selenium WebDriver instance
+        appointments: Available appointments as returned by check_availability()
+        elements: Calendar cell of each available day
+
+    Returns:
+        Dictionary with the outcome, the chosen date and time, and step timings
+    """
+    result = {
+        "success": False,
+        "dry_run": Config.BOOKING_DRY_RUN,
+        "date": None,
+        "time": None,
+        "timings": {},
+        "message": "",
+    }
+    timings = result["timings"]
+    started = time.perf_counter()
+
+    try:
+        candidates = sorted(
+            (apt for apt in appointments if is_acceptable_day(apt.day)),
+            key=lambda apt: apt.day,
+        )
+        if not candidates:
+            result["message"] = "No available date inside the booking window"
+            return result
+
+        logger.info(f"Auto-booking: {len(candidates)} candidate date(s), dry run={Config.BOOKING_DRY_RUN}")
+
+        chosen = None
+        for apt in candidates:
+            # Skip dates whose already extracted times cannot match
+            if apt.times and not any(is_acceptable_time(label) for label in apt.times):
+                continue
+
+            with timed(timings, "booking_load_times", day=apt.day):
+                try:
+                    slots = load_time_slots(driver, elements[apt.day])
+                except (KeyError, StaleElementReferenceException):
+                    element = find_date_element(driver, apt.day)
+                    slots = load_time_slots(driver, element) if element else []
+
+            if slots is None:
+                logger.warning(f"Time slots of day {apt.day} did not load, skipping it")
+                continue
+
+            chosen = pick_time_slot(slots)
+            if chosen:
+                result["date"] = apt.date.isoformat()
+                break
+
+            logger.info(f"No acceptable time slot on day {apt.day} ({len(slots)} offered)")
+
+        if not chosen:
+            result["message"] = "No acceptable time slot on any available date"
+            return result
+
+        slot_element, slot_label = chosen
+        result["time"] = slot_label
+
+        with timed(timings, "booking_select_time"):
+            driver.execute_script(_CHOOSE_SLOT_SCRIPT, slot_element)
+
+        with timed(timings, "booking_submit"):
+            submit = SUBMIT_BUNDLE.wait(driver, 5, poll_frequency=0.1)
+            if not submit:
+                result["message"] = "Could not find the submit button"
+                save_screenshot(driver, "booking_no_submit")
+                return result
+
+            if Config.BOOKING_DRY_RUN:
+                save_screenshot(driver, "booking_dry_run")
+                result["success"] = True
+                result["message"] = f"Dry run: would book {result['date']} at {slot_label}"
+                return result
+
+            driver.execute_script(_MARK_CONFIRMED_SCRIPT, _CONFIRMED_XPATHS)
+            submit.element.click()
+
+        with timed(timings, "booking_confirm"):
+            confirm = CONFIRM_BUNDLE.wait(driver, 5, poll_frequency=0.1)
+            if confirm:
+                confirm.element.click()
+
+            confirmed = CONFIRMED_BUNDLE.wait(driver, 15, poll_frequency=0.2)
+
+        save_screenshot(driver, "booking_result")
+        result["success"] = bool(confirmed)
+        result["message"] = (
+            f"Booked {result['date']} at {slot_label}" if confirmed
+            else "Submitted booking but no confirmation was shown"
+        )
+        return result
+
+    except Exception as e:
+        logger.error(f"Error during auto-booking: {e}", exc_info=True)
+        save_screenshot(driver, "booking_error")
+        result["message"] = f"Error: {str(e)}"
+        return result
+
+    finally:
+        timings["total"] = round(time.perf_counter() - started, 3)
+        logger.info(f"Auto-booking finished in {timings['total']:.3f}s: {result['message']}")
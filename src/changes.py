@@ -0,0 +1,121 @@
+"""
+Availability change detection for the visa scheduler.
+Remembers the last-seen slots per (post, month) so alerts fire only on changes.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from typing import Dict, List, NamedTuple, Optional
+from src.config import Config
+from src.models import Appointment
+
+logger = logging.getLogger("visa_scheduler")
+
+
+class AvailabilityChange(NamedTuple):
+    """Slots that opened or closed since the previous check."""
+
+    added: List[Appointment]
+    removed: List[Appointment]
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed)
+
+
+class AvailabilityTracker:
+    """
+    Tracks the last-seen availability per (post, month), persisted to a JSON file.
+
+    A newly seen day is reported as added unless it was already alerted within
+    the cooldown, so a slot that flickers between checks does not re-alert.
+    """
+
+    def __init__(
+        self,
+        path: str = Config.AVAILABILITY_STATE_FILE,
+        cooldown_minutes: float = Config.SLOT_ALERT_COOLDOWN_MINUTES,
+        notify_removals: bool = Config.NOTIFY_ON_REMOVALS,
+    ):
+        """
+        Args:
+            path: JSON file the state is persisted in
+            cooldown_minutes: Minimum minutes between two alerts for the same slot
+            notify_removals: Whether closed slots are reported
+        """
+        self.path = path
+        self.cooldown_seconds = cooldown_minutes * 60
+        self.notify_removals = notify_removals
+        self._lock = threading.Lock()
+        self._state: Dict[str, Dict] = self._load()
+
+    def _load(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Could not read availability state {self.path}, starting fresh: {e}")
+            return {}
+
+    def _save(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Write to a temporary file first so a crash never leaves a torn state file
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self._state, f)
+        os.replace(temp_path, self.path)
+
+    def update(self, post: str, year: int, month: int, appointments: List[Appointment],
+               now: Optional[float] = None) -> AvailabilityChange:
+        """
+        Record the availability seen by a successful check and return what changed.
+
+        Args:
+            post: Consular post that was checked
+            year: Year of the checked calendar month
+            month: Checked calendar month (1-12)
+            appointments: Available appointments found by the check
+            now: Unix timestamp of the check (defaults to now)
+
+        Returns:
+            The slots that opened and, if enabled, the slots that closed
+        """
+        now = time.time() if now is None else now
+        key = f"{post}|{year:04d}-{month:02d}"
+
+        with self._lock:
+            entry = self._state.setdefault(key, {"days": [], "alerted": {}})
+            previous = set(entry["days"])
+            current = {apt.day: apt for apt in appointments}
+            alerted = entry["alerted"]
+
+            added = []
+            for day in sorted(set(current) - previous):
+                last_alert = alerted.get(str(day))
+                if last_alert is not None and now - last_alert < self.cooldown_seconds:
+                    logger.info(f"Day {day} reopened within cooldown, not alerting again")
+                    continue
+                added.append(current[day])
+                alerted[str(day)] = now
+
+            removed = []
+            if self.notify_removals:
+                removed = [Appointment(post, year, month, day) for day in sorted(previous - set(current))]
+
+            # Forget alert times once they are outside the cooldown
+            entry["alerted"] = {day: ts for day, ts in alerted.items() if now - ts < self.cooldown_seconds}
+            entry["days"] = sorted(current)
+
+            try:
+                self._save()
+            except Exception as e:
+                logger.error(f"Could not persist availability state: {e}")
+
+        return AvailabilityChange(added, removed)
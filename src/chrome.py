@@ -0,0 +1,180 @@
+"""
+Chrome bootstrap helpers for the visa scheduler.
+Detects the installed Chrome version, caches the patched chromedriver per
+version and waits for the browser's DevTools endpoint instead of sleeping.
+"""
+
+import os
+import re
+import sys
+import time
+import json
+import uuid
+import shutil
+import logging
+import threading
+import subprocess
+import urllib.request
+from typing import TYPE_CHECKING, Optional
+from src.config import Config
+from src import metrics
+
+if TYPE_CHECKING:
+    from selenium import webdriver
+
+logger = logging.getLogger("visa_scheduler")
+
+_version_lock = threading.Lock()
+_detected_version: Optional[int] = None
+_version_detected = False
+
+
+def _read_chrome_version() -> Optional[str]:
+    """Ask the installed Chrome for its version string."""
+    if sys.platform.startswith("win"):
+        for key in (r"HKEY_CURRENT_USER\Software\Google\Chrome\BLBeacon",
+                    r"HKEY_LOCAL_MACHINE\Software\Google\Chrome\BLBeacon"):
+            try:
+                output = subprocess.run(["reg", "query", key, "/v", "version"],
+                                        capture_output=True, text=True, timeout=10).stdout
+            except (OSError, subprocess.SubprocessError):
+                continue
+            if output.strip():
+                return output
+        return None
+
+    import undetected_chromedriver as uc
+
+    binary = uc.find_chrome_executable()
+    if not binary:
+        return None
+    return subprocess.run([binary, "--version"], capture_output=True, text=True, timeout=10).stdout
+
+
+def detect_chrome_version() -> Optional[int]:
+    """
+    Get the installed Chrome major version, detected once per process.
+
+    Config.CHROME_VERSION_MAIN overrides the detection when set.
+
+    Returns:
+        Major version such as 141, or None if it could not be detected
+    """
+    global _detected_version, _version_detected
+
+    if Config.CHROME_VERSION_MAIN:
+        return Config.CHROME_VERSION_MAIN
+
+    with _version_lock:
+        if not _version_detected:
+            try:
+                match = re.search(r"(\d+)\.\d+\.\d+", _read_chrome_version() or "")
+                _detected_version = int(match.group(1)) if match else None
+            except Exception as e:
+                logger.warning(f"Could not detect Chrome version: {e}")
+                _detected_version = None
+            _version_detected = True
+
+            if _detected_version:
+                logger.info(f"Detected Chrome {_detected_version}")
+            else:
+                logger.warning("Chrome version not detected, letting undetected-chromedriver pick a driver")
+
+        return _detected_version
+
+
+def cached_driver_path(version: int) -> str:
+    """Path of the cached patched chromedriver for a Chrome major version."""
+    suffix = ".exe" if sys.platform.startswith("win") else ""
+    return os.path.abspath(os.path.join(Config.DRIVER_CACHE_DIR, f"chromedriver_{version}{suffix}"))
+
+
+def store_patched_driver(driver: "webdriver.Chrome", path: str) -> bool:
+    """
+    Copy the chromedriver a driver was started with into the cache.
+
+    Args:
+        driver: Driver started by undetected-chromedriver (already patched)
+        path: Cache path to store the binary at
+
+    Returns:
+        True if the binary was cached
+    """
+    patcher = getattr(driver, "patcher", None)
+    source = getattr(patcher, "executable_path", None)
+    if not source or not os.path.exists(source):
+        return False
+
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Copy under a temporary name unique to this call so concurrent starts never see a partial binary
+        temp_path = f"{path}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp"
+        shutil.copy2(source, temp_path)
+        os.chmod(temp_path, 0o755)
+        os.replace(temp_path, path)
+        logger.info(f"Cached patched chromedriver at {path}")
+        return True
+    except OSError as e:
+        logger.warning(f"Could not cache chromedriver: {e}")
+        return False
+
+
+def discard_cached_driver(path: str) -> None:
+    """Remove a cached chromedriver that failed to start."""
+    try:
+        os.remove(path)
+        logger.warning(f"Removed cached chromedriver {path}")
+    except OSError:
+        pass
+
+
+def wait_until_ready(driver: "webdriver.Chrome", timeout: float = Config.DRIVER_READY_TIMEOUT) -> float:
+    """
+    Wait until the browser answers on DevTools and WebDriver.
+
+    Polls the DevTools /json/version endpoint (when the debugger address is
+    known) and then the document readiness over WebDriver.
+
+    Args:
+        driver: Freshly started driver
+        timeout: Maximum seconds to wait
+
+    Returns:
+        Seconds waited
+
+    Raises:
+        TimeoutError: If the browser did not become ready in time
+    """
+    started = time.monotonic()
+    deadline = started + timeout
+    address = getattr(getattr(driver, "options", None), "debugger_address", None)
+
+    if address:
+        while True:
+            try:
+                with urllib.request.urlopen(f"http://{address}/json/version", timeout=1) as response:
+                    json.load(response)
+                break
+            except Exception:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"DevTools at {address} not ready after {timeout:.0f}s")
+                time.sleep(0.1)
+
+    while True:
+        try:
+            if driver.execute_script("return document.readyState") in ("interactive", "complete"):
+                return time.monotonic() - started
+        except Exception as e:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Browser not ready after {timeout:.0f}s: {e}")
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Browser not ready after {timeout:.0f}s")
+        time.sleep(0.1)
+
+
+def record_startup(warm: bool, seconds: float) -> None:
+    """Count a driver start and record its duration in the metrics registry."""
+    kind = "warm" if warm else "cold"
+    metrics.registry.inc("driver_starts_total", kind=kind)
+    metrics.registry.observe("driver_start_seconds", seconds, kind=kind)
+    logger.info(f"🚀 Chrome ready in {seconds:.2f}s ({kind} start)")
@@ -5,7 +5,7 @@ Loads settings from environment variables.
 
 import os
 from dotenv import load_dotenv
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 # Load environment variables
 load_dotenv()
@@ -40,15 +40,107 @@ class Config:
     CHECK_INTERVAL_MIN: int = int(os.getenv("CHECK_INTERVAL_MIN", "50"))
     CHECK_INTERVAL_MAX: int = int(os.getenv("CHECK_INTERVAL_MAX", "70"))
     
+    # Adaptive polling: spend a daily check budget where slots have been seen opening
+    ADAPTIVE_POLLING: bool = os.getenv("ADAPTIVE_POLLING", "True").lower() == "true"
+    DAILY_CHECK_BUDGET: float = float(os.getenv("DAILY_CHECK_BUDGET", "24"))
+    MIN_CHECK_SPACING_MINUTES: float = float(os.getenv("MIN_CHECK_SPACING_MINUTES", "15"))
+    MAX_CHECK_SPACING_MINUTES: float = float(os.getenv("MAX_CHECK_SPACING_MINUTES", "180"))
+    POLL_JITTER: float = float(os.getenv("POLL_JITTER", "0.2"))
+    POLL_LOOKBACK_DAYS: float = float(os.getenv("POLL_LOOKBACK_DAYS", "28"))
+    POLL_HALF_LIFE_DAYS: float = float(os.getenv("POLL_HALF_LIFE_DAYS", "14"))
+    POLL_MIN_OPENINGS: int = int(os.getenv("POLL_MIN_OPENINGS", "5"))
+    POLL_EXPLORATION: float = float(os.getenv("POLL_EXPLORATION", "0.2"))
+    POLL_MAX_ATTRIBUTION_HOURS: float = float(os.getenv("POLL_MAX_ATTRIBUTION_HOURS", "6"))
+    
+    # Pre-warmed authentication: log in ahead of each planned check (seconds)
+    PREWARM_AUTH: bool = os.getenv("PREWARM_AUTH", "True").lower() == "true"
+    PREWARM_INITIAL_SECONDS: float = float(os.getenv("PREWARM_INITIAL_SECONDS", "90"))
+    PREWARM_EWMA_ALPHA: float = float(os.getenv("PREWARM_EWMA_ALPHA", "0.3"))
+    PREWARM_SAFETY_SIGMAS: float = float(os.getenv("PREWARM_SAFETY_SIGMAS", "2"))
+    PREWARM_MARGIN_SECONDS: float = float(os.getenv("PREWARM_MARGIN_SECONDS", "10"))
+    
+    # Session keepalive: keep the logged-in browser on the calendar between checks
+    SESSION_KEEPALIVE: bool = os.getenv("SESSION_KEEPALIVE", "False").lower() == "true"
+    KEEPALIVE_PING_SECONDS: float = float(os.getenv("KEEPALIVE_PING_SECONDS", "240"))
+    KEEPALIVE_PING_TIMEOUT: float = float(os.getenv("KEEPALIVE_PING_TIMEOUT", "15"))
+    
+    # Driver pool: browsers started ahead of checks in continuous mode (0 disables)
+    DRIVER_POOL_SIZE: int = int(os.getenv("DRIVER_POOL_SIZE", "1"))
+    DRIVER_POOL_MAX_IDLE_MINUTES: float = float(os.getenv("DRIVER_POOL_MAX_IDLE_MINUTES", "120"))
+    DRIVER_POOL_CHECK_SECONDS: float = float(os.getenv("DRIVER_POOL_CHECK_SECONDS", "60"))
+    
+    # Browser recycling: limits for a kept browser's whole process tree (0 disables a limit)
+    BROWSER_MAX_RSS_MB: float = float(os.getenv("BROWSER_MAX_RSS_MB", "1500"))
+    BROWSER_MAX_CPU_PERCENT: float = float(os.getenv("BROWSER_MAX_CPU_PERCENT", "90"))
+    BROWSER_MAX_AGE_MINUTES: float = float(os.getenv("BROWSER_MAX_AGE_MINUTES", "360"))
+    
+    # Hung-step watchdog: per-step budgets (seconds, "step:seconds,...") and a hard cap per check
+    STEP_WATCHDOG: bool = os.getenv("STEP_WATCHDOG", "True").lower() == "true"
+    STEP_BUDGETS: Dict[str, float] = {
+        "driver_setup": 120, "authentication": 420, "calendar_check": 240, "calendar_refresh": 120,
+        "booking": 180, "notification": 60, "driver_quit": 30,
+        **{
+            step.strip(): float(seconds)
+            for step, _, seconds in (item.partition(":") for item in os.getenv("STEP_BUDGETS", "").split(","))
+            if step.strip() and seconds
+        },
+    }
+    STEP_DEFAULT_BUDGET: float = float(os.getenv("STEP_DEFAULT_BUDGET", "300"))
+    CHECK_DEADLINE: float = float(os.getenv("CHECK_DEADLINE", "1200"))
+    STEP_KILL_GRACE_SECONDS: float = float(os.getenv("STEP_KILL_GRACE_SECONDS", "30"))
+    
+    # Time slots: load the offered times of each available date, bounded per month (seconds)
+    FETCH_TIME_SLOTS: bool = os.getenv("FETCH_TIME_SLOTS", "True").lower() == "true"
+    TIME_SLOT_BUDGET: int = int(os.getenv("TIME_SLOT_BUDGET", "20"))
+    
+    # Auto-booking (opt-in). Dry run stops before the final confirmation.
+    AUTO_BOOK: bool = os.getenv("AUTO_BOOK", "False").lower() == "true"
+    BOOKING_DRY_RUN: bool = os.getenv("BOOKING_DRY_RUN", "True").lower() == "true"
+    BOOKING_EARLIEST_DAY: int = int(os.getenv("BOOKING_EARLIEST_DAY", "1"))
+    BOOKING_LATEST_DAY: int = int(os.getenv("BOOKING_LATEST_DAY", "31"))
+    BOOKING_TIME_FROM: str = os.getenv("BOOKING_TIME_FROM", "00:00")
+    BOOKING_TIME_TO: str = os.getenv("BOOKING_TIME_TO", "23:59")
+    
     # Notification settings
     TELEGRAM_BOT_TOKEN: Optional[str] = os.getenv("TELEGRAM_BOT_TOKEN")
     TELEGRAM_CHAT_ID: Optional[str] = os.getenv("TELEGRAM_CHAT_ID")
     EMAIL_ADDRESS: Optional[str] = os.getenv("EMAIL_ADDRESS")
     EMAIL_PASSWORD: Optional[str] = os.getenv("EMAIL_PASSWORD")
+    
+    TELEGRAM_API_URL: str = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+    
+    # SMTP servers tried in order ("host:port", comma separated); port 465 uses implicit TLS
+    SMTP_HOSTS: List[str] = [
+        host.strip()
+        for host in os.getenv("SMTP_HOSTS", "smtp.gmail.com:587,smtp.mail.yahoo.com:587").split(",")
+        if host.strip()
+    ]
+    SMTP_STARTTLS: bool = os.getenv("SMTP_STARTTLS", "True").lower() == "true"
+    
+    # Webhooks: compact JSON events POSTed to these URLs (comma separated), HMAC-signed
+    WEBHOOK_URLS: List[str] = [
+        url.strip() for url in os.getenv("WEBHOOK_URLS", "").split(",") if url.strip()
+    ]
+    WEBHOOK_SECRET: str = os.getenv("WEBHOOK_SECRET", "")
+    WEBHOOK_COALESCE_SECONDS: float = float(os.getenv("WEBHOOK_COALESCE_SECONDS", "0.5"))
+    
+    # Keep-alive connections of notifiers are reopened after this many idle seconds
+    CONNECTION_IDLE_TIMEOUT: float = float(os.getenv("CONNECTION_IDLE_TIMEOUT", "300"))
+    
+    # Notification fan-out limits (seconds): per channel, and for all channels together
+    NOTIFY_CHANNEL_TIMEOUT: float = float(os.getenv("NOTIFY_CHANNEL_TIMEOUT", "15"))
+    NOTIFY_DEADLINE: float = float(os.getenv("NOTIFY_DEADLINE", "30"))
+    NOTIFY_PARALLEL_ALERTS: int = int(os.getenv("NOTIFY_PARALLEL_ALERTS", "4"))
 
     # Claude API for CAPTCHA solving
     ANTHROPIC_API_KEY: Optional[str] = os.getenv("ANTHROPIC_API_KEY")
 
+    # Chrome bootstrap: 0 detects the installed Chrome major version
+    CHROME_VERSION_MAIN: int = int(os.getenv("CHROME_VERSION_MAIN", "0"))
+    DRIVER_CACHE_DIR: str = os.getenv("DRIVER_CACHE_DIR", "data/drivers")
+    DRIVER_READY_TIMEOUT: float = float(os.getenv("DRIVER_READY_TIMEOUT", "20"))
+    DRIVER_START_RETRIES: int = int(os.getenv("DRIVER_START_RETRIES", "3"))
+
     # Selenium settings
     HEADLESS: bool = os.getenv("HEADLESS", "True").lower() == "true"
     IMPLICIT_WAIT: int = 10
@@ -58,9 +150,59 @@ class Config:
     SCREENSHOT_DIR: str = "screenshots"
     SAVE_SCREENSHOTS: bool = True
     
+    # Subscribers: JSON file mapping (post, month range) subscriptions to recipients
+    SUBSCRIBERS_FILE: str = os.getenv("SUBSCRIBERS_FILE", "subscribers.json")
+    
+    # Per-channel send rates for batched delivery (Telegram allows ~30 messages/s per bot)
+    TELEGRAM_RATE_PER_SECOND: float = float(os.getenv("TELEGRAM_RATE_PER_SECOND", "25"))
+    TELEGRAM_RATE_BURST: int = int(os.getenv("TELEGRAM_RATE_BURST", "5"))
+    EMAIL_RATE_PER_SECOND: float = float(os.getenv("EMAIL_RATE_PER_SECOND", "1"))
+    EMAIL_BATCH_SIZE: int = int(os.getenv("EMAIL_BATCH_SIZE", "50"))
+    
+    # Durable notification outbox with retry and backoff
+    NOTIFICATION_OUTBOX: bool = os.getenv("NOTIFICATION_OUTBOX", "True").lower() == "true"
+    OUTBOX_DB: str = os.getenv("OUTBOX_DB", "data/outbox.db")
+    OUTBOX_MAX_ATTEMPTS: int = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+    OUTBOX_RETRY_BASE_SECONDS: float = float(os.getenv("OUTBOX_RETRY_BASE_SECONDS", "5"))
+    OUTBOX_RETRY_MAX_SECONDS: float = float(os.getenv("OUTBOX_RETRY_MAX_SECONDS", "900"))
+    # Identical alerts within this window are sent once; the same alert later on goes out again
+    OUTBOX_DEDUPE_MINUTES: float = float(os.getenv("OUTBOX_DEDUPE_MINUTES", "60"))
+    
+    # Change detection: alert only on newly opened slots
+    AVAILABILITY_STATE_FILE: str = os.getenv("AVAILABILITY_STATE_FILE", "data/availability_state.json")
+    SLOT_ALERT_COOLDOWN_MINUTES: int = int(os.getenv("SLOT_ALERT_COOLDOWN_MINUTES", "180"))
+    NOTIFY_ON_REMOVALS: bool = os.getenv("NOTIFY_ON_REMOVALS", "False").lower() == "true"
+    
+    # Availability history (SQLite)
+    HISTORY_DB: str = os.getenv("HISTORY_DB", "data/history.db")
+    
+    # Metrics and health HTTP endpoint for continuous mode (port 0 disables)
+    METRICS_HOST: str = os.getenv("METRICS_HOST", "127.0.0.1")
+    METRICS_PORT: int = int(os.getenv("METRICS_PORT", "0"))
+    HEALTH_MAX_SILENCE_MINUTES: float = float(os.getenv("HEALTH_MAX_SILENCE_MINUTES", "240"))
+    
+    # Per-check tracing: spans logged as one JSON record, Chrome trace files if a directory is set
+    TRACING: bool = os.getenv("TRACING", "True").lower() == "true"
+    TRACE_CHROME_DIR: str = os.getenv("TRACE_CHROME_DIR", "")
+    
+    # WebDriver command profile: top-N report per check and command budgets ("step_or_function:count,...")
+    COMMAND_PROFILE: bool = os.getenv("COMMAND_PROFILE", "True").lower() == "true"
+    COMMAND_PROFILE_TOP: int = int(os.getenv("COMMAND_PROFILE_TOP", "10"))
+    COMMAND_BUDGETS: Dict[str, int] = {
+        name.strip(): int(count)
+        for name, _, count in (item.partition(":") for item in os.getenv("COMMAND_BUDGETS", "").split(","))
+        if name.strip() and count
+    }
+    
     # Logging
     LOG_DIR: str = "logs"
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json").lower()  # Log file format: json or text
+    # Rotate by "size" or at a TimedRotatingFileHandler interval (midnight, H, D, W0-W6)
+    LOG_ROTATE: str = os.getenv("LOG_ROTATE", "midnight")
+    LOG_MAX_BYTES: int = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+    LOG_BACKUP_COUNT: int = int(os.getenv("LOG_BACKUP_COUNT", "14"))
+    LOG_COMPRESS: bool = os.getenv("LOG_COMPRESS", "True").lower() == "true"
     
     @classmethod
     def validate(cls) -> bool:
@@ -0,0 +1,277 @@
+"""
+DOM lookup helpers for the visa scheduler.
+Probes the page without paying the driver's implicit wait on every miss, and
+resolves fallback selector lists in a single browser round trip.
+"""
+
+import logging
+from contextlib import contextmanager
+from typing import Iterator, List, NamedTuple, Optional, Sequence, Tuple
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.remote.webelement import WebElement
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException
+from src.config import Config
+
+logger = logging.getLogger("visa_scheduler")
+
+Selector = Tuple[str, str]
+
+
+@contextmanager
+def no_implicit_wait(driver: webdriver.Chrome) -> Iterator[None]:
+    """
+    Temporarily disable the driver's implicit wait.
+
+    Speculative lookups that are expected to miss would otherwise block for
+    Config.IMPLICIT_WAIT seconds each before raising.
+
+    Args:
+        driver: Selenium WebDriver instance
+    """
+    driver.implicitly_wait(0)
+    try:
+        yield
+    finally:
+        driver.implicitly_wait(Config.IMPLICIT_WAIT)
+
+
+def find_all(driver: webdriver.Chrome, by: str, selector: str) -> List[WebElement]:
+    """
+    Find all elements matching a selector without waiting for them to appear.
+
+    Args:
+        driver: Selenium WebDriver instance
+        by: Locator strategy (a selenium By value)
+        selector: Locator value
+
+    Returns:
+        List of matching elements (empty if none)
+    """
+    with no_implicit_wait(driver):
+        try:
+            return driver.find_elements(by, selector)
+        except Exception as e:
+            logger.debug(f"Lookup failed for {selector}: {e}")
+            return []
+
+
+def find_first(
+    driver: webdriver.Chrome,
+    selectors: Sequence[Selector],
+    displayed: bool = True,
+) -> Optional[Tuple[WebElement, int]]:
+    """
+    Try a fallback list of selectors in order without implicit waits.
+
+    Args:
+        driver: Selenium WebDriver instance
+        selectors: Ordered list of (By, selector) pairs
+        displayed: Only accept elements that are currently displayed
+
+    Returns:
+        Tuple of (element, index of the matching selector) or None
+    """
+    with no_implicit_wait(driver):
+        for index, (by, selector) in enumerate(selectors):
+            try:
+                for element in driver.find_elements(by, selector):
+                    if not displayed or element.is_displayed():
+                        return element, index
+            except Exception as e:
+                logger.debug(f"Error with selector {selector}: {e}")
+                continue
+
+    return None
+
+
+class BundleMatch(NamedTuple):
+    """An element found by a SelectorBundle."""
+
+    element: WebElement
+    index: int  # Position of the matching selector in the bundle
+    text: str
+
+
+# Shared body for bundle scripts. The ordered selector list is walked in the
+# browser and the matches of the first selector that yields anything are
+# returned, so priority order is kept without one round trip per selector.
+# With eachSelector the matches of every selector are returned in order.
+_BUNDLE_SCRIPT = """
+var specs = arguments[0], firstOnly = arguments[1], eachSelector = arguments[2];
+var found = [], seen = [];
+
+function locate(kind, value) {
+    var nodes = [], i;
+    if (kind === 'xpath') {
+        var result = document.evaluate(value, document, null,
+            XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+        for (i = 0; i < result.snapshotLength; i++) { nodes.push(result.snapshotItem(i)); }
+    } else if (kind === 'css') {
+        nodes = Array.prototype.slice.call(document.querySelectorAll(value));
+    } else {
+        var links = document.getElementsByTagName('a');
+        for (i = 0; i < links.length; i++) {
+            var linkText = (links[i].innerText || links[i].textContent || '').trim();
+            if (kind === 'link' ? linkText === value : linkText.indexOf(value) !== -1) {
+                nodes.push(links[i]);
+            }
+        }
+    }
+    return nodes;
+}
+
+function visible(el) {
+    if (!el.getClientRects().length) { return false; }
+    var style = window.getComputedStyle(el);
+    return style.visibility !== 'hidden' && style.display !== 'none';
+}
+
+function accept(el, text) {
+    return %s;
+}
+
+for (var i = 0; i < specs.length; i++) {
+    var nodes;
+    try { nodes = locate(specs[i][0], specs[i][1]); } catch (e) { continue; }
+
+    var matches = [];
+    for (var j = 0; j < nodes.length; j++) {
+        var el = nodes[j];
+        if (el.nodeType !== 1 || seen.indexOf(el) !== -1) { continue; }
+        var text = (el.innerText || el.textContent || '').trim();
+        if (!accept(el, text)) { continue; }
+        matches.push([el, i, text]);
+        seen.push(el);
+        if (firstOnly) { break; }
+    }
+    if (matches.length && !eachSelector) { return matches; }
+    found = found.concat(matches);
+}
+return found;
+"""
+
+_CSS_TEMPLATES = {
+    By.ID: '[id="{}"]',
+    By.NAME: '[name="{}"]',
+    By.CLASS_NAME: '.{}',
+    By.TAG_NAME: '{}',
+    By.CSS_SELECTOR: '{}',
+}
+
+
+def _compile_selector(by: str, selector: str) -> Tuple[str, str]:
+    """Translate a (By, selector) pair into a locator the bundle script understands."""
+    if by == By.XPATH:
+        return "xpath", selector
+    if by == By.LINK_TEXT:
+        return "link", selector
+    if by == By.PARTIAL_LINK_TEXT:
+        return "partial", selector
+    if by in _CSS_TEMPLATES:
+        return "css", _CSS_TEMPLATES[by].format(selector.replace('"', '\\"'))
+    raise ValueError(f"Unsupported locator strategy: {by}")
+
+
+class SelectorBundle:
+    """
+    An ordered fallback list of selectors resolved in one browser round trip.
+
+    Selectors are tried in priority order inside the page, and the first one
+    that matches an acceptable element wins.
+    """
+
+    def __init__(
+        self,
+        selectors: Sequence[Selector],
+        displayed: bool = True,
+        clickable: bool = False,
+        where: Optional[str] = None,
+    ):
+        """
+        Args:
+            selectors: Ordered list of (By, selector) pairs
+            displayed: Only accept elements that are currently displayed
+            clickable: Only accept displayed elements that are not disabled
+            where: Extra JavaScript condition over `el` and its trimmed `text`
+        """
+        self.selectors = list(selectors)
+        self._specs = [_compile_selector(by, selector) for by, selector in self.selectors]
+
+        conditions = []
+        if displayed or clickable:
+            conditions.append("visible(el)")
+        if clickable:
+            conditions.append("!el.disabled")
+        if where:
+            conditions.append(f"({where})")
+        self._script = _BUNDLE_SCRIPT % (" && ".join(conditions) or "true")
+
+    def describe(self, index: int) -> str:
+        """Return the selector string at the given bundle index."""
+        return self.selectors[index][1]
+
+    def _evaluate(self, driver: webdriver.Chrome, first_only: bool, each_selector: bool = False) -> List[BundleMatch]:
+        rows = driver.execute_script(self._script, self._specs, first_only, each_selector) or []
+        return [BundleMatch(element, int(index), text) for element, index, text in rows]
+
+    def find(self, driver: webdriver.Chrome) -> Optional[BundleMatch]:
+        """
+        Find the first acceptable element, honouring selector priority.
+
+        Args:
+            driver: Selenium WebDriver instance
+
+        Returns:
+            The match or None if no selector matched
+        """
+        matches = self._evaluate(driver, first_only=True)
+        return matches[0] if matches else None
+
+    def find_all(self, driver: webdriver.Chrome) -> List[BundleMatch]:
+        """
+        Find every acceptable element for the highest-priority matching selector.
+
+        Args:
+            driver: Selenium WebDriver instance
+
+        Returns:
+            List of matches, all from the same selector (empty if none matched)
+        """
+        return self._evaluate(driver, first_only=False)
+
+    def candidates(self, driver: webdriver.Chrome) -> List[BundleMatch]:
+        """
+        Find the first acceptable element of every selector, in priority order.
+
+        Lets callers fall back to the next selector when acting on a match
+        fails, still in one round trip. An element matched by several
+        selectors is only returned once.
+
+        Args:
+            driver: Selenium WebDriver instance
+
+        Returns:
+            List of matches, at most one per selector
+        """
+        return self._evaluate(driver, first_only=True, each_selector=True)
+
+    def wait(self, driver: webdriver.Chrome, timeout: float, poll_frequency: float = 0.25) -> Optional[BundleMatch]:
+        """
+        Poll the bundle until any selector matches or the timeout expires.
+
+        Args:
+            driver: Selenium WebDriver instance
+            timeout: Maximum seconds to wait
+            poll_frequency: Seconds between evaluations
+
+        Returns:
+            The match or None on timeout
+        """
+        try:
+            return WebDriverWait(driver, timeout, poll_frequency=poll_frequency).until(
+                lambda d: self.find(d)
+            )
+        except TimeoutException:
+            return None
@@ -0,0 +1,373 @@
+"""
+Availability history for the visa scheduler.
+Stores the outcome of every check in SQLite and answers time-series queries.
+
+Usage:
+    python -m src.history checks [--post ISTANBUL] [--limit 20]
+    python -m src.history openings [--post ISTANBUL] [--month 2025-12]
+    python -m src.history hours [--post ISTANBUL]
+    python -m src.history latency [--days 7]
+"""
+
+import os
+import json
+import time
+import sqlite3
+import argparse
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from src.config import Config
+from src.models import Appointment
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    check_id TEXT NOT NULL UNIQUE,
+    ts REAL NOT NULL,
+    post TEXT NOT NULL,
+    month TEXT NOT NULL,
+    success INTEGER NOT NULL,
+    message TEXT,
+    available_days TEXT NOT NULL,
+    duration REAL,
+    step_durations TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_checks_post_month_ts ON checks (post, month, ts);
+CREATE INDEX IF NOT EXISTS idx_checks_ts ON checks (ts);
+
+CREATE TABLE IF NOT EXISTS slots (
+    check_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    post TEXT NOT NULL,
+    month TEXT NOT NULL,
+    day INTEGER NOT NULL,
+    times TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_slots_post_month_ts ON slots (post, month, ts);
+"""
+
+
+def month_key(year: int, month: int) -> str:
+    """Format a calendar month as the "YYYY-MM" key used by the history tables."""
+    return f"{year:04d}-{month:02d}"
+
+
+class HistoryStore:
+    """
+    Append-only SQLite store of check outcomes.
+
+    Records are buffered in memory and written in one transaction per flush,
+    either when the buffer is full or when flush() is called explicitly.
+    """
+
+    def __init__(self, path: str = Config.HISTORY_DB, batch_size: int = 20):
+        """
+        Args:
+            path: SQLite database file
+            batch_size: Number of buffered checks that triggers a flush
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._pending_checks: List[Tuple] = []
+        self._pending_slots: List[Tuple] = []
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def record_check(
+        self,
+        check_id: str,
+        post: str,
+        year: int,
+        month: int,
+        success: bool,
+        message: str = "",
+        appointments: Optional[List[Appointment]] = None,
+        step_durations: Optional[Dict[str, float]] = None,
+        duration: Optional[float] = None,
+        ts: Optional[float] = None,
+    ) -> None:
+        """
+        Buffer the outcome of one check.
+
+        Args:
+            check_id: Unique identifier of the check
+            post: Consular post that was checked
+            year: Year of the checked calendar month
+            month: Checked calendar month (1-12)
+            success: Whether the check completed
+            message: Result or error message
+            appointments: Available appointments found
+            step_durations: Seconds spent per step
+            duration: Total seconds spent on the check
+            ts: Unix timestamp of the check (defaults to now)
+        """
+        ts = time.time() if ts is None else ts
+        key = month_key(year, month)
+        appointments = appointments or []
+        days = sorted({apt.day for apt in appointments})
+
+        with self._lock:
+            self._pending_checks.append((
+                check_id, ts, post, key, int(success), message,
+                json.dumps(days), duration, json.dumps(step_durations or {}),
+            ))
+            self._pending_slots.extend(
+                (check_id, ts, post, key, apt.day, json.dumps(list(apt.times)))
+                for apt in appointments
+            )
+            should_flush = len(self._pending_checks) >= self.batch_size
+
+        if should_flush:
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        Write all buffered records in a single transaction.
+
+        Returns:
+            Number of checks written
+        """
+        with self._lock:
+            checks, slots = self._pending_checks, self._pending_slots
+            self._pending_checks, self._pending_slots = [], []
+
+            if not checks:
+                return 0
+
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO checks (check_id, ts, post, month, success, message, "
+                    "available_days, duration, step_durations) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    checks,
+                )
+                self._conn.executemany(
+                    "INSERT INTO slots (check_id, ts, post, month, day, times) VALUES (?, ?, ?, ?, ?, ?)",
+                    slots,
+                )
+
+            return len(checks)
+
+    def close(self) -> None:
+        """Flush pending records and close the database."""
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def recent_checks(self, post: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Get the most recent checks, newest first.
+
+        Args:
+            post: Only include this consular post
+            limit: Maximum number of checks
+
+        Returns:
+            List of check dictionaries
+        """
+        sql = "SELECT * FROM checks"
+        params: Tuple = ()
+        if post:
+            sql += " WHERE post = ?"
+            params = (post,)
+        sql += " ORDER BY ts DESC LIMIT ?"
+
+        checks = []
+        for row in self._query(sql, params + (limit,)):
+            check = dict(row)
+            check["available_days"] = json.loads(check["available_days"])
+            check["step_durations"] = json.loads(check["step_durations"])
+            checks.append(check)
+        return checks
+
+    def slot_lifetimes(self, post: str, month: str, since: float = 0) -> List[Dict[str, Any]]:
+        """
+        Reconstruct when each slot opened and closed from successful checks.
+
+        A slot opens at the first check where its day is available after a
+        check where it was not, and closes at the first check where it is gone.
+        Days already available at the first considered check are included
+        with "previous_check" None, since when they opened is unknown.
+
+        Args:
+            post: Consular post
+            month: Calendar month as "YYYY-MM"
+            since: Only consider checks after this Unix timestamp
+
+        Returns:
+            List of {"day", "opened", "closed", "previous_check"} dictionaries.
+            "closed" is None for slots that are still open; "previous_check"
+            is the timestamp of the last check that did not see the slot.
+        """
+        rows = self._query(
+            "SELECT ts, available_days FROM checks "
+            "WHERE post = ? AND month = ? AND ts >= ? AND success = 1 ORDER BY ts",
+            (post, month, since),
+        )
+
+        lifetimes = []
+        open_slots: Dict[int, Dict[str, Any]] = {}
+        previous_ts = None
+        for row in rows:
+            days = set(json.loads(row["available_days"]))
+
+            for day in days - set(open_slots):
+                open_slots[day] = {"day": day, "opened": row["ts"], "closed": None,
+                                   "previous_check": previous_ts}
+            for day in set(open_slots) - days:
+                slot = open_slots.pop(day)
+                slot["closed"] = row["ts"]
+                lifetimes.append(slot)
+
+            previous_ts = row["ts"]
+
+        lifetimes.extend(open_slots.values())
+        return sorted(lifetimes, key=lambda slot: slot["opened"])
+
+    def months(self, post: Optional[str] = None) -> List[Tuple[str, str]]:
+        """List the (post, month) pairs that have recorded checks."""
+        sql = "SELECT DISTINCT post, month FROM checks"
+        params: Tuple = ()
+        if post:
+            sql += " WHERE post = ?"
+            params = (post,)
+        return [(row["post"], row["month"]) for row in self._query(sql + " ORDER BY post, month", params)]
+
+    def openings(self, post: Optional[str] = None, month: Optional[str] = None,
+                 since: float = 0) -> List[Dict[str, Any]]:
+        """
+        List slot openings across the recorded (post, month) pairs.
+
+        Slots that were already open at the first considered check are left
+        out: they were not seen opening, and counting them at that check's
+        time would skew the per-hour opening statistics.
+
+        Args:
+            post: Only include this consular post
+            month: Only include this calendar month ("YYYY-MM")
+            since: Only consider checks after this Unix timestamp
+
+        Returns:
+            Slot lifetime dictionaries with "post" and "month" added
+        """
+        openings = []
+        for pair_post, pair_month in self.months(post):
+            if month and pair_month != month:
+                continue
+            for slot in self.slot_lifetimes(pair_post, pair_month, since):
+                if slot["previous_check"] is None:
+                    continue
+                slot.update(post=pair_post, month=pair_month)
+                openings.append(slot)
+        return sorted(openings, key=lambda slot: slot["opened"])
+
+    def step_latency(self, since: float = 0) -> Dict[str, Dict[str, float]]:
+        """
+        Summarize per-step durations of successful checks.
+
+        Args:
+            since: Only consider checks after this Unix timestamp
+
+        Returns:
+            Mapping of step name to {"count", "mean", "p50", "p95", "max"}
+        """
+        samples: Dict[str, List[float]] = {}
+        rows = self._query(
+            "SELECT duration, step_durations FROM checks WHERE ts >= ? AND success = 1", (since,)
+        )
+        for row in rows:
+            steps = json.loads(row["step_durations"])
+            if row["duration"] is not None:
+                steps["total"] = row["duration"]
+            for step, seconds in steps.items():
+                samples.setdefault(step, []).append(seconds)
+
+        summary = {}
+        for step, values in samples.items():
+            values.sort()
+            summary[step] = {
+                "count": len(values),
+                "mean": sum(values) / len(values),
+                "p50": values[len(values) // 2],
+                "p95": values[min(len(values) - 1, int(len(values) * 0.95))],
+                "max": values[-1],
+            }
+        return summary
+
+
+def _format_ts(ts: Optional[float]) -> str:
+    return datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M') if ts else "-"
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Command-line interface for querying the availability history."""
+    parser = argparse.ArgumentParser(prog="python -m src.history", description="Query availability history")
+    parser.add_argument("--db", default=Config.HISTORY_DB, help="SQLite database file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    checks_cmd = commands.add_parser("checks", help="Show recent checks")
+    checks_cmd.add_argument("--post")
+    checks_cmd.add_argument("--limit", type=int, default=20)
+
+    openings_cmd = commands.add_parser("openings", help="Show when slots opened and how long they lasted")
+    openings_cmd.add_argument("--post")
+    openings_cmd.add_argument("--month", help="Calendar month as YYYY-MM")
+
+    hours_cmd = commands.add_parser("hours", help="Show slot openings by weekday and hour")
+    hours_cmd.add_argument("--post")
+
+    latency_cmd = commands.add_parser("latency", help="Show per-step check latency")
+    latency_cmd.add_argument("--days", type=float, default=7)
+
+    args = parser.parse_args(argv)
+    store = HistoryStore(args.db)
+
+    try:
+        if args.command == "checks":
+            for check in store.recent_checks(args.post, args.limit):
+                status = "ok " if check["success"] else "ERR"
+                duration = f"{check['duration']:.1f}s" if check["duration"] is not None else "-"
+                print(f"{_format_ts(check['ts'])}  {status}  {check['post']:<12} {check['month']}  "
+                      f"{duration:>7}  days={check['available_days']}  {check['message'] or ''}")
+
+        elif args.command == "openings":
+            for slot in store.openings(args.post, args.month):
+                lasted = "still open"
+                if slot["closed"]:
+                    lasted = f"{(slot['closed'] - slot['opened']) / 60:.0f} min"
+                print(f"{_format_ts(slot['opened'])}  {slot['post']:<12} {slot['month']}-{slot['day']:02d}  "
+                      f"closed {_format_ts(slot['closed'])}  ({lasted})")
+
+        elif args.command == "hours":
+            counts = [[0] * 24 for _ in range(7)]
+            for slot in store.openings(args.post):
+                opened = datetime.fromtimestamp(slot["opened"])
+                counts[opened.weekday()][opened.hour] += 1
+            print("     " + " ".join(f"{hour:>2}" for hour in range(24)))
+            for weekday, name in enumerate(["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]):
+                print(f"{name}  " + " ".join(f"{count or '.':>2}" for count in counts[weekday]))
+
+        elif args.command == "latency":
+            summary = store.step_latency(since=time.time() - args.days * 86400)
+            print(f"{'step':<20} {'count':>6} {'mean':>8} {'p50':>8} {'p95':>8} {'max':>8}")
+            for step, stats in sorted(summary.items()):
+                print(f"{step:<20} {stats['count']:>6} {stats['mean']:>8.2f} {stats['p50']:>8.2f} "
+                      f"{stats['p95']:>8.2f} {stats['max']:>8.2f}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Startup-time benchmark for the visa scheduler.
+Imports modules in fresh interpreters under `python -X importtime` and
+reports the total import time and the heaviest imports.
+
+Usage:
+    python -m src.importtime [main src.history ...] [--runs 5] [--top 15]
+    python -m src.importtime main --budget-ms 150
+"""
+
+import re
+import sys
+import argparse
+import statistics
+import subprocess
+from typing import Dict, List, NamedTuple, Optional
+
+# Libraries that should only load when a browser or captcha solver is used
+HEAVY_PACKAGES = ("selenium", "undetected_chromedriver", "PIL", "pytesseract", "anthropic")
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+class ImportTiming(NamedTuple):
+    """One line of -X importtime output."""
+
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(output: str) -> List[ImportTiming]:
+    """
+    Parse the stderr of `python -X importtime`.
+
+    Args:
+        output: Captured stderr
+
+    Returns:
+        One entry per imported module, in import completion order
+    """
+    timings = []
+    for line in output.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            timings.append(ImportTiming(module, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return timings
+
+
+def measure(module: str) -> List[ImportTiming]:
+    """
+    Import a module in a fresh interpreter and collect its import timings.
+
+    Args:
+        module: Dotted module name, e.g. "main" or "src.history"
+
+    Returns:
+        Import timings of that interpreter
+
+    Raises:
+        RuntimeError: If the import fails
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr.strip().splitlines()[-1]}")
+    return parse_importtime(result.stderr)
+
+
+def total_ms(timings: List[ImportTiming], module: str) -> float:
+    """Cumulative import time of a module in milliseconds."""
+    for timing in timings:
+        if timing.module == module:
+            return timing.cumulative_us / 1000
+    return 0.0
+
+
+def heavy_packages(timings: List[ImportTiming]) -> Dict[str, float]:
+    """Milliseconds spent importing each heavy package that was loaded."""
+    found: Dict[str, float] = {}
+    parents: List[str] = []
+
+    # Parents are printed after their children, so walk backwards to know each importer
+    for timing in reversed(timings):
+        del parents[timing.depth:]
+        parent = parents[-1].split(".")[0] if parents else None
+        top = timing.module.split(".")[0]
+        if top in HEAVY_PACKAGES and parent != top:
+            found[top] = found.get(top, 0.0) + timing.cumulative_us / 1000
+        parents.append(timing.module)
+    return found
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Command-line interface for the import-time benchmark."""
+    parser = argparse.ArgumentParser(prog="python -m src.importtime", description="Benchmark module import time")
+    parser.add_argument("modules", nargs="*", default=["main", "src.history"], help="Modules to import")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per module (median is reported)")
+    parser.add_argument("--top", type=int, default=15, help="Heaviest imports to list")
+    parser.add_argument("--budget-ms", type=float, help="Exit with status 1 if a median exceeds this")
+    args = parser.parse_args(argv)
+
+    over_budget = False
+    for module in args.modules:
+        runs = [measure(module) for _ in range(max(args.runs, 1))]
+        totals = [total_ms(timings, module) for timings in runs]
+        median = statistics.median(totals)
+        timings = runs[totals.index(sorted(totals)[len(totals) // 2])]
+
+        print(f"{module}: {median:.1f} ms median over {len(runs)} run(s) "
+              f"(min {min(totals):.1f}, max {max(totals):.1f})")
+
+        print(f"  {'self ms':>8} {'cumul ms':>9}  module")
+        for timing in sorted(timings, key=lambda t: t.self_us, reverse=True)[:args.top]:
+            print(f"  {timing.self_us / 1000:>8.1f} {timing.cumulative_us / 1000:>9.1f}  {timing.module}")
+
+        heavy = heavy_packages(timings)
+        if heavy:
+            print("  heavy packages loaded at import: "
+                  + ", ".join(f"{name} ({ms:.0f} ms)" for name, ms in sorted(heavy.items())))
+
+        if args.budget_ms is not None and median > args.budget_ms:
+            print(f"  over budget: {median:.1f} ms > {args.budget_ms:.1f} ms")
+            over_budget = True
+        print()
+
+    if over_budget:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Logging pipeline for the visa scheduler.
+Hands records to a background listener thread through a queue, so writing
+and rotating log files never blocks a check, and writes them as JSON lines
+tagged with the current check ID and step.
+"""
+
+import os
+import gzip
+import json
+import queue
+import atexit
+import shutil
+import logging
+import contextvars
+import logging.handlers
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Iterator, Optional
+from src.config import Config
+
+# Check and step the current thread is working on, attached to every record
+_check_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("check_id", default=None)
+_step: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("step", default=None)
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+@contextmanager
+def log_context(check_id: Optional[str] = None, step: Optional[str] = None) -> Iterator[None]:
+    """
+    Tag the records logged inside the block with a check ID and/or step.
+
+    Args:
+        check_id: ID of the check being run
+        step: Name of the step being run
+    """
+    tokens = []
+    if check_id is not None:
+        tokens.append((_check_id, _check_id.set(check_id)))
+    if step is not None:
+        tokens.append((_step, _step.set(step)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+def current_step() -> Optional[str]:
+    """Name of the step the current thread is in, if any."""
+    return _step.get()
+
+
+class ContextFilter(logging.Filter):
+    """
+    Copies the current check ID and step onto records.
+
+    Must stay on the QueueHandler: it runs in the thread that logs, the only
+    place the context variables are set. On the listener's handlers it would
+    run in the listener thread and see none of them.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "check_id", None) is None:
+            record.check_id = _check_id.get()
+        if getattr(record, "step", None) is None:
+            record.step = _step.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the message, context and any `extra` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "check_id": getattr(record, "check_id", None),
+            "step": getattr(record, "step", None),
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and key not in entry:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that keeps exceptions separate from the message for the JSON output."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _compress(source: str, dest: str) -> None:
+    """Rotator that gzips the finished log file."""
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+def _file_handler(path: str) -> logging.Handler:
+    """Rotating file handler per Config.LOG_ROTATE, compressing rotated files."""
+    if Config.LOG_ROTATE == "size":
+        handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=Config.LOG_MAX_BYTES, backupCount=Config.LOG_BACKUP_COUNT, encoding="utf-8",
+        )
+    else:
+        handler = logging.handlers.TimedRotatingFileHandler(
+            path, when=Config.LOG_ROTATE, backupCount=Config.LOG_BACKUP_COUNT, encoding="utf-8",
+        )
+    if Config.LOG_COMPRESS:
+        handler.namer = lambda name: name + ".gz"
+        handler.rotator = _compress
+    return handler
+
+
+def setup_logging(name: str = "visa_scheduler") -> logging.Logger:
+    """
+    Attach the queued console and file logging to a logger.
+
+    Args:
+        name: Logger name
+
+    Returns:
+        Configured logger instance
+    """
+    global _listener
+
+    logger = logging.getLogger(name)
+    logger.setLevel(getattr(logging, Config.LOG_LEVEL))
+
+    # Avoid duplicate handlers
+    if logger.handlers:
+        return logger
+
+    os.makedirs(Config.LOG_DIR, exist_ok=True)
+
+    text_formatter = logging.Formatter(
+        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.INFO)
+    console_handler.setFormatter(text_formatter)
+
+    if Config.LOG_FORMAT == "json":
+        file_handler = _file_handler(os.path.join(Config.LOG_DIR, "visa_scheduler.jsonl"))
+        file_handler.setFormatter(JsonFormatter())
+    else:
+        file_handler = _file_handler(os.path.join(Config.LOG_DIR, "visa_scheduler.log"))
+        file_handler.setFormatter(text_formatter)
+    file_handler.setLevel(logging.DEBUG)
+
+    # The caller only enqueues; formatting, writing and rotation happen in the listener thread
+    log_queue: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+    queue_handler = _QueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+    logger.addHandler(queue_handler)
+
+    _listener = logging.handlers.QueueListener(log_queue, console_handler, file_handler,
+                                               respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+    return logger
+
+
+def stop_logging() -> None:
+    """Write out the queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,325 @@
+"""
+Metrics and health endpoint for the visa scheduler.
+Keeps counters, gauges and histograms of checks, steps, captcha solvers,
+browser starts and notifications, and serves them over HTTP as Prometheus
+text (/metrics) and as a JSON health document (/health).
+"""
+
+import re
+import json
+import time
+import logging
+import functools
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from src.config import Config
+
+logger = logging.getLogger("visa_scheduler")
+
+PREFIX = "visa_scheduler_"
+
+# Seconds; covers single WebDriver steps up to full logins
+DEFAULT_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+_HELP = {
+    "checks_total": ("counter", "Checks by outcome (success, failure, hung)"),
+    "check_duration_seconds": ("histogram", "Wall time of a whole check"),
+    "step_duration_seconds": ("histogram", "Wall time of each check step"),
+    "captcha_attempts_total": ("counter", "Captcha solver attempts by solver and outcome"),
+    "captcha_solve_seconds": ("histogram", "Time a captcha solver took"),
+    "driver_starts_total": ("counter", "Browser starts by kind (cold downloads a driver, warm reuses it)"),
+    "driver_start_seconds": ("histogram", "Time until a new browser answered"),
+    "notification_latency_seconds": ("histogram", "Time a notification channel took per alert"),
+    "notifications_total": ("counter", "Notifications by channel and outcome"),
+    "last_success_timestamp_seconds": ("gauge", "Unix time of the last successful check"),
+    "seconds_since_last_success": ("gauge", "Seconds since the last successful check (or start-up)"),
+    "next_check_timestamp_seconds": ("gauge", "Unix time the next check is planned for"),
+    "consecutive_failures": ("gauge", "Checks failed in a row"),
+    "uptime_seconds": ("gauge", "Seconds since the scheduler started"),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _name(name: str) -> str:
+    return PREFIX + re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{key}="{_escape(value)}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class MetricsRegistry:
+    """Thread-safe counters, gauges and histograms plus collectors of existing metrics dicts."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._gauges: Dict[Tuple[str, Labels], float] = {}
+        # (name, labels) -> [bucket counts, sum, count]
+        self._histograms: Dict[Tuple[str, Labels], list] = {}
+        self._buckets: Dict[str, Sequence[float]] = {}
+        self._collectors: List[Tuple[str, Callable[[], Dict[str, Any]], Optional[str]]] = []
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        """Increase a counter."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels: str) -> None:
+        """Set a gauge."""
+        with self._lock:
+            self._gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def observe(self, name: str, value: float, buckets: Sequence[float] = DEFAULT_BUCKETS, **labels: str) -> None:
+        """Add a value to a histogram."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            bounds = self._buckets.setdefault(name, buckets)
+            entry = self._histograms.setdefault(key, [[0] * len(bounds), 0.0, 0])
+            for i, bound in enumerate(bounds):
+                if value <= bound:
+                    entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def add_collector(self, prefix: str, collect: Callable[[], Dict[str, Any]], label: Optional[str] = None) -> None:
+        """
+        Export a component's metrics() dict as gauges at every scrape.
+
+        Args:
+            prefix: Prefix of the exported names, e.g. "browser"
+            collect: Returns {metric: value}, or {label value: {metric: value}} with label
+            label: Label name for nested dicts, e.g. "channel"
+        """
+        with self._lock:
+            self._collectors.append((prefix, collect, label))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = {key: [list(entry[0]), entry[1], entry[2]] for key, entry in self._histograms.items()}
+            buckets = dict(self._buckets)
+            collectors = list(self._collectors)
+
+        for prefix, collect, label in collectors:
+            try:
+                values = collect()
+            except Exception as e:
+                logger.debug(f"Metrics collector '{prefix}' failed: {e}")
+                continue
+            for key, value in values.items():
+                if label and isinstance(value, dict):
+                    for metric, number in value.items():
+                        gauges[(f"{prefix}_{metric}", ((label, key),))] = number
+                elif isinstance(value, (int, float)):
+                    gauges[(f"{prefix}_{key}" if prefix else key, ())] = value
+
+        lines = []
+        described = set()
+
+        def header(name: str, kind: str) -> None:
+            if name not in described:
+                described.add(name)
+                help_text = _HELP.get(name, (kind, name.replace("_", " ")))[1]
+                lines.append(f"# HELP {_name(name)} {help_text}")
+                lines.append(f"# TYPE {_name(name)} {kind}")
+
+        for (name, labels), value in sorted(counters.items()):
+            header(name, "counter")
+            lines.append(f"{_name(name)}{_labels(labels)} {_value(value)}")
+
+        for (name, labels), value in sorted(gauges.items()):
+            header(name, "gauge")
+            lines.append(f"{_name(name)}{_labels(labels)} {_value(value)}")
+
+        for (name, labels), (counts, total, count) in sorted(histograms.items()):
+            header(name, "histogram")
+            for bound, bucket_count in zip(buckets[name], counts):
+                le = 'le="%g"' % bound
+                lines.append(f"{_name(name)}_bucket{_labels(labels, le)} {bucket_count}")
+            le = 'le="+Inf"'
+            lines.append(f"{_name(name)}_bucket{_labels(labels, le)} {count}")
+            lines.append(f"{_name(name)}_sum{_labels(labels)} {_value(round(total, 6))}")
+            lines.append(f"{_name(name)}_count{_labels(labels)} {count}")
+
+        return "\n".join(lines) + "\n"
+
+
+class HealthState:
+    """Liveness of the monitoring loop, derived from check outcomes."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.last_check: Optional[float] = None
+        self.last_success: Optional[float] = None
+        self.last_outcome: Optional[str] = None
+        self.next_check: Optional[float] = None
+        self.consecutive_failures = 0
+
+    def document(self, max_silence: float) -> Tuple[bool, Dict[str, Any]]:
+        """
+        Health as a JSON-serializable document.
+
+        Args:
+            max_silence: Seconds without a successful check before it is unhealthy
+
+        Returns:
+            Whether it is healthy, and the document
+        """
+        now = time.time()
+        since_success = now - (self.last_success or self.started_at)
+        healthy = since_success <= max_silence
+        if healthy:
+            status = "ok" if self.last_success else "starting"
+        else:
+            status = "stale"
+        return healthy, {
+            "status": status,
+            "uptime_seconds": round(now - self.started_at, 1),
+            "last_check": self.last_check,
+            "last_outcome": self.last_outcome,
+            "last_success": self.last_success,
+            "seconds_since_last_success": round(since_success, 1),
+            "consecutive_failures": self.consecutive_failures,
+            "next_check": self.next_check,
+        }
+
+
+registry = MetricsRegistry()
+health = HealthState()
+
+
+def observe_step(step: str, seconds: float) -> None:
+    """Record the duration of a check step."""
+    registry.observe("step_duration_seconds", seconds, step=step)
+
+
+def record_check(outcome: str, seconds: float) -> None:
+    """
+    Record a finished check.
+
+    Args:
+        outcome: "success", "failure" or "hung"
+        seconds: Wall time of the check
+    """
+    now = time.time()
+    registry.inc("checks_total", outcome=outcome)
+    registry.observe("check_duration_seconds", seconds)
+    health.last_check = now
+    health.last_outcome = outcome
+    if outcome == "success":
+        health.last_success = now
+        health.consecutive_failures = 0
+    else:
+        health.consecutive_failures += 1
+
+
+def set_next_check(ts: float) -> None:
+    """Record when the next check is planned."""
+    health.next_check = ts
+
+
+def measured_captcha(solver: str) -> Callable:
+    """Decorator counting a captcha solver's attempts and timing them; a falsy result is a failure."""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            result = None
+            try:
+                result = fn(*args, **kwargs)
+                return result
+            finally:
+                registry.inc("captcha_attempts_total", solver=solver, outcome="solved" if result else "failed")
+                registry.observe("captcha_solve_seconds", time.perf_counter() - started, solver=solver)
+        return wrapper
+    return decorator
+
+
+def _render_all() -> str:
+    """Registry metrics plus the health gauges."""
+    _, document = health.document(Config.HEALTH_MAX_SILENCE_MINUTES * 60)
+    registry.set("uptime_seconds", document["uptime_seconds"])
+    registry.set("seconds_since_last_success", document["seconds_since_last_success"])
+    registry.set("consecutive_failures", document["consecutive_failures"])
+    if health.last_success:
+        registry.set("last_success_timestamp_seconds", health.last_success)
+    if health.next_check:
+        registry.set("next_check_timestamp_seconds", health.next_check)
+    return registry.render()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Serves /metrics and /health."""
+
+    def _reply(self, status: int, body: str, content_type: str) -> None:
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        path = self.path.split("?", 1)[0]
+        try:
+            if path == "/metrics":
+                self._reply(200, _render_all(), "text/plain; version=0.0.4; charset=utf-8")
+            elif path in ("/health", "/healthz"):
+                healthy, document = health.document(Config.HEALTH_MAX_SILENCE_MINUTES * 60)
+                self._reply(200 if healthy else 503, json.dumps(document), "application/json")
+            else:
+                self._reply(404, "not found\n", "text/plain")
+        except Exception as e:
+            logger.error(f"Metrics endpoint error: {e}")
+            self._reply(500, "internal error\n", "text/plain")
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug(f"Metrics endpoint: {format % args}")
+
+
+class MetricsServer:
+    """Background HTTP server for the metrics and health endpoints."""
+
+    def __init__(self, host: str = Config.METRICS_HOST, port: int = Config.METRICS_PORT):
+        """
+        Args:
+            host: Interface to listen on
+            port: TCP port to listen on
+        """
+        self.host = host
+        self.port = port
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start serving in a daemon thread."""
+        self._server = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True)
+        self._thread.start()
+        logger.info(f"📈 Metrics on http://{self.host}:{self.port}/metrics, health on /health")
+
+    def close(self) -> None:
+        """Stop the server."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
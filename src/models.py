@@ -0,0 +1,60 @@
+"""
+Data records for the visa scheduler.
+Plain, serializable values that can be queued, stored or sent across processes.
+"""
+
+from dataclasses import dataclass, field, replace
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Tuple
+
+
+@dataclass(frozen=True)
+class Appointment:
+    """One available appointment date at a consular post."""
+
+    post: str
+    year: int
+    month: int
+    day: int
+    times: Tuple[str, ...] = ()
+    observed_at: datetime = field(default_factory=datetime.now, compare=False)
+    source: str = "calendar"
+
+    @property
+    def date(self) -> date:
+        """Calendar date of the appointment."""
+        return date(self.year, self.month, self.day)
+
+    @property
+    def key(self) -> Tuple[str, int, int, int]:
+        """Identity of the slot, independent of when it was observed."""
+        return self.post, self.year, self.month, self.day
+
+    def with_times(self, times: Iterable[str]) -> "Appointment":
+        """Return a copy with the given time slots attached."""
+        return replace(self, times=tuple(times))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to a JSON-serializable dictionary."""
+        return {
+            "post": self.post,
+            "year": self.year,
+            "month": self.month,
+            "day": self.day,
+            "times": list(self.times),
+            "observed_at": self.observed_at.isoformat(),
+            "source": self.source,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Appointment":
+        """Build an appointment from a dictionary produced by to_dict()."""
+        return cls(
+            post=data["post"],
+            year=int(data["year"]),
+            month=int(data["month"]),
+            day=int(data["day"]),
+            times=tuple(data.get("times") or ()),
+            observed_at=datetime.fromisoformat(data["observed_at"]) if data.get("observed_at") else datetime.now(),
+            source=data.get("source", "calendar"),
+        )
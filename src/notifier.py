@@ -3,27 +3,208 @@ Notification module for US Visa Scheduler.
 Handles sending alerts when appointments are found.
 """
 
+import hmac
+import json
+import time
+import uuid
+import hashlib
+import smtplib
 import logging
+import threading
+import contextvars
 import requests
-from typing import List, Dict
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from requests.adapters import HTTPAdapter
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from typing import Callable, List, Dict, NamedTuple, Optional, Set, Tuple
 from datetime import datetime
 from src.config import Config
+from src.models import Appointment
+from src.changes import AvailabilityChange
+from src.outbox import NotificationOutbox
+from src.subscribers import SubscriberRegistry
+from src.metrics import registry as metrics_registry
 
 logger = logging.getLogger("visa_scheduler")
 
 
+def _format_appointment(appointment: Appointment) -> str:
+    """Format an appointment for display, with its time slots if they were loaded."""
+    label = appointment.date.strftime('%Y-%m-%d')
+    if appointment.times:
+        label += f" ({', '.join(appointment.times)})"
+    return label
+
+
+def alert_key(kind: str, post: str, year: int, month: int, *slot_groups: List[Appointment]) -> str:
+    """
+    Build the idempotency key of an alert from its content.
+    
+    The same alert, e.g. from a check that is retried after a crash, gets the
+    same key, so the outbox sends it only once.
+    
+    Args:
+        kind: Kind of alert, e.g. "found", "changed" or "booked"
+        post: Consular post
+        year: Year of the month the alert is about
+        month: Month the alert is about (1-12)
+        slot_groups: Appointments the alert lists, e.g. opened and closed slots
+        
+    Returns:
+        Key such as "changed:ISTANBUL:2025-12:3f0c9a1be4d2"
+    """
+    content = json.dumps([
+        sorted([apt.day, sorted(apt.times)] for apt in group) for group in slot_groups
+    ], separators=(",", ":"))
+    digest = hashlib.sha256(content.encode()).hexdigest()[:12]
+    return f"{kind}:{post}:{year:04d}-{month:02d}:{digest}"
+
+
+class RateLimiter:
+    """Token bucket shared by all sends of one channel."""
+    
+    def __init__(self, rate_per_second: float, burst: int = 1):
+        """
+        Args:
+            rate_per_second: Sustained number of sends per second
+            burst: Number of sends allowed back to back
+        """
+        self.rate = rate_per_second
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self) -> None:
+        """Block until a send is allowed."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        
+        if wait > 0:
+            time.sleep(wait)
+    
+    def pause(self, seconds: float) -> None:
+        """Hold back all further sends for a while, e.g. after the server asked us to slow down."""
+        with self._lock:
+            self._tokens = min(self._tokens, 0.0) - seconds * self.rate
+    
+    def seconds_for(self, count: int) -> float:
+        """Time needed to send a number of messages at the sustained rate."""
+        return max(0, count - self.burst) / self.rate
+
+
+class KeepAliveSession:
+    """Pooled HTTP session, reopened after idling and retried once when the connection dropped."""
+    
+    def __init__(self, name: str, pool_maxsize: int = 4):
+        """
+        Args:
+            name: Channel name used in log messages
+            pool_maxsize: Connections kept open per host
+        """
+        self.name = name
+        self.pool_maxsize = pool_maxsize
+        self._session: Optional[requests.Session] = None
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+    
+    def _get_session(self) -> requests.Session:
+        """Return the keep-alive session, replacing it once it has been idle too long."""
+        if self._session and time.monotonic() - self._last_used > Config.CONNECTION_IDLE_TIMEOUT:
+            self._reset_session()
+        
+        if self._session is None:
+            self._session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize)
+            self._session.mount("https://", adapter)
+            self._session.mount("http://", adapter)
+        
+        return self._session
+    
+    def _reset_session(self) -> None:
+        if self._session:
+            self._session.close()
+        self._session = None
+    
+    def close(self) -> None:
+        """Close the keep-alive session."""
+        with self._lock:
+            self._reset_session()
+    
+    def post(self, url: str, **kwargs) -> requests.Response:
+        """POST over the pooled session, reconnecting once if the connection dropped."""
+        kwargs.setdefault("timeout", Config.NOTIFY_CHANNEL_TIMEOUT)
+        with self._lock:
+            try:
+                response = self._get_session().post(url, **kwargs)
+            except requests.ConnectionError as e:
+                logger.warning(f"{self.name} connection lost ({e}), reconnecting...")
+                self._reset_session()
+                response = self._get_session().post(url, **kwargs)
+            
+            self._last_used = time.monotonic()
+            return response
+
+
+class SMTPUnavailable(smtplib.SMTPException):
+    """None of the servers in Config.SMTP_HOSTS could be reached and logged in to."""
+
+
 class BaseNotifier:
     """Base class for all notifiers."""
     
-    def send(self, message: str, appointments: List[Dict] = None) -> bool:
-        """Send notification. Must be implemented by subclasses."""
+    enabled: bool = True
+    # Recipients alerted when no subscriber list is given
+    default_recipients: List[str] = []
+    rate_limiter: Optional[RateLimiter] = None
+    
+    def send(self, message: str, appointments: List[Appointment] = None) -> bool:
+        """Send notification to the default recipient. Must be implemented by subclasses."""
         raise NotImplementedError
+    
+    def send_batch(self, message: str, appointments: Optional[List[Appointment]],
+                   recipients: List[str], key: Optional[str] = None) -> List[str]:
+        """
+        Send one notification to several recipients.
+        
+        Channels that address recipients override this to render the message
+        once and deliver it within their rate limit.
+        
+        Args:
+            message: Notification message
+            appointments: List of appointments
+            recipients: Recipients to deliver to
+            key: Idempotency key of the alert, the same on every delivery attempt
+            
+        Returns:
+            Recipients the notification could not be delivered to
+        """
+        return [] if self.send(message, appointments) else list(recipients)
+    
+    def pacing_seconds(self, count: int) -> float:
+        """Time the rate limit adds to delivering a batch of this size."""
+        return self.rate_limiter.seconds_for(count) if self.rate_limiter else 0.0
+    
+    def metrics(self) -> Dict[str, float]:
+        """Delivery counters of the channel, if it keeps any."""
+        return {}
+    
+    def close(self) -> None:
+        """Release any connections held by the notifier."""
 
 
 class LogNotifier(BaseNotifier):
     """Log-based notifier (always active)."""
     
-    def send(self, message: str, appointments: List[Dict] = None) -> bool:
+    default_recipients = ["log"]
+    
+    def send(self, message: str, appointments: List[Appointment] = None) -> bool:
         """Log the notification message."""
         try:
             logger.info("=" * 70)
@@ -34,7 +215,7 @@ class LogNotifier(BaseNotifier):
             if appointments:
                 logger.info(f"\nAvailable appointments: {len(appointments)}")
                 for i, apt in enumerate(appointments, 1):
-                    logger.info(f"  {i}. Date: {apt.get('date', 'Unknown')}")
+                    logger.info(f"  {i}. Date: {_format_appointment(apt)}")
             
             logger.info("=" * 70)
             return True
@@ -49,53 +230,93 @@ class TelegramNotifier(BaseNotifier):
     def __init__(self):
         self.bot_token = Config.TELEGRAM_BOT_TOKEN
         self.chat_id = Config.TELEGRAM_CHAT_ID
-        self.enabled = bool(self.bot_token and self.chat_id)
+        self.enabled = bool(self.bot_token)
+        self.default_recipients = [self.chat_id] if self.chat_id else []
+        self.rate_limiter = RateLimiter(Config.TELEGRAM_RATE_PER_SECOND, burst=Config.TELEGRAM_RATE_BURST)
+        self._http = KeepAliveSession("Telegram")
         
         if not self.enabled:
             logger.info("Telegram notifications disabled (no credentials)")
     
-    def send(self, message: str, appointments: List[Dict] = None) -> bool:
-        """Send notification via Telegram."""
-        if not self.enabled:
-            return False
+    def close(self) -> None:
+        """Close the keep-alive session."""
+        self._http.close()
+    
+    def _format(self, message: str, appointments: Optional[List[Appointment]]) -> str:
+        """Render the Telegram message text."""
+        telegram_message = f"🎉 *US Visa Appointment Alert* 🎉\n\n"
+        telegram_message += f"{message}\n\n"
         
-        try:
-            # Format the message
-            telegram_message = f"🎉 *US Visa Appointment Alert* 🎉\n\n"
-            telegram_message += f"{message}\n\n"
+        if appointments:
+            telegram_message += f"*Available Dates ({len(appointments)}):*\n"
+            for i, apt in enumerate(appointments[:10], 1):  # Limit to 10
+                telegram_message += f"{i}. {_format_appointment(apt)}\n"
             
-            if appointments:
-                telegram_message += f"*Available Dates ({len(appointments)}):*\n"
-                for i, apt in enumerate(appointments[:10], 1):  # Limit to 10
-                    telegram_message += f"{i}. {apt.get('date', 'Unknown')}\n"
-                
-                if len(appointments) > 10:
-                    telegram_message += f"\n... and {len(appointments) - 10} more\n"
-            
-            telegram_message += f"\n🕒 Checked at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-            telegram_message += f"\n📍 Location: {Config.CONSULAR_POST}"
-            telegram_message += f"\n📅 Target: {Config.TARGET_MONTH}/{Config.TARGET_YEAR}"
-            
-            # Send via Telegram API
-            url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
-            payload = {
-                "chat_id": self.chat_id,
-                "text": telegram_message,
-                "parse_mode": "Markdown"
-            }
-            
-            response = requests.post(url, json=payload, timeout=10)
+            if len(appointments) > 10:
+                telegram_message += f"\n... and {len(appointments) - 10} more\n"
+        
+        telegram_message += f"\n🕒 Checked at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+        telegram_message += f"\n📍 Location: {Config.CONSULAR_POST}"
+        telegram_message += f"\n📅 Target: {Config.TARGET_MONTH}/{Config.TARGET_YEAR}"
+        return telegram_message
+    
+    def _send_to(self, url: str, chat_id: str, text: str) -> bool:
+        """Send to one chat within the rate limit, honouring one flood-control retry."""
+        payload = {
+            "chat_id": chat_id,
+            "text": text,
+            "parse_mode": "Markdown"
+        }
+        
+        for attempt in range(2):
+            self.rate_limiter.acquire()
+            response = self._http.post(url, json=payload)
             
             if response.status_code == 200:
-                logger.info("Telegram notification sent successfully")
                 return True
-            else:
-                logger.error(f"Telegram API error: {response.status_code} - {response.text}")
-                return False
-                
-        except Exception as e:
-            logger.error(f"Error sending Telegram notification: {e}", exc_info=True)
+            
+            if response.status_code == 429 and attempt == 0:
+                try:
+                    retry_after = float(response.json().get("parameters", {}).get("retry_after", 1))
+                except ValueError:
+                    retry_after = 1.0
+                logger.warning(f"Telegram rate limit hit, pausing {retry_after:.0f}s")
+                self.rate_limiter.pause(retry_after)
+                continue
+            
+            logger.error(f"Telegram API error for chat {chat_id}: {response.status_code} - {response.text}")
+            return False
+        
+        return False
+    
+    def send(self, message: str, appointments: List[Appointment] = None) -> bool:
+        """Send notification via Telegram to the configured chat."""
+        if not self.enabled or not self.default_recipients:
             return False
+        return not self.send_batch(message, appointments, self.default_recipients)
+    
+    def send_batch(self, message: str, appointments: Optional[List[Appointment]],
+                   recipients: List[str], key: Optional[str] = None) -> List[str]:
+        """Send the same Telegram message to every chat in turn, within the rate limit."""
+        if not self.enabled:
+            return list(recipients)
+        
+        text = self._format(message, appointments)
+        url = f"{Config.TELEGRAM_API_URL}/bot{self.bot_token}/sendMessage"
+        failed = []
+        
+        for chat_id in recipients:
+            try:
+                if not self._send_to(url, chat_id, text):
+                    failed.append(chat_id)
+            except Exception as e:
+                logger.error(f"Error sending Telegram notification to {chat_id}: {e}", exc_info=True)
+                failed.append(chat_id)
+        
+        sent = len(recipients) - len(failed)
+        if sent:
+            logger.info(f"Telegram notification sent successfully to {sent} chat(s)")
+        return failed
 
 
 class EmailNotifier(BaseNotifier):
@@ -105,133 +326,690 @@ class EmailNotifier(BaseNotifier):
         self.email = Config.EMAIL_ADDRESS
         self.password = Config.EMAIL_PASSWORD
         self.enabled = bool(self.email and self.password)
+        self.default_recipients = [self.email] if self.email else []
+        self.rate_limiter = RateLimiter(Config.EMAIL_RATE_PER_SECOND)
+        self._server: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+        self._lock = threading.Lock()
         
         if not self.enabled:
             logger.info("Email notifications disabled (no credentials)")
     
-    def send(self, message: str, appointments: List[Dict] = None) -> bool:
-        """Send notification via email."""
+    def _connect(self) -> smtplib.SMTP:
+        """Open and log in to the first reachable server in Config.SMTP_HOSTS."""
+        last_error = None
+        
+        for host in Config.SMTP_HOSTS:
+            hostname, _, port = host.partition(":")
+            port = int(port or 587)
+            try:
+                if port == 465:
+                    server = smtplib.SMTP_SSL(hostname, port, timeout=Config.NOTIFY_CHANNEL_TIMEOUT)
+                else:
+                    server = smtplib.SMTP(hostname, port, timeout=Config.NOTIFY_CHANNEL_TIMEOUT)
+                    if Config.SMTP_STARTTLS:
+                        server.starttls()
+                server.login(self.email, self.password)
+                logger.info(f"Connected to SMTP server {hostname}:{port}")
+                return server
+            except Exception as e:
+                logger.warning(f"SMTP server {hostname}:{port} failed: {e}")
+                last_error = e
+        
+        raise SMTPUnavailable(f"No SMTP server reachable: {last_error}")
+    
+    def _get_server(self) -> smtplib.SMTP:
+        """Return the open SMTP session, reconnecting if it is idle too long or dead."""
+        if self._server is not None:
+            idle = time.monotonic() - self._last_used
+            try:
+                if idle > Config.CONNECTION_IDLE_TIMEOUT or self._server.noop()[0] != 250:
+                    self._close_server()
+            except (smtplib.SMTPException, OSError):
+                self._close_server()
+        
+        if self._server is None:
+            self._server = self._connect()
+        
+        return self._server
+    
+    def _close_server(self) -> None:
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                pass
+        self._server = None
+    
+    def close(self) -> None:
+        """Close the SMTP session."""
+        with self._lock:
+            self._close_server()
+    
+    def _send_message(self, msg: MIMEMultipart, to_addrs: List[str]) -> Dict[str, Tuple[int, bytes]]:
+        """
+        Send over the persistent session, reconnecting once if it dropped.
+        
+        Only a dropped session is retried: when no server can be reached at
+        all, SMTPUnavailable is raised after one pass over Config.SMTP_HOSTS.
+        
+        Returns:
+            Recipients the server refused, as reported by smtplib
+        """
+        with self._lock:
+            server = self._get_server()
+            try:
+                refused = server.send_message(msg, to_addrs=to_addrs)
+            except (smtplib.SMTPServerDisconnected, OSError) as e:
+                logger.warning(f"SMTP connection lost ({e}), reconnecting...")
+                self._close_server()
+                refused = self._get_server().send_message(msg, to_addrs=to_addrs)
+            
+            self._last_used = time.monotonic()
+            return refused
+    
+    def _format(self, message: str, appointments: Optional[List[Appointment]]) -> MIMEMultipart:
+        """Render the email, addressed to the sender; recipients go in the envelope only."""
+        msg = MIMEMultipart()
+        msg['From'] = self.email
+        msg['To'] = self.email
+        msg['Subject'] = f"🎉 US Visa Appointment Available - {Config.CONSULAR_POST}"
+        
+        # Email body
+        body = f"<h2>US Visa Appointment Alert</h2>\n"
+        body += f"<p>{message}</p>\n"
+        
+        if appointments:
+            body += f"<h3>Available Dates ({len(appointments)}):</h3>\n<ul>\n"
+            for apt in appointments[:20]:  # Limit to 20
+                body += f"<li>{_format_appointment(apt)}</li>\n"
+            body += "</ul>\n"
+            
+            if len(appointments) > 20:
+                body += f"<p>... and {len(appointments) - 20} more</p>\n"
+        
+        body += f"<p><strong>Checked at:</strong> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>\n"
+        body += f"<p><strong>Location:</strong> {Config.CONSULAR_POST}</p>\n"
+        body += f"<p><strong>Target:</strong> {Config.TARGET_MONTH}/{Config.TARGET_YEAR}</p>\n"
+        
+        msg.attach(MIMEText(body, 'html'))
+        return msg
+    
+    def send(self, message: str, appointments: List[Appointment] = None) -> bool:
+        """Send notification via email to the configured address."""
         if not self.enabled:
             return False
+        return not self.send_batch(message, appointments, self.default_recipients)
+    
+    def send_batch(self, message: str, appointments: Optional[List[Appointment]],
+                   recipients: List[str], key: Optional[str] = None) -> List[str]:
+        """
+        Send one email per Config.EMAIL_BATCH_SIZE recipients.
+        
+        Recipients are only listed in the SMTP envelope, so nobody sees the
+        other subscribers' addresses.
+        """
+        if not self.enabled:
+            return list(recipients)
+        
+        msg = self._format(message, appointments)
+        failed = []
+        
+        for start in range(0, len(recipients), Config.EMAIL_BATCH_SIZE):
+            batch = recipients[start:start + Config.EMAIL_BATCH_SIZE]
+            try:
+                self.rate_limiter.acquire()
+                refused = self._send_message(msg, batch)
+                failed.extend(refused)
+            except smtplib.SMTPRecipientsRefused as e:
+                logger.error(f"All {len(batch)} email recipient(s) refused")
+                failed.extend(e.recipients)
+            except Exception as e:
+                logger.error(f"Error sending email notification: {e}", exc_info=True)
+                failed.extend(batch)
+        
+        sent = len(recipients) - len(failed)
+        if sent:
+            logger.info(f"Email notification sent successfully to {sent} recipient(s)")
+        return failed
+
+    def pacing_seconds(self, count: int) -> float:
+        """Time the rate limit adds to delivering a batch of this size."""
+        batches = -(-count // Config.EMAIL_BATCH_SIZE)
+        return self.rate_limiter.seconds_for(batches)
+
+
+class _WebhookBatch:
+    """Events collected during one coalescing window."""
+    
+    def __init__(self):
+        self.entries: List[Tuple[Dict, List[str]]] = []  # (event, urls)
+        self.failed_urls: Set[str] = set()
+        self.done = threading.Event()
+
+
+class WebhookNotifier(BaseNotifier):
+    """
+    Webhook notifier that POSTs compact, signed JSON availability events.
+    
+    Events sent within Config.WEBHOOK_COALESCE_SECONDS of each other are
+    merged into one request per URL. Every request carries the header
+    ``X-Visa-Scheduler-Signature: t=<unix time>,v1=<hex>``, an HMAC-SHA256 of
+    ``"<unix time>.<body>"`` keyed with Config.WEBHOOK_SECRET.
+    """
+    
+    def __init__(self):
+        self.secret = Config.WEBHOOK_SECRET
+        self.window = Config.WEBHOOK_COALESCE_SECONDS
+        self.default_recipients = list(Config.WEBHOOK_URLS)
+        # Needs no credentials, so subscribers with their own URLs work without WEBHOOK_URLS
+        self.enabled = True
+        self._http = KeepAliveSession("Webhook", pool_maxsize=8)
+        self._batch: Optional[_WebhookBatch] = None
+        self._batch_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            "requests": 0,
+            "requests_failed": 0,
+            "events": 0,
+            "events_coalesced": 0,
+            "bytes_sent": 0,
+            "latency_seconds_total": 0.0,
+            "latency_seconds_max": 0.0,
+        }
         
+        if not self.default_recipients:
+            logger.info("No WEBHOOK_URLS set, webhooks only go to subscribers")
+        elif not self.secret:
+            logger.warning("WEBHOOK_SECRET not set, webhook payloads will not be signed")
+    
+    @staticmethod
+    def _event(message: str, appointments: Optional[List[Appointment]], key: Optional[str] = None) -> Dict:
+        """
+        Build the machine-readable event for one alert.
+        
+        The event ID is the alert's idempotency key when it has one, so a
+        receiver can drop events redelivered by outbox retries.
+        """
+        first = appointments[0] if appointments else None
+        return {
+            "id": key or uuid.uuid4().hex,
+            "type": "availability" if appointments else "message",
+            "ts": round(time.time(), 3),
+            "post": first.post if first else Config.CONSULAR_POST,
+            "month": f"{first.year:04d}-{first.month:02d}" if first else f"{Config.TARGET_YEAR:04d}-{Config.TARGET_MONTH:02d}",
+            "message": message,
+            "slots": [
+                {"date": apt.date.isoformat(), "times": list(apt.times)} if apt.times else {"date": apt.date.isoformat()}
+                for apt in appointments or []
+            ],
+        }
+    
+    def _sign(self, timestamp: str, body: bytes) -> str:
+        digest = hmac.new(self.secret.encode(), timestamp.encode() + b"." + body, hashlib.sha256).hexdigest()
+        return f"t={timestamp},v1={digest}"
+    
+    def _post(self, url: str, events: List[Dict]) -> bool:
+        """POST a list of events to one URL and record the delivery metrics."""
+        body = json.dumps({"events": events}, separators=(",", ":"), ensure_ascii=False).encode()
+        headers = {"Content-Type": "application/json"}
+        if self.secret:
+            headers["X-Visa-Scheduler-Signature"] = self._sign(str(int(time.time())), body)
+        
+        started = time.monotonic()
         try:
-            import smtplib
-            from email.mime.text import MIMEText
-            from email.mime.multipart import MIMEMultipart
+            response = self._http.post(url, data=body, headers=headers)
+            success = 200 <= response.status_code < 300
+            if not success:
+                logger.error(f"Webhook {url} returned {response.status_code} - {response.text[:200]}")
+        except Exception as e:
+            logger.error(f"Error posting webhook to {url}: {e}")
+            success = False
+        latency = time.monotonic() - started
+        
+        with self._metrics_lock:
+            self._metrics["requests"] += 1
+            self._metrics["requests_failed"] += 0 if success else 1
+            self._metrics["events"] += len(events)
+            self._metrics["events_coalesced"] += len(events) - 1
+            self._metrics["bytes_sent"] += len(body)
+            self._metrics["latency_seconds_total"] += latency
+            self._metrics["latency_seconds_max"] = max(self._metrics["latency_seconds_max"], latency)
+        
+        return success
+    
+    def send(self, message: str, appointments: List[Appointment] = None) -> bool:
+        """Send an event to the configured webhook URLs."""
+        if not self.enabled or not self.default_recipients:
+            return False
+        return not self.send_batch(message, appointments, self.default_recipients)
+    
+    def send_batch(self, message: str, appointments: Optional[List[Appointment]],
+                   recipients: List[str], key: Optional[str] = None) -> List[str]:
+        """
+        Queue the event for the current coalescing window and wait for its delivery.
+        
+        The first sender of a window waits for the window to close, then posts
+        every collected event in one request per URL on behalf of all senders.
+        """
+        entry = (self._event(message, appointments, key), list(recipients))
+        
+        with self._batch_lock:
+            batch = self._batch
+            leader = batch is None
+            if leader:
+                batch = self._batch = _WebhookBatch()
+            batch.entries.append(entry)
+        
+        if not leader:
+            batch.done.wait()
+            return [url for url in entry[1] if url in batch.failed_urls]
+        
+        try:
+            if self.window > 0:
+                time.sleep(self.window)
+            with self._batch_lock:
+                self._batch = None
             
-            # Create email
-            msg = MIMEMultipart()
-            msg['From'] = self.email
-            msg['To'] = self.email
-            msg['Subject'] = f"🎉 US Visa Appointment Available - {Config.CONSULAR_POST}"
+            by_url: Dict[str, List[Dict]] = {}
+            for event, urls in batch.entries:
+                for url in urls:
+                    by_url.setdefault(url, []).append(event)
             
-            # Email body
-            body = f"<h2>US Visa Appointment Alert</h2>\n"
-            body += f"<p>{message}</p>\n"
+            for url, events in by_url.items():
+                if not self._post(url, events):
+                    batch.failed_urls.add(url)
             
-            if appointments:
-                body += f"<h3>Available Dates ({len(appointments)}):</h3>\n<ul>\n"
-                for apt in appointments[:20]:  # Limit to 20
-                    body += f"<li>{apt.get('date', 'Unknown')}</li>\n"
-                body += "</ul>\n"
-                
-                if len(appointments) > 20:
-                    body += f"<p>... and {len(appointments) - 20} more</p>\n"
-            
-            body += f"<p><strong>Checked at:</strong> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>\n"
-            body += f"<p><strong>Location:</strong> {Config.CONSULAR_POST}</p>\n"
-            body += f"<p><strong>Target:</strong> {Config.TARGET_MONTH}/{Config.TARGET_YEAR}</p>\n"
-            
-            msg.attach(MIMEText(body, 'html'))
-            
-            # Send email
-            # Try Gmail SMTP (most common)
-            try:
-                server = smtplib.SMTP('smtp.gmail.com', 587)
-                server.starttls()
-                server.login(self.email, self.password)
-                server.send_message(msg)
-                server.quit()
-                logger.info("Email notification sent successfully")
-                return True
-            except Exception as gmail_error:
-                logger.warning(f"Gmail SMTP failed: {gmail_error}, trying generic SMTP...")
-                
-                # Try generic SMTP on port 587
-                server = smtplib.SMTP('smtp.mail.yahoo.com', 587)  # Fallback
-                server.starttls()
-                server.login(self.email, self.password)
-                server.send_message(msg)
-                server.quit()
-                logger.info("Email notification sent successfully (fallback)")
-                return True
-                
+            sent = len(by_url) - len(batch.failed_urls)
+            if sent:
+                logger.info(f"Webhook: {len(batch.entries)} event(s) delivered to {sent} URL(s)")
         except Exception as e:
-            logger.error(f"Error sending email notification: {e}", exc_info=True)
-            return False
+            logger.error(f"Error sending webhook batch: {e}", exc_info=True)
+            batch.failed_urls.update(url for _, urls in batch.entries for url in urls)
+        finally:
+            batch.done.set()
+        
+        return [url for url in entry[1] if url in batch.failed_urls]
+    
+    def metrics(self) -> Dict[str, float]:
+        """Delivery counters since start-up."""
+        with self._metrics_lock:
+            return dict(self._metrics)
+    
+    def close(self) -> None:
+        """Log the delivery metrics and close the keep-alive session."""
+        if self.enabled:
+            m = self.metrics()
+            if m["requests"]:
+                logger.info(
+                    f"Webhook: {m['events']} event(s) in {m['requests']} request(s), "
+                    f"{m['requests_failed']} failed, avg latency "
+                    f"{m['latency_seconds_total'] / m['requests']:.2f}s"
+                )
+        self._http.close()
+
+
+class ChannelResult(NamedTuple):
+    """Outcome of sending one notification through one channel."""
+
+    success: bool
+    latency: float  # Seconds from dispatch until the channel finished or was abandoned
+    error: Optional[str] = None
+    failed: Tuple[str, ...] = ()  # Recipients that were not reached when others were
+    queued: bool = False  # Persisted in the outbox; delivery happens in the background
+    in_flight: bool = False  # An earlier attempt is still running; sending again could duplicate it
 
 
 class NotificationManager:
     """Manages all notification channels."""
     
-    def __init__(self):
+    def __init__(self, use_outbox: bool = Config.NOTIFICATION_OUTBOX,
+                 subscribers: Optional[SubscriberRegistry] = None):
+        """
+        Args:
+            use_outbox: Queue alerts in the durable outbox and deliver them in
+                the background instead of sending them inline
+            subscribers: Registry of additional recipients of availability alerts
+        """
+        self.subscribers = subscribers or SubscriberRegistry()
         self.notifiers = [
             LogNotifier(),  # Always enabled
             TelegramNotifier(),
             EmailNotifier(),
+            WebhookNotifier(),
         ]
         
+        # One worker per channel and concurrent alert so a slow channel never holds up the others
+        self._executor = ThreadPoolExecutor(
+            max_workers=len(self.notifiers) * Config.NOTIFY_PARALLEL_ALERTS, thread_name_prefix="notify"
+        )
+        
+        # Timed-out sends of keyed alerts, by (channel, key), until a later dispatch collects their outcome
+        self._in_flight: Dict[Tuple[str, str], Future] = {}
+        self._in_flight_lock = threading.Lock()
+        
+        self.outbox = None
+        if use_outbox:
+            self.outbox = NotificationOutbox(self)
+            self.outbox.start()
+        
         # Count enabled notifiers
         enabled_count = sum(1 for n in self.notifiers if getattr(n, 'enabled', True))
         logger.info(f"Initialized {enabled_count} notification channels")
     
-    def notify(self, message: str, appointments: List[Dict] = None) -> Dict[str, bool]:
+    def close(self) -> None:
+        """Deliver queued alerts if possible, then close all channel connections."""
+        if self.outbox:
+            self.outbox.close()
+        
+        for notifier in self.notifiers:
+            try:
+                notifier.close()
+            except Exception as e:
+                logger.debug(f"Error closing {notifier.__class__.__name__}: {e}")
+        self._executor.shutdown(wait=False)
+    
+    @staticmethod
+    def _send(notifier: BaseNotifier, message: str, appointments: Optional[List[Appointment]],
+              recipients: List[str], dispatched: float, key: Optional[str] = None) -> ChannelResult:
+        """Send through one channel, timing it from dispatch and never raising."""
+        try:
+            failed = notifier.send_batch(message, appointments, recipients, key)
+            latency = time.monotonic() - dispatched
+            if not failed:
+                return ChannelResult(True, latency)
+            if len(failed) == len(recipients):
+                return ChannelResult(False, latency)
+            return ChannelResult(False, latency, f"{len(failed)} recipient(s) failed", tuple(failed))
+        except Exception as e:
+            logger.error(f"Error with {notifier.__class__.__name__}: {e}")
+            return ChannelResult(False, time.monotonic() - dispatched, str(e))
+    
+    def metrics(self) -> Dict[str, Dict[str, float]]:
+        """Delivery counters of every channel that keeps them."""
+        return {
+            n.__class__.__name__: n.metrics()
+            for n in self.notifiers if n.enabled and n.metrics()
+        }
+    
+    def default_targets(self) -> Dict[str, List[str]]:
+        """Default recipient of every enabled notifier that has one."""
+        return {
+            n.__class__.__name__: list(n.default_recipients)
+            for n in self.notifiers if n.enabled and n.default_recipients
+        }
+    
+    def targets_for(self, post: str, year: int, month: int) -> Dict[str, List[str]]:
+        """
+        Recipients of an availability alert for a post and month.
+        
+        Args:
+            post: Consular post
+            year: Year of the month with availability
+            month: Month with availability (1-12)
+            
+        Returns:
+            Default recipients plus matching subscribers, per notifier class name
+        """
+        targets = self.default_targets()
+        enabled = {n.__class__.__name__ for n in self.notifiers if n.enabled}
+        
+        for channel, recipients in self.subscribers.recipients(post, year, month).items():
+            if channel not in enabled:
+                logger.warning(f"{channel} is disabled, skipping {len(recipients)} subscriber(s)")
+                continue
+            merged = targets.setdefault(channel, [])
+            merged.extend(r for r in recipients if r not in merged)
+        return targets
+    
+    def notify(self, message: str, appointments: List[Appointment] = None,
+               key: Optional[str] = None,
+               targets: Optional[Dict[str, List[str]]] = None) -> Dict[str, ChannelResult]:
         """
         Send notifications through all enabled channels.
         
+        With the outbox in use the alert is only persisted here and every
+        channel is reported as queued (success False, queued True); delivery,
+        retries and dead-lettering happen in the background.
+        
         Args:
             message: Notification message
-            appointments: List of appointment dictionaries
+            appointments: List of appointments
+            key: Idempotency key; an alert with an already queued key is not sent again
+            targets: Recipients per notifier class name (defaults to each channel's own recipient)
             
         Returns:
-            Dictionary with results for each notifier
+            Dictionary with the result and latency for each notifier
+        """
+        targets = targets if targets is not None else self.default_targets()
+        
+        if not self.outbox:
+            return self.dispatch(message, appointments, targets, key)
+        
+        started = time.monotonic()
+        queued = self.outbox.enqueue(key or uuid.uuid4().hex, message, appointments, targets)
+        if queued:
+            logger.info(f"Queued alert for {queued} recipient(s) in the outbox")
+        else:
+            logger.info(f"Alert {key} is already in the outbox, not queueing it again")
+        latency = time.monotonic() - started
+        return {
+            name: ChannelResult(False, latency, None if queued else "already queued", queued=True)
+            for name in targets
+        }
+    
+    @staticmethod
+    def _accepted(results: Dict[str, ChannelResult]) -> bool:
+        """Whether any channel delivered the alert, or queued it in the outbox."""
+        return any(result.success or result.queued for result in results.values())
+    
+    def dispatch(self, message: str, appointments: List[Appointment] = None,
+                 targets: Optional[Dict[str, List[str]]] = None,
+                 key: Optional[str] = None) -> Dict[str, ChannelResult]:
         """
+        Send a notification through the enabled channels concurrently.
+        
+        The message goes out once per channel payload: each channel renders it
+        once and delivers it to all of its recipients within its rate limit.
+        Each channel gets Config.NOTIFY_CHANNEL_TIMEOUT seconds plus the time
+        its rate limit needs for the batch, and the whole fan-out at most
+        Config.NOTIFY_DEADLINE seconds. Channels still running after that are
+        reported as failed and left to finish in the background. For a keyed
+        alert such a send is remembered: dispatching the same alert again
+        does not resend through that channel but reports it as in flight
+        until it finishes, then returns its late outcome.
+        
+        Args:
+            message: Notification message
+            appointments: List of appointments
+            targets: Recipients per notifier class name (defaults to each channel's own recipient)
+            key: Idempotency key of the alert, passed on to the channels (webhook event ID)
+            
+        Returns:
+            Dictionary with the result and latency for each notifier
+        """
+        targets = targets if targets is not None else self.default_targets()
         results = {}
+        futures = {}
+        budgets = {}
+        dispatched = time.monotonic()
+        deadline = dispatched + Config.NOTIFY_DEADLINE
+        earlier = set()
         
         for notifier in self.notifiers:
             notifier_name = notifier.__class__.__name__
+            recipients = targets.get(notifier_name)
             
-            try:
-                # Skip if notifier is disabled
-                if hasattr(notifier, 'enabled') and not notifier.enabled:
-                    results[notifier_name] = False
+            if not recipients:
+                continue
+            
+            # Skip if notifier is disabled
+            if not notifier.enabled:
+                results[notifier_name] = ChannelResult(False, 0.0, "disabled")
+                continue
+            
+            if key is not None:
+                with self._in_flight_lock:
+                    previous = self._in_flight.get((notifier_name, key))
+                    if previous is not None and previous.done():
+                        del self._in_flight[(notifier_name, key)]
+                if previous is not None:
+                    earlier.add(notifier_name)
+                    if previous.done():
+                        results[notifier_name] = previous.result()
+                        logger.info(f"{notifier_name} finished alert {key} late, not sending it again")
+                    else:
+                        results[notifier_name] = ChannelResult(False, 0.0, "still sending", in_flight=True)
                     continue
-                
-                success = notifier.send(message, appointments)
-                results[notifier_name] = success
-                
-            except Exception as e:
-                logger.error(f"Error with {notifier_name}: {e}")
-                results[notifier_name] = False
+            
+            budgets[notifier_name] = Config.NOTIFY_CHANNEL_TIMEOUT + notifier.pacing_seconds(len(recipients))
+            futures[notifier_name] = self._executor.submit(
+                self._send, notifier, message, appointments, recipients, dispatched, key
+            )
+        
+        for notifier_name, future in futures.items():
+            channel_deadline = min(dispatched + budgets[notifier_name], deadline)
+            try:
+                results[notifier_name] = future.result(timeout=max(0.0, channel_deadline - time.monotonic()))
+            except FuturesTimeoutError:
+                logger.warning(f"{notifier_name} did not finish in time, giving up on it")
+                if key is not None:
+                    with self._in_flight_lock:
+                        self._in_flight[(notifier_name, key)] = future
+                results[notifier_name] = ChannelResult(
+                    False, time.monotonic() - dispatched, "timed out", in_flight=key is not None
+                )
+        
+        for name, result in results.items():
+            if result.error != "disabled" and name not in earlier:
+                outcome = "ok" if result.success else "failed"
+                metrics_registry.inc("notifications_total", channel=name, outcome=outcome)
+                metrics_registry.observe("notification_latency_seconds", result.latency, channel=name)
+        
+        summary = ", ".join(
+            f"{name}={'ok' if result.success else 'failed'} ({result.latency:.2f}s)"
+            for name, result in results.items() if result.error != "disabled"
+        )
+        logger.info(f"Notification results: {summary}")
         
         return results
     
-    def notify_appointments_found(self, appointments: List[Dict]) -> bool:
+    def notify_within(self, timeout: float, notify: Callable[..., bool], *args, **kwargs) -> bool:
+        """
+        Run a notify_* call, waiting for it at most a given time.
+        
+        The check's notification step is bounded this way instead of by the
+        step supervisor, whose only remedy (killing the browser) cannot
+        unblock an SMTP or HTTP call. A call still running after the timeout
+        finishes in the background and counts as not sent.
+        
+        Args:
+            timeout: Maximum seconds to wait
+            notify: Bound notify_* method to call
+            *args: Positional arguments for notify
+            **kwargs: Keyword arguments for notify
+            
+        Returns:
+            The call's result, or False if it failed or did not finish in time
+        """
+        outcome: Dict[str, bool] = {}
+        context = contextvars.copy_context()
+        
+        def call() -> None:
+            try:
+                outcome["sent"] = context.run(notify, *args, **kwargs)
+            except Exception as e:
+                logger.error(f"Error sending notification: {e}", exc_info=True)
+        
+        thread = threading.Thread(target=call, name="notify-call", daemon=True)
+        thread.start()
+        thread.join(timeout)
+        if thread.is_alive():
+            logger.warning(f"Notification still running after {timeout:.0f}s, continuing without it")
+            return False
+        return outcome.get("sent", False)
+    
+    def notify_appointments_found(self, appointments: List[Appointment], booking: Optional[Dict] = None,
+                                  key: Optional[str] = None) -> bool:
         """
         Send notification that appointments were found.
         
         Args:
             appointments: List of available appointments
+            booking: Result of the auto-booking attempt, if one was made
+            key: Idempotency key of the alert (built from the appointments by default)
             
         Returns:
-            True if at least one notification sent successfully
+            True if at least one channel sent the notification, or, with the
+            outbox in use, if it was queued for delivery
         """
         message = f"Found {len(appointments)} available appointment(s) for {Config.CONSULAR_POST} in {Config.TARGET_MONTH}/{Config.TARGET_YEAR}!"
         
-        results = self.notify(message, appointments)
+        if booking:
+            status = "✓" if booking["success"] else "✗"
+            message += f"\nAuto-booking {status}: {booking['message']} ({booking['timings'].get('total', 0):.1f}s)"
+        
+        key = key or alert_key("found", Config.CONSULAR_POST, Config.TARGET_YEAR, Config.TARGET_MONTH, appointments)
+        targets = self.targets_for(Config.CONSULAR_POST, Config.TARGET_YEAR, Config.TARGET_MONTH)
+        results = self.notify(message, appointments, key, targets)
+        
+        return self._accepted(results)
+    
+    def notify_availability_changed(self, change: AvailabilityChange, booking: Optional[Dict] = None,
+                                    key: Optional[str] = None) -> bool:
+        """
+        Send notification about slots that opened (and optionally closed) since the last check.
+        
+        Args:
+            change: Slots added and removed since the previous check
+            booking: Result of the auto-booking attempt, if one was made
+            key: Idempotency key of the alert (built from the opened and closed slots by default)
+            
+        Returns:
+            True if at least one channel sent the notification, or, with the
+            outbox in use, if it was queued for delivery
+        """
+        if change.added:
+            message = f"{len(change.added)} new appointment slot(s) opened for {Config.CONSULAR_POST} in {Config.TARGET_MONTH}/{Config.TARGET_YEAR}!"
+        else:
+            message = f"Appointment availability changed for {Config.CONSULAR_POST} in {Config.TARGET_MONTH}/{Config.TARGET_YEAR}."
+        
+        if change.removed:
+            message += f"\nNo longer available: {', '.join(_format_appointment(apt) for apt in change.removed)}"
+        
+        if booking:
+            status = "✓" if booking["success"] else "✗"
+            message += f"\nAuto-booking {status}: {booking['message']} ({booking['timings'].get('total', 0):.1f}s)"
+        
+        key = key or alert_key("changed", Config.CONSULAR_POST, Config.TARGET_YEAR, Config.TARGET_MONTH,
+                               change.added, change.removed)
+        targets = self.targets_for(Config.CONSULAR_POST, Config.TARGET_YEAR, Config.TARGET_MONTH)
+        results = self.notify(message, change.added, key, targets)
+        
+        return self._accepted(results)
+    
+    def notify_booking(self, booking: Dict, key: Optional[str] = None) -> bool:
+        """
+        Send notification that an appointment was booked.
+        
+        Used when the booking is the only news, i.e. availability itself did not change.
+        
+        Args:
+            booking: Result of the successful auto-booking attempt
+            key: Idempotency key of the alert (built from the booked date and time by default)
+            
+        Returns:
+            True if at least one channel sent the notification, or, with the
+            outbox in use, if it was queued for delivery
+        """
+        message = (f"✅ Appointment booked for {Config.CONSULAR_POST}: {booking['message']} "
+                   f"({booking['timings'].get('total', 0):.1f}s)")
+        
+        key = key or f"booked:{Config.CONSULAR_POST}:{booking['date']}:{booking['time']}"
+        targets = self.targets_for(Config.CONSULAR_POST, Config.TARGET_YEAR, Config.TARGET_MONTH)
+        results = self.notify(message, None, key, targets)
         
-        # Return True if at least one notifier succeeded
-        return any(results.values())
+        return self._accepted(results)
     
     def notify_error(self, error_message: str) -> bool:
         """
@@ -241,10 +1019,10 @@ class NotificationManager:
             error_message: Description of the error
             
         Returns:
-            True if notification sent successfully
+            True if notification sent successfully, or queued with the outbox in use
         """
         message = f"⚠️ Visa Scheduler Error: {error_message}"
         
         results = self.notify(message)
         
-        return any(results.values())
\ No newline at end of file
+        return self._accepted(results)
\ No newline at end of file
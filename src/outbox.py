@@ -0,0 +1,388 @@
+"""
+Durable notification outbox for the visa scheduler.
+Alerts are written to SQLite first and delivered by a background worker,
+so a network blip or a crash between checks never loses an alert.
+"""
+
+import os
+import json
+import time
+import random
+import sqlite3
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+from src.config import Config
+from src.models import Appointment
+
+if TYPE_CHECKING:
+    from src.notifier import NotificationManager
+
+logger = logging.getLogger("visa_scheduler")
+
+PENDING = "pending"
+SENT = "sent"
+DEAD = "dead"
+
+# Version 1 had one row per (idempotency key, channel) and no recipient column
+SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    recipient TEXT NOT NULL,
+    message TEXT NOT NULL,
+    appointments TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    sent_at REAL,
+    UNIQUE (idempotency_key, channel, recipient)
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_status_next ON outbox (status, next_attempt_at);
+"""
+
+
+class NotificationOutbox:
+    """
+    Persistent queue of alerts, one row per (idempotency key, channel, recipient).
+
+    A background worker delivers due rows through the NotificationManager's
+    channels. Failed deliveries are retried with exponential backoff, and a
+    recipient that keeps failing has its row dead-lettered without affecting
+    the other recipients of the same alert.
+    """
+
+    def __init__(
+        self,
+        manager: "NotificationManager",
+        path: str = Config.OUTBOX_DB,
+        max_attempts: int = Config.OUTBOX_MAX_ATTEMPTS,
+        base_delay: float = Config.OUTBOX_RETRY_BASE_SECONDS,
+        max_delay: float = Config.OUTBOX_RETRY_MAX_SECONDS,
+        dedupe_window: float = Config.OUTBOX_DEDUPE_MINUTES * 60,
+    ):
+        """
+        Args:
+            manager: Notification manager whose channels deliver the alerts
+            path: SQLite database file
+            max_attempts: Attempts per channel before a row is dead-lettered
+            base_delay: Seconds before the first retry; doubled on every further attempt
+            max_delay: Upper bound for the retry delay in seconds
+            dedupe_window: Seconds during which an already queued idempotency
+                key is ignored; after that the same alert is queued again
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.manager = manager
+        self.path = path
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.dedupe_window = dedupe_window
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._migrate()
+
+    def _migrate(self) -> None:
+        """
+        Create the tables, or upgrade an outbox database from an older version.
+
+        Raises:
+            RuntimeError: If the database was written by a newer version
+        """
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version > SCHEMA_VERSION:
+            raise RuntimeError(f"{self.path} has outbox schema version {version}, newer than the supported "
+                               f"{SCHEMA_VERSION}; upgrade the scheduler or move the file away")
+
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(outbox)")}
+        if columns and "recipient" not in columns:
+            self._add_recipients()
+
+        self._conn.executescript(_SCHEMA)
+        self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _add_recipients(self) -> None:
+        """
+        Rebuild a version 1 table with one row per recipient.
+
+        Version 1 delivered each channel to its default recipient, so every row
+        is copied for the channel's current default recipients. Pending rows of
+        a channel without one are dead-lettered.
+        """
+        defaults = self.manager.default_targets()
+        rows = [dict(row) for row in self._conn.execute("SELECT * FROM outbox ORDER BY id")]
+
+        migrated = []
+        for row in rows:
+            recipients = defaults.get(row["channel"])
+            if not recipients:
+                recipients = [""]
+                if row["status"] == PENDING:
+                    row.update(status=DEAD, last_error="No recipient after outbox upgrade")
+            for recipient in recipients:
+                migrated.append((
+                    row["idempotency_key"], row["channel"], recipient, row["message"], row["appointments"],
+                    row["status"], row["attempts"], row["next_attempt_at"], row["last_error"],
+                    row["created_at"], row["sent_at"],
+                ))
+
+        self._conn.execute("BEGIN")
+        try:
+            self._conn.execute("DROP TABLE outbox")
+            for statement in _SCHEMA.split(";"):
+                if statement.strip():
+                    self._conn.execute(statement)
+            self._conn.executemany(
+                "INSERT INTO outbox (idempotency_key, channel, recipient, message, appointments, status, "
+                "attempts, next_attempt_at, last_error, created_at, sent_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                migrated,
+            )
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self._conn.commit()
+        except Exception:
+            self._conn.rollback()
+            raise
+
+        logger.info(f"Upgraded outbox {self.path} to per-recipient rows ({len(rows)} row(s) migrated)")
+
+    def enqueue(self, key: str, message: str, appointments: Optional[List[Appointment]],
+                targets: Dict[str, List[str]]) -> int:
+        """
+        Persist an alert for delivery to the given recipients.
+
+        An alert whose idempotency key was already enqueued for a recipient
+        within the dedupe window is ignored for that recipient, so a retried
+        check cannot send the same alert twice. Once the window has passed and
+        the earlier alert is no longer pending, the row is queued afresh: the
+        same slots opening again days later are a new alert.
+
+        Args:
+            key: Idempotency key of the alert
+            message: Notification message
+            appointments: Appointments attached to the alert
+            targets: Recipients per channel name
+
+        Returns:
+            Number of new rows queued
+        """
+        now = time.time()
+        payload = json.dumps([apt.to_dict() for apt in appointments or []])
+
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT INTO outbox (idempotency_key, channel, recipient, message, appointments, "
+                "status, next_attempt_at, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (idempotency_key, channel, recipient) DO UPDATE SET "
+                "message = excluded.message, appointments = excluded.appointments, status = excluded.status, "
+                "attempts = 0, next_attempt_at = excluded.next_attempt_at, last_error = NULL, "
+                "created_at = excluded.created_at, sent_at = NULL "
+                "WHERE outbox.status != ? AND outbox.created_at < ?",
+                [
+                    (key, channel, recipient, message, payload, PENDING, now, now, PENDING, now - self.dedupe_window)
+                    for channel, recipients in targets.items() for recipient in recipients
+                ],
+            )
+            queued = self._conn.total_changes - before
+
+        self._wakeup.set()
+        return queued
+
+    def _due(self, now: float) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT * FROM outbox WHERE status = ? AND next_attempt_at <= ? ORDER BY id",
+                (PENDING, now),
+            ).fetchall()
+
+    def _retry_delay(self, attempts: int) -> float:
+        delay = min(self.base_delay * 2 ** (attempts - 1), self.max_delay)
+        return delay * random.uniform(0.9, 1.1)
+
+    def drain_once(self) -> int:
+        """
+        Deliver every row that is currently due.
+
+        Up to Config.NOTIFY_PARALLEL_ALERTS alerts are dispatched at once, so
+        channels that coalesce (webhooks) can merge them into one request.
+        Rows of the same alert are sent through their channels concurrently,
+        each channel delivering to all of its due recipients in one batch.
+
+        Returns:
+            Number of rows attempted
+        """
+        rows = self._due(time.time())
+        alerts: Dict[str, List[sqlite3.Row]] = {}
+        for row in rows:
+            alerts.setdefault(row["idempotency_key"], []).append(row)
+
+        if len(alerts) > 1:
+            with ThreadPoolExecutor(max_workers=Config.NOTIFY_PARALLEL_ALERTS,
+                                    thread_name_prefix="outbox") as executor:
+                list(executor.map(self._deliver, alerts.values()))
+        else:
+            for alert_rows in alerts.values():
+                self._deliver(alert_rows)
+
+        return len(rows)
+
+    def _deliver(self, alert_rows: List[sqlite3.Row]) -> None:
+        """Dispatch one alert to its due recipients and record the outcome of each."""
+        first = alert_rows[0]
+        appointments = [Appointment.from_dict(data) for data in json.loads(first["appointments"])]
+        targets: Dict[str, List[str]] = {}
+        for row in alert_rows:
+            targets.setdefault(row["channel"], []).append(row["recipient"])
+        results = self.manager.dispatch(first["message"], appointments, targets, first["idempotency_key"])
+
+        updates = []
+        now = time.time()
+        for row in alert_rows:
+            result = results.get(row["channel"])
+            attempts = row["attempts"] + 1
+            delivered = result is not None and (
+                result.success or (result.failed and row["recipient"] not in result.failed)
+            )
+
+            if delivered:
+                updates.append((SENT, attempts, row["next_attempt_at"], None, now, row["id"]))
+                logger.debug(f"Outbox: delivered {row['channel']} alert {row['idempotency_key']} "
+                             f"to {row['recipient']} {now - row['created_at']:.1f}s after it was queued")
+                continue
+
+            if result is not None and result.in_flight:
+                # Retrying while the earlier send may still succeed would deliver the alert twice
+                updates.append((PENDING, row["attempts"], now + self.base_delay, result.error, None, row["id"]))
+                logger.warning(f"Outbox: {row['channel']} delivery to {row['recipient']} is still running, "
+                               f"checking again in {self.base_delay:.0f}s")
+                continue
+
+            error = result.error if result and result.error else "send failed"
+            if attempts >= self.max_attempts:
+                updates.append((DEAD, attempts, row["next_attempt_at"], error, None, row["id"]))
+                logger.error(f"Outbox: dead-lettered {row['channel']} alert {row['idempotency_key']} "
+                             f"for {row['recipient']} after {attempts} attempts: {error}")
+            else:
+                delay = self._retry_delay(attempts)
+                updates.append((PENDING, attempts, now + delay, error, None, row["id"]))
+                logger.warning(f"Outbox: {row['channel']} delivery to {row['recipient']} failed ({error}), "
+                               f"retry {attempts}/{self.max_attempts - 1} in {delay:.0f}s")
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, "
+                "last_error = ?, sent_at = ? WHERE id = ?",
+                updates,
+            )
+
+        sent = sum(1 for update in updates if update[0] == SENT)
+        logger.info(f"Outbox: alert {first['idempotency_key']} delivered to {sent}/{len(alert_rows)} recipient(s)")
+
+    def _next_due_in(self) -> Optional[float]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(next_attempt_at) FROM outbox WHERE status = ?", (PENDING,)
+            ).fetchone()
+        return None if row[0] is None else max(0.0, row[0] - time.time())
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                self.drain_once()
+                wait = self._next_due_in()
+            except Exception as e:
+                logger.error(f"Outbox worker error: {e}", exc_info=True)
+                wait = self.base_delay
+
+            # Sleep until the next retry is due or a new alert is enqueued
+            self._wakeup.wait(timeout=60 if wait is None else min(wait, 60))
+            self._wakeup.clear()
+
+    def start(self) -> None:
+        """Start the background delivery worker (also delivers alerts left from a previous run)."""
+        if self._worker and self._worker.is_alive():
+            return
+        self._stopping.clear()
+        self._worker = threading.Thread(target=self._run, name="notification-outbox", daemon=True)
+        self._worker.start()
+
+    def flush(self, timeout: float) -> bool:
+        """
+        Wait until nothing is due for delivery, up to a timeout.
+
+        Args:
+            timeout: Maximum seconds to wait
+
+        Returns:
+            True if no due alerts remain
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            wait = self._next_due_in()
+            if wait is None or wait > deadline - time.monotonic():
+                return True
+            if not (self._worker and self._worker.is_alive()):
+                self.drain_once()
+            else:
+                self._wakeup.set()
+                time.sleep(0.1)
+        return self._next_due_in() is None
+
+    def stop(self, timeout: float = 5) -> None:
+        """Stop the background worker; undelivered alerts stay queued for the next run."""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._worker:
+            self._worker.join(timeout=timeout)
+
+    def close(self, flush_timeout: float = Config.NOTIFY_DEADLINE) -> None:
+        """
+        Give due alerts a last chance to go out, then stop and close the database.
+
+        If the worker is still in the middle of a delivery after stop(), the
+        database is left open for it; the process is exiting anyway.
+        """
+        try:
+            self.flush(flush_timeout)
+        finally:
+            self.stop()
+            if self._worker and self._worker.is_alive():
+                logger.warning("Outbox worker still delivering, leaving the outbox database open")
+                return
+            with self._lock:
+                self._conn.close()
+
+    def dead_letters(self, channel: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        List alerts that were given up on.
+
+        Args:
+            channel: Only include this channel
+
+        Returns:
+            List of dead-lettered rows as dictionaries
+        """
+        sql = "SELECT * FROM outbox WHERE status = ?"
+        params: tuple = (DEAD,)
+        if channel:
+            sql += " AND channel = ?"
+            params += (channel,)
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql + " ORDER BY id", params).fetchall()]
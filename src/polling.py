@@ -0,0 +1,192 @@
+"""
+Adaptive polling for the visa scheduler.
+Spends a fixed daily check budget where slot openings have been observed.
+"""
+
+import math
+import time
+import random
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional
+from src.config import Config
+from src.history import HistoryStore
+
+logger = logging.getLogger("visa_scheduler")
+
+HOURS_PER_WEEK = 7 * 24
+_WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+
+def hour_of_week(ts: float) -> int:
+    """Local hour of the week (0 = Monday 00:00-01:00) of a Unix timestamp."""
+    local = datetime.fromtimestamp(ts)
+    return local.weekday() * 24 + local.hour
+
+
+def _next_hour(ts: float) -> float:
+    """Unix timestamp of the next local full hour."""
+    local = datetime.fromtimestamp(ts).replace(minute=0, second=0, microsecond=0)
+    return (local + timedelta(hours=1)).timestamp()
+
+
+class AdaptivePollingScheduler:
+    """
+    Picks the wait before the next check from when slots tend to open.
+
+    Each recorded opening happened somewhere between the last check that did
+    not see the slot and the first one that did; its weight is spread over the
+    hours of the week in that interval and decays with age. Checks per hour
+    are then allocated in proportion to the square root of the opening rate,
+    which minimizes the expected delay between an opening and its detection
+    for a fixed number of checks. A share of the budget stays uniform so quiet
+    hours are still sampled, and too little history falls back to the fixed
+    CHECK_INTERVAL_MIN..CHECK_INTERVAL_MAX schedule.
+    """
+
+    def __init__(
+        self,
+        history: HistoryStore,
+        post: str = Config.CONSULAR_POST,
+        daily_budget: float = Config.DAILY_CHECK_BUDGET,
+        min_spacing_minutes: float = Config.MIN_CHECK_SPACING_MINUTES,
+        max_spacing_minutes: float = Config.MAX_CHECK_SPACING_MINUTES,
+        jitter: float = Config.POLL_JITTER,
+    ):
+        """
+        Args:
+            history: Store the check outcomes are read from
+            post: Consular post whose openings are learned
+            daily_budget: Average number of checks per day
+            min_spacing_minutes: Minimum time between two checks
+            max_spacing_minutes: Maximum time between two checks
+            jitter: Relative random variation applied to every wait (0.2 = ±20%)
+        """
+        self.history = history
+        self.post = post
+        self.daily_budget = daily_budget
+        self.min_spacing = min_spacing_minutes * 60
+        self.max_spacing = max_spacing_minutes * 60
+        self.jitter = jitter
+
+    def opening_weights(self, now: float) -> Optional[List[float]]:
+        """
+        Estimate how likely slots open in each hour of the week.
+
+        Args:
+            now: Current Unix timestamp
+
+        Returns:
+            Probability per hour of the week, or None without enough history
+        """
+        since = now - Config.POLL_LOOKBACK_DAYS * 86400
+        openings = [
+            slot for slot in self.history.openings(self.post, since=since)
+            if slot["previous_check"] is not None  # Slots already open at the first check are not openings
+        ]
+        if len(openings) < Config.POLL_MIN_OPENINGS:
+            return None
+
+        counts = [0.0] * HOURS_PER_WEEK
+        half_life = Config.POLL_HALF_LIFE_DAYS * 86400
+        max_window = Config.POLL_MAX_ATTRIBUTION_HOURS * 3600
+
+        for slot in openings:
+            weight = 0.5 ** ((now - slot["opened"]) / half_life)
+            end = slot["opened"]
+            start = max(slot["previous_check"], end - max_window)
+            span = max(end - start, 1.0)
+
+            # Spread the opening over the hours it may have happened in
+            t = start
+            while t < end:
+                boundary = min(_next_hour(t), end)
+                counts[hour_of_week(t)] += weight * (boundary - t) / span
+                t = boundary
+            if start >= end:
+                counts[hour_of_week(end)] += weight
+
+        total = sum(counts)
+        explore = Config.POLL_EXPLORATION
+        return [(1 - explore) * count / total + explore / HOURS_PER_WEEK for count in counts]
+
+    def check_rates(self, weights: List[float]) -> List[float]:
+        """
+        Allocate the weekly budget as checks per hour for each hour of the week.
+
+        Args:
+            weights: Opening probability per hour of the week
+
+        Returns:
+            Checks per hour, summing to seven days of budget and capped by
+            the minimum spacing
+        """
+        budget = self.daily_budget * 7
+        cap = 3600 / self.min_spacing
+        rates = [0.0] * HOURS_PER_WEEK
+        free = set(range(HOURS_PER_WEEK))
+
+        # Square-root allocation; hours over the cap are pinned and the rest re-spread
+        while free and budget > 1e-9:
+            scale = budget / sum(math.sqrt(weights[h]) for h in free)
+            over = {h for h in free if math.sqrt(weights[h]) * scale > cap}
+            if not over:
+                for h in free:
+                    rates[h] = math.sqrt(weights[h]) * scale
+                break
+            for h in over:
+                rates[h] = cap
+            budget -= cap * len(over)
+            free -= over
+
+        return rates
+
+    def next_wait(self, now: Optional[float] = None) -> int:
+        """
+        Get the number of seconds to wait before the next check.
+
+        The wait is the time until the allocated check rate adds up to one
+        check, jittered and clamped to the spacing limits.
+
+        Args:
+            now: Current Unix timestamp (defaults to now)
+
+        Returns:
+            Seconds to wait
+        """
+        now = time.time() if now is None else now
+
+        try:
+            weights = self.opening_weights(now)
+        except Exception as e:
+            logger.error(f"Could not learn release pattern, using fixed interval: {e}")
+            weights = None
+
+        if weights is None:
+            min_seconds = Config.CHECK_INTERVAL_MIN * 60
+            max_seconds = Config.CHECK_INTERVAL_MAX * 60
+            return random.randint(min_seconds, max_seconds)
+
+        rates = self.check_rates(weights)
+
+        # Walk forward hour by hour until one check's worth of rate is used up
+        remaining = 1.0
+        t = now
+        while t - now < self.max_spacing:
+            boundary = _next_hour(t)
+            rate = rates[hour_of_week(t)] / 3600
+            if rate > 0 and rate * (boundary - t) >= remaining:
+                t += remaining / rate
+                break
+            remaining -= rate * (boundary - t)
+            t = boundary
+
+        wait = (t - now) * random.uniform(1 - self.jitter, 1 + self.jitter)
+        wait = min(max(wait, self.min_spacing), self.max_spacing)
+
+        busiest = sorted(range(HOURS_PER_WEEK), key=lambda h: weights[h], reverse=True)[:3]
+        logger.info(
+            f"Adaptive polling: {rates[hour_of_week(now)]:.1f} checks/h now, busiest release hours "
+            + ", ".join(f"{_WEEKDAYS[h // 24]} {h % 24:02d}:00" for h in busiest)
+        )
+        return int(wait)
@@ -0,0 +1,250 @@
+"""
+Pre-started browser pool for the visa scheduler.
+Keeps browsers launched and idle on about:blank so a check does not wait
+for Chrome to start; the pool refills in the background between checks.
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+from typing import TYPE_CHECKING, Callable, Deque, Dict, Optional, Tuple
+from src.config import Config
+from src.utils import setup_driver, watch_driver
+
+if TYPE_CHECKING:
+    from selenium import webdriver
+
+logger = logging.getLogger("visa_scheduler")
+
+
+class DriverPool:
+    """
+    A few ready browsers, handed out to checks without a startup wait.
+
+    Browsers are only started while no check is running (between acquire()
+    and refill()), so a background launch never competes with a check for
+    CPU; a launch already under way when a check starts is waited for and
+    handed to that check. Idle browsers are health-checked every
+    Config.DRIVER_POOL_CHECK_SECONDS and replaced when they crashed or have
+    been idle too long. When the pool is empty, acquire() starts a browser
+    directly.
+    """
+
+    def __init__(
+        self,
+        size: int = Config.DRIVER_POOL_SIZE,
+        max_idle_minutes: float = Config.DRIVER_POOL_MAX_IDLE_MINUTES,
+        check_interval: float = Config.DRIVER_POOL_CHECK_SECONDS,
+        factory: Callable[[], "webdriver.Chrome"] = setup_driver,
+    ):
+        """
+        Args:
+            size: Number of browsers kept ready
+            max_idle_minutes: Replace browsers idle for longer than this (0 disables)
+            check_interval: Seconds between health checks of idle browsers
+            factory: Starts one browser
+        """
+        self.size = size
+        self.max_idle_seconds = max_idle_minutes * 60
+        self.check_interval = check_interval
+        self.factory = factory
+
+        self._ready: Deque[Tuple["webdriver.Chrome", float]] = deque()
+        self._cond = threading.Condition()
+        self._refilling = True  # Starts are allowed until the first check takes a browser
+        self._busy = False  # The pool thread is starting or health-checking browsers
+        self._closed = False
+        self._failures = 0
+        self._thread: Optional[threading.Thread] = None
+
+        self._hits = 0
+        self._misses = 0
+        self._replaced = 0
+
+    def start(self) -> None:
+        """Start filling the pool in the background."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="driver-pool", daemon=True)
+            self._thread.start()
+            logger.info(f"Driver pool started, keeping {self.size} browser(s) ready")
+
+    @staticmethod
+    def _healthy(driver: "webdriver.Chrome") -> bool:
+        """Whether an idle browser still answers."""
+        try:
+            driver.current_url
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _quit(driver: "webdriver.Chrome") -> None:
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.debug(f"Error closing pooled browser: {e}")
+
+    def _launch(self) -> None:
+        """Start one browser and add it to the pool."""
+        try:
+            driver = self.factory()
+            driver.get("about:blank")
+        except Exception as e:
+            self._failures += 1
+            logger.error(f"Driver pool could not start a browser: {e}")
+            return
+
+        with self._cond:
+            self._failures = 0
+            if self._closed:
+                self._quit(driver)
+                return
+            self._ready.append((driver, time.time()))
+        logger.info(f"🔥 Browser ready in the pool ({len(self._ready)}/{self.size})")
+
+    def _work(self, task: Callable[[], None]) -> None:
+        """Run a pool task, letting acquire() wait for it instead of starting a browser alongside."""
+        try:
+            task()
+        finally:
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+
+    def _check_idle(self) -> None:
+        """Drop idle browsers that crashed or have been idle too long."""
+        with self._cond:
+            idle = list(self._ready)
+            self._ready.clear()
+
+        keep = []
+        for driver, since in idle:
+            if self.max_idle_seconds and time.time() - since > self.max_idle_seconds:
+                logger.info("Replacing pooled browser idle for too long")
+            elif not self._healthy(driver):
+                logger.warning("Pooled browser stopped answering, replacing it")
+            else:
+                keep.append((driver, since))
+                continue
+            self._replaced += 1
+            self._quit(driver)
+
+        with self._cond:
+            # Browsers handed out meanwhile were already removed; keep the oldest first
+            self._ready.extendleft(reversed(keep))
+            if self._closed:
+                for driver, _ in self._ready:
+                    self._quit(driver)
+                self._ready.clear()
+
+    def _run(self) -> None:
+        """Background loop: refill while allowed, health-check idle browsers."""
+        last_check = time.monotonic()
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                need = self._refilling and len(self._ready) < self.size
+                self._busy = need
+
+            if need:
+                self._work(self._launch)
+                if self._failures:
+                    # Back off after failed starts instead of hammering a broken setup
+                    with self._cond:
+                        self._cond.wait(timeout=min(30 * 2 ** (self._failures - 1), 600))
+                continue
+
+            if time.monotonic() - last_check >= self.check_interval:
+                with self._cond:
+                    self._busy = True
+                self._work(self._check_idle)
+                last_check = time.monotonic()
+
+            with self._cond:
+                if not self._closed:
+                    self._cond.wait(timeout=self.check_interval)
+
+    def acquire(self) -> "webdriver.Chrome":
+        """
+        Take a ready browser, or start one if none is ready.
+
+        Pauses background starts until refill() is called. A browser the pool
+        thread is starting or health-checking right now is waited for, up to
+        Config.DRIVER_READY_TIMEOUT, rather than starting a second one next
+        to it.
+
+        Returns:
+            Browser owned by the caller, who must quit it
+        """
+        with self._cond:
+            self._refilling = False
+
+        deadline = time.monotonic() + Config.DRIVER_READY_TIMEOUT
+        while True:
+            with self._cond:
+                while self._busy and not self._ready:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        logger.warning("Pool thread still busy with a browser, not waiting for it any longer")
+                        break
+                    self._cond.wait(timeout=remaining)
+                if not self._ready:
+                    break
+                driver, since = self._ready.popleft()
+
+            if self._healthy(driver):
+                self._hits += 1
+                watch_driver(driver)
+                logger.info(f"Using a pre-started browser (idle {time.time() - since:.0f}s)")
+                return driver
+
+            logger.warning("Pooled browser stopped answering, discarding it")
+            self._replaced += 1
+            self._quit(driver)
+
+        self._misses += 1
+        logger.info("No pre-started browser ready, starting one now")
+        return self.factory()
+
+    def refill(self) -> None:
+        """Allow background starts again, e.g. once a check has finished."""
+        with self._cond:
+            self._refilling = True
+            self._cond.notify_all()
+
+    def pause(self) -> None:
+        """Stop background starts and quit idle browsers, e.g. while a kept session makes them unneeded."""
+        with self._cond:
+            self._refilling = False
+            idle = list(self._ready)
+            self._ready.clear()
+
+        for driver, _ in idle:
+            self._quit(driver)
+        if idle:
+            logger.info(f"Driver pool paused, closed {len(idle)} idle browser(s)")
+
+    def metrics(self) -> Dict[str, int]:
+        """Ready browsers and how often checks found one."""
+        with self._cond:
+            return {
+                "pool_ready": len(self._ready),
+                "pool_hits": self._hits,
+                "pool_misses": self._misses,
+                "pool_replaced": self._replaced,
+            }
+
+    def close(self) -> None:
+        """Stop refilling and quit all idle browsers."""
+        with self._cond:
+            self._closed = True
+            idle = list(self._ready)
+            self._ready.clear()
+            self._cond.notify_all()
+
+        for driver, _ in idle:
+            self._quit(driver)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
@@ -0,0 +1,183 @@
+"""
+WebDriver command profiler for the visa scheduler.
+Counts and times every command a driver sends, by command name, calling
+function and step, reports the most expensive ones after each check and can
+enforce per-step command budgets.
+"""
+
+import sys
+import time
+import logging
+import contextvars
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, Iterator, List, Mapping, Optional, Tuple
+from src.config import Config
+from src.logs import current_step
+from src.tracing import count_command
+
+if TYPE_CHECKING:
+    from selenium import webdriver
+
+logger = logging.getLogger("visa_scheduler")
+
+# Thin lookup helpers; their commands are attributed to the function that called them
+_SKIPPED_MODULES = ("src.dom", "src.profiler", "src.tracing")
+
+_profile: contextvars.ContextVar[Optional["CommandProfile"]] = contextvars.ContextVar("command_profile", default=None)
+
+
+class CommandBudgetExceeded(AssertionError):
+    """A step or function sent more WebDriver commands than its budget allows."""
+
+
+def calling_function() -> str:
+    """
+    Name the scheduler function that issued the current WebDriver command.
+
+    Walks up from the command past Selenium, the lookup helpers and lambdas
+    to the first function of this project, e.g. "appointment_checker.check_availability".
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        name = frame.f_code.co_name
+        if (module.startswith("src.") or module in ("main", "__main__")) \
+                and module not in _SKIPPED_MODULES and not name.startswith("<"):
+            return f"{module.rsplit('.', 1)[-1]}.{name}"
+        frame = frame.f_back
+    return "?"
+
+
+class CommandProfile:
+    """Command counts and times of one check."""
+
+    def __init__(self, check_id: str):
+        self.check_id = check_id
+        # (command, caller) -> [count, total seconds, max seconds]
+        self.stats: Dict[Tuple[str, str], List[float]] = {}
+        self.by_step: Dict[str, int] = {}
+        self.by_caller: Dict[str, int] = {}
+        self.commands = 0
+        self.seconds = 0.0
+
+    def record(self, command: str, caller: str, step: Optional[str], seconds: float) -> None:
+        """Add one command."""
+        entry = self.stats.setdefault((command, caller), [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] = max(entry[2], seconds)
+
+        step = step or "-"
+        self.by_step[step] = self.by_step.get(step, 0) + 1
+        self.by_caller[caller] = self.by_caller.get(caller, 0) + 1
+        self.commands += 1
+        self.seconds += seconds
+
+    def top(self, n: int = Config.COMMAND_PROFILE_TOP) -> List[Dict[str, object]]:
+        """The n command/caller pairs with the most total time."""
+        ranked = sorted(self.stats.items(), key=lambda item: item[1][1], reverse=True)[:n]
+        return [
+            {"command": command, "caller": caller, "count": int(count),
+             "seconds": round(total, 3), "max": round(longest, 3)}
+            for (command, caller), (count, total, longest) in ranked
+        ]
+
+    def over_budget(self, budgets: Mapping[str, int]) -> Dict[str, Tuple[int, int]]:
+        """
+        Steps or functions that sent more commands than allowed.
+
+        Args:
+            budgets: Maximum commands per step name (as in timed()) or per
+                calling function ("module.function")
+
+        Returns:
+            Name -> (commands sent, budget) for every exceeded budget
+        """
+        exceeded = {}
+        for name, budget in budgets.items():
+            used = self.by_step.get(name, 0) + self.by_caller.get(name, 0)
+            if used > budget:
+                exceeded[name] = (used, budget)
+        return exceeded
+
+    def assert_budgets(self, budgets: Mapping[str, int]) -> None:
+        """
+        Raise if any budget was exceeded, for use in tests.
+
+        Raises:
+            CommandBudgetExceeded: Listing every exceeded budget
+        """
+        exceeded = self.over_budget(budgets)
+        if exceeded:
+            raise CommandBudgetExceeded(", ".join(
+                f"{name}: {used} commands > {budget}" for name, (used, budget) in sorted(exceeded.items())
+            ))
+
+    def report(self, n: int = Config.COMMAND_PROFILE_TOP) -> str:
+        """Multi-line top-n report."""
+        lines = [f"📡 {self.commands} WebDriver commands, {self.seconds:.1f}s round-trip "
+                 f"({', '.join(f'{step} {count}' for step, count in self.by_step.items())})"]
+        for entry in self.top(n):
+            lines.append(f"   {entry['count']:>5}× {entry['seconds']:>7.2f}s (max {entry['max']:.2f}s)  "
+                         f"{entry['command']} from {entry['caller']}")
+        return "\n".join(lines)
+
+
+@contextmanager
+def profile_check(check_id: str, budgets: Optional[Mapping[str, int]] = None,
+                  strict: bool = False) -> Iterator[CommandProfile]:
+    """
+    Profile the WebDriver commands sent inside the block.
+
+    Args:
+        check_id: ID of the check
+        budgets: Command budgets to check at the end (Config.COMMAND_BUDGETS by default)
+        strict: Raise CommandBudgetExceeded instead of logging a warning
+
+    Yields:
+        The profile being filled in
+    """
+    budgets = Config.COMMAND_BUDGETS if budgets is None else budgets
+    profile = CommandProfile(check_id)
+    token = _profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _profile.reset(token)
+
+        if Config.COMMAND_PROFILE and profile.commands:
+            logger.info(profile.report(), extra={"commands": profile.top(), "commands_by_step": profile.by_step})
+        if not strict:
+            for name, (used, budget) in profile.over_budget(budgets).items():
+                logger.warning(f"'{name}' sent {used} WebDriver commands, over its budget of {budget}")
+
+    if strict:
+        profile.assert_budgets(budgets)
+
+
+def instrument_driver(driver: "webdriver.Chrome") -> None:
+    """
+    Count and time the WebDriver commands a driver sends.
+
+    Element commands go through the driver's execute() as well, so they are
+    included. Commands outside a traced or profiled check cost one lookup.
+    """
+    if getattr(driver, "_commands_hooked", False):
+        return
+
+    execute = driver.execute
+
+    def instrumented_execute(driver_command: str, params: Optional[dict] = None):
+        count_command()
+        profile = _profile.get()
+        if profile is None:
+            return execute(driver_command, params)
+
+        started = time.perf_counter()
+        try:
+            return execute(driver_command, params)
+        finally:
+            profile.record(driver_command, calling_function(), current_step(), time.perf_counter() - started)
+
+    driver.execute = instrumented_execute
+    driver._commands_hooked = True
@@ -0,0 +1,219 @@
+"""
+Browser resource monitoring for the visa scheduler.
+Samples the memory and CPU of the Chrome process tree behind a driver and
+decides when a long-lived browser should be recycled.
+"""
+
+import os
+import time
+import signal
+import logging
+import threading
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional
+from src.config import Config
+
+if TYPE_CHECKING:
+    from selenium import webdriver
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+logger = logging.getLogger("visa_scheduler")
+
+
+def driver_root_pids(driver: "webdriver.Chrome") -> List[int]:
+    """
+    PIDs of the processes a driver started: chromedriver and the browser.
+
+    undetected-chromedriver launches the browser itself, so it is not always
+    a child of chromedriver and both are returned.
+    """
+    pids = []
+    service = getattr(driver, "service", None)
+    process = getattr(service, "process", None)
+    if process is not None and getattr(process, "pid", None):
+        pids.append(process.pid)
+    browser_pid = getattr(driver, "browser_pid", None)
+    if browser_pid and browser_pid not in pids:
+        pids.append(browser_pid)
+    return pids
+
+
+def process_tree(pids: List[int]) -> List["psutil.Process"]:
+    """The given processes and all of their descendants that are still running."""
+    processes = {}
+    for pid in pids:
+        try:
+            root = psutil.Process(pid)
+            for process in [root] + root.children(recursive=True):
+                processes[process.pid] = process
+        except psutil.Error:
+            continue
+    return list(processes.values())
+
+
+def kill_process_tree(pids: List[int]) -> int:
+    """
+    Kill processes and their descendants, children first.
+
+    Args:
+        pids: Root process IDs
+
+    Returns:
+        Number of processes signalled
+    """
+    if not PSUTIL_AVAILABLE:
+        killed = 0
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGKILL if hasattr(signal, "SIGKILL") else signal.SIGTERM)
+                killed += 1
+            except OSError:
+                continue
+        return killed
+
+    processes = process_tree(pids)
+    for process in reversed(processes):
+        try:
+            process.kill()
+        except psutil.Error:
+            pass
+    psutil.wait_procs(processes, timeout=5)
+    return len(processes)
+
+
+class ResourceSample(NamedTuple):
+    """Resource use of one browser's process tree at one moment."""
+
+    rss_bytes: int
+    cpu_percent: float  # Average since the previous sample, 100 = one core
+    processes: int
+    age_seconds: float
+
+
+class BrowserResourceMonitor:
+    """
+    Samples the driver's process tree and flags browsers that should be recycled.
+
+    Without psutil only the browser age is tracked.
+    """
+
+    def __init__(
+        self,
+        max_rss_mb: float = Config.BROWSER_MAX_RSS_MB,
+        max_cpu_percent: float = Config.BROWSER_MAX_CPU_PERCENT,
+        max_age_minutes: float = Config.BROWSER_MAX_AGE_MINUTES,
+    ):
+        """
+        Args:
+            max_rss_mb: Recycle above this resident memory of the whole tree (0 disables)
+            max_cpu_percent: Recycle above this average CPU between samples (0 disables)
+            max_age_minutes: Recycle browsers older than this (0 disables)
+        """
+        self.max_rss_bytes = max_rss_mb * 1024 * 1024
+        self.max_cpu_percent = max_cpu_percent
+        self.max_age_seconds = max_age_minutes * 60
+
+        self._lock = threading.Lock()
+        self._first_seen: Dict[int, float] = {}
+        self._cpu_seen: Dict[int, tuple] = {}  # id(driver) -> (wall time, cpu seconds)
+        self._last: Optional[ResourceSample] = None
+        self._peak_rss = 0
+        self._recycles = 0
+
+        if not PSUTIL_AVAILABLE:
+            logger.info("psutil not installed, browser memory and CPU are not monitored (age only)")
+
+    def sample(self, driver: "webdriver.Chrome") -> ResourceSample:
+        """
+        Measure the resource use of a driver's process tree.
+
+        Args:
+            driver: Selenium WebDriver instance
+
+        Returns:
+            The current sample
+        """
+        now = time.time()
+        key = id(driver)
+        rss = 0
+        cpu_seconds = 0.0
+        processes: List = []
+        created = self._first_seen.setdefault(key, now)
+
+        if PSUTIL_AVAILABLE:
+            processes = process_tree(driver_root_pids(driver))
+            for process in processes:
+                try:
+                    with process.oneshot():
+                        rss += process.memory_info().rss
+                        times = process.cpu_times()
+                        cpu_seconds += times.user + times.system
+                        created = min(created, process.create_time())
+                except psutil.Error:
+                    continue
+
+        with self._lock:
+            previous = self._cpu_seen.get(key)
+            self._cpu_seen[key] = (now, cpu_seconds)
+            cpu_percent = 0.0
+            if previous and now > previous[0]:
+                cpu_percent = max(0.0, (cpu_seconds - previous[1]) / (now - previous[0]) * 100)
+
+            sample = ResourceSample(rss, round(cpu_percent, 1), len(processes), now - created)
+            self._last = sample
+            self._peak_rss = max(self._peak_rss, rss)
+
+        logger.debug(f"Browser uses {rss / 1048576:.0f} MB in {len(processes)} process(es), "
+                     f"{sample.cpu_percent:.0f}% CPU, {sample.age_seconds / 60:.0f} min old")
+        return sample
+
+    def recycle_reason(self, driver: "webdriver.Chrome") -> Optional[str]:
+        """
+        Sample a driver and tell why it should be recycled.
+
+        Args:
+            driver: Selenium WebDriver instance
+
+        Returns:
+            The exceeded limit, or None if the browser can stay
+        """
+        sample = self.sample(driver)
+
+        if self.max_rss_bytes and sample.rss_bytes > self.max_rss_bytes:
+            return f"memory {sample.rss_bytes / 1048576:.0f} MB over {self.max_rss_bytes / 1048576:.0f} MB"
+        if self.max_cpu_percent and sample.cpu_percent > self.max_cpu_percent:
+            return f"CPU {sample.cpu_percent:.0f}% over {self.max_cpu_percent:.0f}%"
+        if self.max_age_seconds and sample.age_seconds > self.max_age_seconds:
+            return f"age {sample.age_seconds / 60:.0f} min over {self.max_age_seconds / 60:.0f} min"
+        return None
+
+    def forget(self, driver: "webdriver.Chrome", recycled: bool = False) -> None:
+        """
+        Drop the state kept for a driver that is being closed.
+
+        Args:
+            driver: Selenium WebDriver instance
+            recycled: Whether it is closed because it exceeded a limit
+        """
+        with self._lock:
+            self._first_seen.pop(id(driver), None)
+            self._cpu_seen.pop(id(driver), None)
+            if recycled:
+                self._recycles += 1
+
+    def metrics(self) -> Dict[str, float]:
+        """Latest browser resource figures and the number of recycles."""
+        with self._lock:
+            last = self._last
+            return {
+                "browser_rss_bytes": last.rss_bytes if last else 0,
+                "browser_rss_peak_bytes": self._peak_rss,
+                "browser_cpu_percent": last.cpu_percent if last else 0.0,
+                "browser_processes": last.processes if last else 0,
+                "browser_age_seconds": round(last.age_seconds, 1) if last else 0.0,
+                "browser_recycles": self._recycles,
+            }
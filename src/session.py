@@ -0,0 +1,241 @@
+"""
+Browser session handling for the visa scheduler.
+Estimates how long getting an authenticated browser takes so it can be
+started ahead of a planned check, and keeps a logged-in browser alive
+between checks.
+"""
+
+import math
+import time
+import logging
+from typing import TYPE_CHECKING, Optional
+from src.config import Config
+from src.history import HistoryStore
+from src.resources import BrowserResourceMonitor
+
+if TYPE_CHECKING:
+    from selenium import webdriver
+
+logger = logging.getLogger("visa_scheduler")
+
+# Steps that make up preparing an authenticated session, as recorded by main.py
+PREPARE_STEPS = ("driver_setup", "authentication")
+
+
+class AuthDurationEstimator:
+    """
+    Exponentially weighted moving mean and deviation of session preparation time.
+
+    The lead time is the mean plus a few deviations plus a fixed margin, so a
+    slower than usual login still finishes before the planned check.
+    """
+
+    def __init__(
+        self,
+        alpha: float = Config.PREWARM_EWMA_ALPHA,
+        initial_seconds: float = Config.PREWARM_INITIAL_SECONDS,
+    ):
+        """
+        Args:
+            alpha: Weight of the newest sample (0-1)
+            initial_seconds: Assumed duration until the first sample arrives
+        """
+        self.alpha = alpha
+        self.mean = initial_seconds
+        self.variance = (initial_seconds / 2) ** 2
+        self.samples = 0
+
+    def update(self, seconds: float) -> None:
+        """Add the measured preparation time of one check."""
+        if self.samples == 0:
+            self.mean = seconds
+            self.variance = (seconds / 4) ** 2
+        else:
+            delta = seconds - self.mean
+            self.mean += self.alpha * delta
+            self.variance = (1 - self.alpha) * (self.variance + self.alpha * delta * delta)
+        self.samples += 1
+
+    @property
+    def deviation(self) -> float:
+        return math.sqrt(self.variance)
+
+    def lead_time(self) -> float:
+        """Seconds before a planned check at which preparing the session should start."""
+        return self.mean + Config.PREWARM_SAFETY_SIGMAS * self.deviation + Config.PREWARM_MARGIN_SECONDS
+
+    def seed_from_history(self, history: HistoryStore, post: str = Config.CONSULAR_POST,
+                          limit: int = 50) -> None:
+        """
+        Replay the preparation times of recent successful checks.
+
+        Args:
+            history: Store the check outcomes are read from
+            post: Consular post whose checks are replayed
+            limit: Maximum number of checks to replay
+        """
+        for check in reversed(history.recent_checks(post, limit)):
+            steps = check["step_durations"]
+            if check["success"] and all(step in steps for step in PREPARE_STEPS):
+                self.update(sum(steps[step] for step in PREPARE_STEPS))
+
+        if self.samples:
+            logger.info(f"Session preparation takes {self.mean:.0f}s ± {self.deviation:.0f}s "
+                        f"over {self.samples} recorded check(s)")
+
+
+def sleep_until(ts: float) -> float:
+    """
+    Sleep until a Unix timestamp.
+
+    Args:
+        ts: Time to wake up at
+
+    Returns:
+        Seconds slept (0 if the time has already passed)
+    """
+    remaining = ts - time.time()
+    if remaining > 0:
+        time.sleep(remaining)
+    return max(remaining, 0.0)
+
+
+# WebDriver's default script timeout, restored after each ping
+_DEFAULT_SCRIPT_TIMEOUT = 30
+
+# Tells client-side idle timers the user is active and touches the server
+# session with a same-origin HEAD request. A redirect (to the login page)
+# means the session is gone.
+_PING_SCRIPT = """
+var done = arguments[arguments.length - 1];
+document.dispatchEvent(new MouseEvent('mousemove', {bubbles: true}));
+fetch(window.location.href, {method: 'HEAD', credentials: 'same-origin', cache: 'no-store', redirect: 'manual'})
+    .then(function (response) { done({status: response.status, type: response.type}); })
+    .catch(function (error) { done({error: String(error)}); });
+"""
+
+
+class KeepaliveSession:
+    """
+    Authenticated browser parked on the calendar page between checks.
+
+    While idle it pings the site every Config.KEEPALIVE_PING_SECONDS so the
+    server session does not expire; a failed ping drops the browser and the
+    next check logs in from scratch. With a resource monitor, a browser that
+    grew too large or too old is recycled the same way, never during a check.
+    """
+
+    def __init__(self, ping_interval: float = Config.KEEPALIVE_PING_SECONDS,
+                 monitor: Optional[BrowserResourceMonitor] = None):
+        """
+        Args:
+            ping_interval: Seconds between activity pings while idle
+            monitor: Decides when the kept browser should be recycled
+        """
+        self.ping_interval = ping_interval
+        self.monitor = monitor
+        self.driver: Optional["webdriver.Chrome"] = None
+        self.pings = 0
+
+    def adopt(self, driver: "webdriver.Chrome") -> None:
+        """Keep an authenticated driver for the following checks."""
+        if self.driver is not None and self.driver is not driver:
+            self.close()
+        self.driver = driver
+
+    def ping(self) -> bool:
+        """
+        Send one activity ping.
+
+        Returns:
+            True if the session is still logged in
+        """
+        if self.driver is None:
+            return False
+
+        try:
+            self.driver.set_script_timeout(Config.KEEPALIVE_PING_TIMEOUT)
+            try:
+                response = self.driver.execute_async_script(_PING_SCRIPT) or {}
+            finally:
+                self.driver.set_script_timeout(_DEFAULT_SCRIPT_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"Keepalive ping failed: {e}")
+            return False
+
+        if response.get("error") or response.get("type") == "opaqueredirect" or response.get("status", 0) >= 400:
+            logger.warning(f"Keepalive ping says the session has expired: {response}")
+            return False
+
+        self.pings += 1
+        logger.debug(f"Keepalive ping ok ({response.get('status')})")
+        return True
+
+    def check_resources(self) -> bool:
+        """
+        Recycle the kept browser if it exceeds the monitor's limits.
+
+        Only call this between checks.
+
+        Returns:
+            True if a browser is still kept
+        """
+        if self.driver is None:
+            return False
+        if self.monitor is None:
+            return True
+
+        reason = self.monitor.recycle_reason(self.driver)
+        if reason:
+            logger.info(f"♻️ Recycling browser: {reason}")
+            self.close(recycled=True)
+            return False
+        return True
+
+    def idle_until(self, ts: float) -> bool:
+        """
+        Keep the session alive until a Unix timestamp.
+
+        Args:
+            ts: Time of the next check
+
+        Returns:
+            True if the session is still usable at that time, False if there
+            is none or it was lost (then the browser has been closed)
+        """
+        if self.driver is None:
+            return False
+
+        while True:
+            remaining = ts - time.time()
+            if remaining <= 0:
+                return True
+            time.sleep(min(self.ping_interval, remaining))
+            if time.time() < ts:
+                if not self.ping():
+                    self.close()
+                    return False
+                if not self.check_resources():
+                    return False
+
+    def discard(self) -> None:
+        """Forget the kept browser without talking to it, e.g. after it was killed."""
+        if self.driver is not None and self.monitor:
+            self.monitor.forget(self.driver)
+        self.driver = None
+
+    def close(self, recycled: bool = False) -> None:
+        """
+        Quit the kept browser, if any.
+
+        Args:
+            recycled: Whether it is closed because it exceeded a resource limit
+        """
+        if self.driver is not None:
+            if self.monitor:
+                self.monitor.forget(self.driver, recycled)
+            try:
+                self.driver.quit()
+            except Exception as e:
+                logger.debug(f"Error closing kept browser: {e}")
+        self.driver = None
@@ -0,0 +1,128 @@
+"""
+Subscriber registry for the visa scheduler.
+Maps (post, month range) subscriptions to the recipients that want the alerts.
+"""
+
+import json
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from src.config import Config
+
+logger = logging.getLogger("visa_scheduler")
+
+# Subscription channels and the notifier that delivers each of them
+CHANNELS: Dict[str, str] = {
+    "telegram": "TelegramNotifier",
+    "email": "EmailNotifier",
+    "webhook": "WebhookNotifier",
+}
+
+
+def _parse_month(value: Optional[str]) -> Optional[Tuple[int, int]]:
+    """Parse "YYYY-MM" into (year, month); None stays open-ended."""
+    if not value:
+        return None
+    year, _, month = str(value).partition("-")
+    return int(year), int(month)
+
+
+@dataclass(frozen=True)
+class Subscription:
+    """One recipient's interest in a set of posts and a range of months."""
+
+    name: str
+    channel: str
+    recipient: str
+    posts: Tuple[str, ...] = ()  # Empty means every post
+    month_from: Optional[Tuple[int, int]] = None  # (year, month), inclusive
+    month_to: Optional[Tuple[int, int]] = None  # (year, month), inclusive
+
+    def matches(self, post: str, year: int, month: int) -> bool:
+        """Check whether availability at a post in a month concerns this subscription."""
+        if self.posts and post.upper() not in self.posts:
+            return False
+        if self.month_from and (year, month) < self.month_from:
+            return False
+        if self.month_to and (year, month) > self.month_to:
+            return False
+        return True
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Subscription":
+        """Build a subscription from one entry of the subscribers file."""
+        channel = str(data["channel"]).lower()
+        if channel not in CHANNELS:
+            raise ValueError(f"Unknown channel '{channel}' (expected one of {', '.join(CHANNELS)})")
+
+        return cls(
+            name=data.get("name") or str(data["recipient"]),
+            channel=channel,
+            recipient=str(data["recipient"]),
+            posts=tuple(post.upper() for post in data.get("posts") or ()),
+            month_from=_parse_month(data.get("from")),
+            month_to=_parse_month(data.get("to")),
+        )
+
+
+class SubscriberRegistry:
+    """
+    Subscriptions loaded from a JSON file, e.g.
+
+        [{"name": "Ayse", "channel": "telegram", "recipient": "123456789",
+          "posts": ["ISTANBUL"], "from": "2025-11", "to": "2026-02"}]
+
+    The recipient is a Telegram chat ID, an email address or a webhook URL,
+    depending on the channel. A missing file means there are no subscribers
+    and only the default recipients of each channel are alerted.
+    """
+
+    def __init__(self, path: str = Config.SUBSCRIBERS_FILE):
+        """
+        Args:
+            path: JSON file listing the subscriptions
+        """
+        self.path = path
+        self.subscriptions: List[Subscription] = self._load()
+
+        if self.subscriptions:
+            logger.info(f"Loaded {len(self.subscriptions)} subscription(s) from {path}")
+
+    def _load(self) -> List[Subscription]:
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return []
+        except Exception as e:
+            logger.error(f"Could not read subscribers file {self.path}: {e}")
+            return []
+
+        subscriptions = []
+        for i, entry in enumerate(entries, 1):
+            try:
+                subscriptions.append(Subscription.from_dict(entry))
+            except (KeyError, ValueError, TypeError) as e:
+                logger.error(f"Skipping subscription #{i} in {self.path}: {e}")
+        return subscriptions
+
+    def recipients(self, post: str, year: int, month: int) -> Dict[str, List[str]]:
+        """
+        Collect the recipients interested in availability at a post in a month.
+
+        Args:
+            post: Consular post
+            year: Year of the month with availability
+            month: Month with availability (1-12)
+
+        Returns:
+            Recipients per notifier class name, without duplicates
+        """
+        targets: Dict[str, List[str]] = {}
+        for subscription in self.subscriptions:
+            if not subscription.matches(post, year, month):
+                continue
+            recipients = targets.setdefault(CHANNELS[subscription.channel], [])
+            if subscription.recipient not in recipients:
+                recipients.append(subscription.recipient)
+        return targets
@@ -0,0 +1,197 @@
+"""
+Step deadline supervision for the visa scheduler.
+Runs a check in a worker thread and kills the browser when a step hangs,
+so a stuck WebDriver call cannot stall the monitoring loop.
+"""
+
+import time
+import logging
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+from src.config import Config
+from src.resources import driver_root_pids, kill_process_tree
+from src.utils import set_step_watcher, get_step_watcher
+
+if TYPE_CHECKING:
+    from selenium import webdriver
+
+logger = logging.getLogger("visa_scheduler")
+
+# Steps during which killing the browser cannot help or would do harm: notifications
+# wait on SMTP/HTTP, and confirming runs after the booking was already submitted
+SPARED_STEPS = ("notification", "booking_confirm")
+
+
+def hung_step() -> Optional[str]:
+    """Name of the step the supervisor gave up on in the current thread, if any."""
+    watcher = get_step_watcher()
+    return watcher.hung_step if isinstance(watcher, StepSupervisor) else None
+
+
+def abandoned() -> bool:
+    """
+    Whether the supervisor gave up on the call running in the current thread.
+
+    An abandoned check may still finish late, while the next check is already
+    running; it must then leave the shared tracker, notifier and history alone.
+    """
+    watcher = get_step_watcher()
+    return isinstance(watcher, StepSupervisor) and watcher.abandoned.is_set()
+
+
+class SupervisedResult(NamedTuple):
+    """Outcome of a supervised call."""
+
+    value: Any  # Return value, None if the call raised or was abandoned
+    hung_step: Optional[str]  # Step that overran its budget, if any
+    completed: bool  # False if the worker had to be abandoned
+    elapsed: float
+
+
+class StepSupervisor:
+    """
+    Enforces per-step and overall deadlines on a call running in a worker.
+
+    Steps are the timed() blocks the call goes through; drivers are reported
+    by setup_driver() or watch_driver(). When a step overruns its budget, or
+    the whole call overruns its deadline, the process tree of every reported
+    driver is killed. The stuck WebDriver command then fails and the call
+    unwinds through its normal error handling. While a spared step (one that
+    does not drive the browser) is running, overruns are only logged; those
+    steps are bounded by their own timeouts.
+    """
+
+    def __init__(self, budgets: Optional[Dict[str, float]] = None,
+                 default_budget: float = Config.STEP_DEFAULT_BUDGET,
+                 spared_steps: Tuple[str, ...] = SPARED_STEPS):
+        """
+        Args:
+            budgets: Maximum seconds per step name
+            default_budget: Maximum seconds for steps without their own budget
+            spared_steps: Steps during which the browser is never killed
+        """
+        self.budgets = Config.STEP_BUDGETS if budgets is None else budgets
+        self.default_budget = default_budget
+        self.spared_steps = spared_steps
+        self.hung_step: Optional[str] = None
+        self.abandoned = threading.Event()
+
+        self._lock = threading.Lock()
+        self._active: List[Tuple[str, float]] = []
+        self._drivers: List["webdriver.Chrome"] = []
+
+    def on_step(self, step: str, started: bool) -> None:
+        """Track entering and leaving a timed() step."""
+        with self._lock:
+            if started:
+                self._active.append((step, time.monotonic()))
+            else:
+                for i in range(len(self._active) - 1, -1, -1):
+                    if self._active[i][0] == step:
+                        del self._active[i]
+                        break
+
+    def on_driver(self, driver: "webdriver.Chrome") -> None:
+        """Remember a driver whose browser may have to be killed."""
+        with self._lock:
+            if driver not in self._drivers:
+                self._drivers.append(driver)
+
+    def budget(self, step: str) -> float:
+        """Maximum seconds allowed for a step."""
+        return self.budgets.get(step, self.default_budget)
+
+    def _overrun(self) -> Optional[Tuple[str, float]]:
+        now = time.monotonic()
+        with self._lock:
+            for step, started in self._active:
+                if now - started > self.budget(step):
+                    return step, now - started
+        return None
+
+    def _spared(self) -> Optional[str]:
+        """The active step that forbids killing the browser, if any."""
+        with self._lock:
+            for step, _ in self._active:
+                if step in self.spared_steps:
+                    return step
+        return None
+
+    def _kill_browsers(self) -> None:
+        with self._lock:
+            drivers = list(self._drivers)
+        pids = [pid for driver in drivers for pid in driver_root_pids(driver)]
+        if pids:
+            killed = kill_process_tree(pids)
+            logger.warning(f"Killed {killed} browser process(es)")
+
+    def run(self, fn: Callable[..., Any], *args, deadline: float = Config.CHECK_DEADLINE,
+            grace: float = Config.STEP_KILL_GRACE_SECONDS, **kwargs) -> SupervisedResult:
+        """
+        Run a call in a worker thread under the step budgets.
+
+        Args:
+            fn: Function to call
+            *args: Positional arguments for fn
+            deadline: Maximum seconds for the whole call
+            grace: Seconds to wait for the worker after killing the browser
+            **kwargs: Keyword arguments for fn
+
+        Returns:
+            The call's return value and whether a step hung
+        """
+        outcome: Dict[str, Any] = {}
+        started = time.monotonic()
+
+        def worker() -> None:
+            set_step_watcher(self)
+            try:
+                outcome["value"] = fn(*args, **kwargs)
+            except BaseException as e:
+                outcome["error"] = e
+            finally:
+                set_step_watcher(None)
+
+        thread = threading.Thread(target=worker, name="supervised-check", daemon=True)
+        thread.start()
+
+        killed_at = None
+        warned: set = set()
+        while thread.is_alive():
+            thread.join(timeout=1.0)
+            if not thread.is_alive():
+                break
+
+            if killed_at is None:
+                overrun = self._overrun()
+                if overrun is None and time.monotonic() - started > deadline:
+                    with self._lock:
+                        step = self._active[-1][0] if self._active else "check"
+                    overrun = (step, time.monotonic() - started)
+
+                spared = self._spared() if overrun else None
+                if spared:
+                    if spared not in warned:
+                        warned.add(spared)
+                        logger.warning(f"⏱ Step '{overrun[0]}' over budget during '{spared}', "
+                                       f"which does not drive the browser; letting it finish")
+                elif overrun:
+                    step, elapsed = overrun
+                    self.hung_step = step
+                    logger.error(f"⏱ Step '{step}' hung for {elapsed:.0f}s "
+                                 f"(budget {self.budget(step):.0f}s), killing the browser")
+                    self._kill_browsers()
+                    killed_at = time.monotonic()
+
+            elif time.monotonic() - killed_at > grace:
+                logger.error(f"Worker still stuck in '{self.hung_step}' {grace:.0f}s after the browser "
+                             f"was killed, abandoning it")
+                self.abandoned.set()
+                return SupervisedResult(None, self.hung_step, False, time.monotonic() - started)
+
+        if "error" in outcome:
+            if isinstance(outcome["error"], KeyboardInterrupt):
+                raise outcome["error"]
+            logger.error(f"Supervised call failed: {outcome['error']}", exc_info=outcome["error"])
+
+        return SupervisedResult(outcome.get("value"), self.hung_step, True, time.monotonic() - started)
@@ -0,0 +1,184 @@
+"""
+Per-check tracing for the visa scheduler.
+Records nested spans with their wall time and WebDriver command count, and
+emits them as one JSON log record per check, optionally also as a Chrome
+trace file (chrome://tracing or https://ui.perfetto.dev).
+"""
+
+import os
+import json
+import time
+import logging
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from src.config import Config
+
+logger = logging.getLogger("visa_scheduler")
+
+_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("trace", default=None)
+_stack: contextvars.ContextVar[Tuple["Span", ...]] = contextvars.ContextVar("span_stack", default=())
+
+
+@dataclass
+class Span:
+    """One timed piece of a check."""
+
+    name: str
+    start: float  # Seconds since the start of the trace
+    thread: int
+    duration: float = 0.0
+    commands: int = 0  # WebDriver commands sent inside the span, children included
+    children: List["Span"] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        entry: Dict[str, Any] = {
+            "name": self.name,
+            "start": round(self.start, 3),
+            "duration": round(self.duration, 3),
+            "commands": self.commands,
+        }
+        if self.children:
+            entry["children"] = [child.to_dict() for child in self.children]
+        return entry
+
+
+class Trace:
+    """The spans of one check."""
+
+    def __init__(self, check_id: str):
+        self.check_id = check_id
+        self.started_at = time.time()
+        self.duration = 0.0
+        self.commands = 0
+        self.spans: List[Span] = []
+        self._t0 = time.perf_counter()
+
+    def elapsed(self) -> float:
+        """Seconds since the trace started."""
+        return time.perf_counter() - self._t0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "check_id": self.check_id,
+            "ts": self.started_at,
+            "duration": round(self.duration, 3),
+            "commands": self.commands,
+            "spans": [span.to_dict() for span in self.spans],
+        }
+
+    def chrome_events(self) -> List[Dict[str, Any]]:
+        """The spans as Chrome trace "complete" events (microseconds)."""
+        events = []
+        pending = list(self.spans)
+        while pending:
+            span = pending.pop()
+            events.append({
+                "name": span.name,
+                "cat": "check",
+                "ph": "X",
+                "ts": int((self.started_at + span.start) * 1e6),
+                "dur": int(span.duration * 1e6),
+                "pid": os.getpid(),
+                "tid": span.thread,
+                "args": {"commands": span.commands, "check_id": self.check_id},
+            })
+            pending.extend(span.children)
+        return sorted(events, key=lambda event: event["ts"])
+
+    def summary(self) -> str:
+        """Top-level spans as "name seconds/commands" for the console."""
+        return ", ".join(f"{span.name} {span.duration:.1f}s/{span.commands}" for span in self.spans)
+
+
+@contextmanager
+def span(name: str) -> Iterator[Optional[Span]]:
+    """
+    Time a block as a span of the current check's trace.
+
+    Does nothing outside a traced check.
+
+    Args:
+        name: Span name, e.g. "cloudflare" or "captcha.ocr"
+    """
+    trace = _trace.get()
+    if trace is None:
+        yield None
+        return
+
+    stack = _stack.get()
+    current = Span(name, trace.elapsed(), threading.get_ident())
+    (stack[-1].children if stack else trace.spans).append(current)
+
+    token = _stack.set(stack + (current,))
+    try:
+        yield current
+    finally:
+        current.duration = trace.elapsed() - current.start
+        _stack.reset(token)
+
+
+def traced(name: str) -> Callable:
+    """Decorator that runs every call of a function in a span."""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _write_chrome_trace(trace: Trace) -> None:
+    os.makedirs(Config.TRACE_CHROME_DIR, exist_ok=True)
+    path = os.path.join(Config.TRACE_CHROME_DIR, f"trace_{trace.check_id}.json")
+    with open(path, "w") as f:
+        json.dump({"traceEvents": trace.chrome_events(), "displayTimeUnit": "ms"}, f)
+
+
+@contextmanager
+def trace_check(check_id: str) -> Iterator[Optional[Trace]]:
+    """
+    Trace one check and emit its spans when it ends.
+
+    Args:
+        check_id: ID of the check, also used to name the Chrome trace file
+    """
+    if not Config.TRACING:
+        yield None
+        return
+
+    trace = Trace(check_id)
+    trace_token = _trace.set(trace)
+    stack_token = _stack.set(())
+    try:
+        yield trace
+    finally:
+        trace.duration = trace.elapsed()
+        _stack.reset(stack_token)
+        _trace.reset(trace_token)
+
+        logger.info(f"🧭 Trace: {trace.summary()}", extra={"trace": trace.to_dict()})
+        if Config.TRACE_CHROME_DIR:
+            try:
+                _write_chrome_trace(trace)
+            except OSError as e:
+                logger.warning(f"Could not write Chrome trace: {e}")
+
+
+def count_command() -> None:
+    """
+    Count one WebDriver command against the current trace and open spans.
+
+    Called for every command of drivers set up by src.profiler.instrument_driver().
+    """
+    trace = _trace.get()
+    if trace is None:
+        return
+    trace.commands += 1
+    for open_span in _stack.get():
+        open_span.commands += 1
+
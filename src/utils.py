@@ -3,78 +3,88 @@ Utility functions for the visa scheduler.
 """
 
 import os
+import time
 import logging
 import random
+import threading
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Optional
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
-import undetected_chromedriver as uc
+from typing import TYPE_CHECKING, Any, Dict, Iterator, Optional
 from src.config import Config
+from src.logs import log_context, setup_logging
+from src.tracing import span
+from src.profiler import instrument_driver
+from src.metrics import observe_step
+
+if TYPE_CHECKING:
+    from selenium import webdriver
+
+# Per-thread observer of steps and drivers, set by src.supervisor for supervised checks
+_watch = threading.local()
+
+
+def set_step_watcher(watcher) -> None:
+    """
+    Install an observer for the current thread.
+
+    The watcher's on_step(step, started) is called around every timed() step
+    and on_driver(driver) for every driver the thread works with.
+    """
+    _watch.watcher = watcher
+
+
+def get_step_watcher():
+    """Return the observer of the current thread, if any."""
+    return getattr(_watch, "watcher", None)
+
+
+def watch_driver(driver: "webdriver.Chrome") -> None:
+    """Tell the current thread's watcher which browser it is driving."""
+    watcher = get_step_watcher()
+    if watcher:
+        watcher.on_driver(driver)
 
 
 def setup_logger(name: str = "visa_scheduler") -> logging.Logger:
     """
     Set up logging configuration.
     
+    Records are queued to a background thread that writes the console and the
+    rotating log file (JSON lines by default, see src.logs).
+    
     Args:
         name: Logger name
         
     Returns:
         Configured logger instance
     """
-    # Create logs directory if it doesn't exist
-    os.makedirs(Config.LOG_DIR, exist_ok=True)
-    
-    # Create logger
-    logger = logging.getLogger(name)
-    logger.setLevel(getattr(logging, Config.LOG_LEVEL))
-    
-    # Avoid duplicate handlers
-    if logger.handlers:
-        return logger
-    
-    # File handler
-    log_file = os.path.join(
-        Config.LOG_DIR,
-        f"visa_scheduler_{datetime.now().strftime('%Y%m%d')}.log"
-    )
-    file_handler = logging.FileHandler(log_file)
-    file_handler.setLevel(logging.DEBUG)
-    
-    # Console handler
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
-    
-    # Formatter
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    file_handler.setFormatter(formatter)
-    console_handler.setFormatter(formatter)
-    
-    # Add handlers
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
-    
-    return logger
+    return setup_logging(name)
 
 
-def setup_driver() -> webdriver.Chrome:
+def setup_driver() -> "webdriver.Chrome":
     """
     Set up and configure Chrome WebDriver using undetected-chromedriver.
     This bypasses Cloudflare and other bot detection systems.
 
+    The installed Chrome version is detected once and the patched
+    chromedriver for it is cached, so only the first start (cold) downloads
+    and patches a driver; later starts (warm) reuse the cached binary.
+
     Returns:
         Configured Chrome WebDriver instance
     """
-    import time
+    # Browser libraries are heavy to import, load them only when a browser is started
+    import undetected_chromedriver as uc
+    from src.chrome import (
+        detect_chrome_version, cached_driver_path, store_patched_driver,
+        discard_cached_driver, wait_until_ready, record_startup,
+    )
 
-    max_retries = 2
+    max_retries = Config.DRIVER_START_RETRIES
     for attempt in range(max_retries):
+        started = time.perf_counter()
+        driver = None
+        warm = False
         try:
             logging.info(f"Setting up undetected Chrome WebDriver (attempt {attempt + 1}/{max_retries})...")
 
@@ -92,29 +102,33 @@ def setup_driver() -> webdriver.Chrome:
             options.add_argument("--start-maximized")
             options.add_argument("--disable-blink-features=AutomationControlled")
 
+            # Reuse the patched driver cached for the installed Chrome version
+            version = detect_chrome_version()
+            cached_path = cached_driver_path(version) if version else None
+            warm = bool(cached_path and os.path.exists(cached_path))
+
             # Create undetected Chrome driver
-            # Specify version_main=141 to match your Chrome browser version
             driver = uc.Chrome(
                 options=options,
                 use_subprocess=False,  # Prevent premature closure
-                version_main=141,  # Match your Chrome version 141.x
-                driver_executable_path=None,  # Let it auto-download
+                version_main=version,
+                driver_executable_path=cached_path if warm else None,  # Auto-download when not cached
             )
+            watch_driver(driver)
+            instrument_driver(driver)
 
-            # Give the browser time to fully initialize
-            time.sleep(3)
+            if cached_path and not warm:
+                store_patched_driver(driver, cached_path)
 
-            # Verify the browser is actually open
-            try:
-                _ = driver.current_url
-                logging.info("✓ Browser window verified as open")
-            except Exception as e:
-                raise Exception(f"Browser window closed immediately: {e}")
+            # Wait for the browser to answer instead of a fixed sleep
+            wait_until_ready(driver)
+            logging.info("✓ Browser window verified as open")
 
             # Set timeouts
             driver.implicitly_wait(Config.IMPLICIT_WAIT)
             driver.set_page_load_timeout(Config.PAGE_LOAD_TIMEOUT)
 
+            record_startup(warm, time.perf_counter() - started)
             logging.info("✓ Undetected Chrome WebDriver initialized successfully")
             return driver
 
@@ -122,9 +136,20 @@ def setup_driver() -> webdriver.Chrome:
             error_msg = str(e)
             logging.error(f"Attempt {attempt + 1} failed: {error_msg}")
 
+            if driver is not None:
+                try:
+                    driver.quit()
+                except Exception:
+                    pass
+
+            # A cached binary that cannot start is replaced by a fresh download next time
+            if warm:
+                discard_cached_driver(cached_path)
+
             if attempt < max_retries - 1:
-                logging.info(f"Retrying in 3 seconds...")
-                time.sleep(3)
+                delay = 2 ** attempt
+                logging.info(f"Retrying in {delay} seconds...")
+                time.sleep(delay)
             else:
                 # Last attempt failed
                 logging.error("All attempts to initialize Chrome failed")
@@ -137,7 +162,7 @@ def setup_driver() -> webdriver.Chrome:
                 raise Exception(f"Failed to initialize ChromeDriver after {max_retries} attempts: {error_msg}")
 
 
-def save_screenshot(driver: webdriver.Chrome, name: str) -> Optional[str]:
+def save_screenshot(driver: "webdriver.Chrome", name: str) -> Optional[str]:
     """
     Save a screenshot of the current page.
     
@@ -187,3 +212,30 @@ def format_date(month: int, year: int) -> str:
         Formatted date string
     """
     return f"{datetime(year, month, 1).strftime('%B')} {year}"
+
+
+@contextmanager
+def timed(timings: Dict[str, float], step: str, **fields: Any) -> Iterator[None]:
+    """
+    Record the wall time of a step in seconds.
+
+    Args:
+        timings: Dictionary the duration is stored in, keyed by step
+        step: Step name
+        **fields: Extra fields for the duration log record, e.g. the day loaded
+    """
+    watcher = get_step_watcher()
+    if watcher:
+        watcher.on_step(step, True)
+
+    started = time.perf_counter()
+    try:
+        with log_context(step=step), span(step):
+            yield
+    finally:
+        timings[step] = round(time.perf_counter() - started, 3)
+        observe_step(step, timings[step])
+        logging.getLogger("visa_scheduler").info(f"⏱ {step}: {timings[step]:.3f}s",
+                                                 extra={**fields, "step": step, "duration": timings[step]})
+        if watcher:
+            watcher.on_step(step, False)
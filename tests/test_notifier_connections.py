@@ -0,0 +1,254 @@
+"""
+Connection handling of the notifiers against local stand-in servers:
+keep-alive reuse, reconnects after a dropped connection and SMTP host fallback.
+"""
+
+import json
+import socket
+import threading
+import socketserver
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.config import Config
+from src.notifier import EmailNotifier, KeepAliveSession, WebhookNotifier
+
+
+class _HTTPHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep connections open between requests
+
+    def do_POST(self):
+        server = self.server
+        server.bodies.append(json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or "null"))
+        server.requests.append((self.client_address[1], dict(self.headers)))
+
+        if server.drop_next:
+            # Hang up without answering, like a server that closed an idle connection
+            server.drop_next = False
+            self.close_connection = True
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line: str) -> None:
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        if server.refuse:
+            self._reply("554 no service")
+            return
+        self._reply("220 stub ESMTP")
+
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            verb = line.decode().strip().split(" ", 1)[0].upper()
+
+            if verb == "EHLO":
+                self._reply("250-stub")
+                self._reply("250 AUTH PLAIN LOGIN")
+            elif verb == "AUTH":
+                self._reply("235 accepted")
+            elif verb in ("HELO", "MAIL", "RCPT", "RSET", "NOOP"):
+                self._reply("250 ok")
+            elif verb == "DATA":
+                self._reply("354 go ahead")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                server.messages += 1
+                self._reply("250 queued")
+                if server.drop_after_message:
+                    return
+            elif verb == "QUIT":
+                self._reply("221 bye")
+                return
+            else:
+                self._reply("500 unknown")
+
+
+class _SMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, refuse: bool = False, drop_after_message: bool = False):
+        super().__init__(("127.0.0.1", 0), _SMTPHandler)
+        self.refuse = refuse
+        self.drop_after_message = drop_after_message
+        self.connections = 0
+        self.messages = 0
+
+    @property
+    def host(self) -> str:
+        return f"127.0.0.1:{self.server_address[1]}"
+
+
+def _serve(server):
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _closed_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def http_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _HTTPHandler)
+    server.daemon_threads = True
+    server.requests = []
+    server.bodies = []
+    server.drop_next = False
+    _serve(server)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def smtp_config(monkeypatch):
+    monkeypatch.setattr(Config, "EMAIL_ADDRESS", "scheduler@example.com")
+    monkeypatch.setattr(Config, "EMAIL_PASSWORD", "secret")
+    monkeypatch.setattr(Config, "SMTP_STARTTLS", False)
+    monkeypatch.setattr(Config, "EMAIL_RATE_PER_SECOND", 100.0)
+    monkeypatch.setattr(Config, "NOTIFY_CHANNEL_TIMEOUT", 2.0)
+
+
+@contextmanager
+def _smtp_servers(*servers):
+    started = [_serve(server) for server in servers]
+    try:
+        yield started
+    finally:
+        for server in started:
+            server.shutdown()
+            server.server_close()
+
+
+def test_keepalive_session_reuses_connection(http_server):
+    url = f"http://127.0.0.1:{http_server.server_address[1]}/hook"
+    session = KeepAliveSession("Test")
+    try:
+        assert session.post(url, data=b"1").status_code == 200
+        assert session.post(url, data=b"2").status_code == 200
+    finally:
+        session.close()
+
+    ports = [port for port, _ in http_server.requests]
+    assert len(ports) == 2
+    assert ports[0] == ports[1]
+
+
+def test_keepalive_session_reconnects_after_drop(http_server):
+    url = f"http://127.0.0.1:{http_server.server_address[1]}/hook"
+    session = KeepAliveSession("Test")
+    try:
+        assert session.post(url, data=b"1").status_code == 200
+        http_server.drop_next = True
+        assert session.post(url, data=b"2").status_code == 200
+    finally:
+        session.close()
+
+    ports = [port for port, _ in http_server.requests]
+    assert len(ports) == 3
+    assert ports[2] != ports[0]
+
+
+def test_webhook_notifier_reuses_connection_and_signs(http_server, monkeypatch):
+    url = f"http://127.0.0.1:{http_server.server_address[1]}/hook"
+    monkeypatch.setattr(Config, "WEBHOOK_URLS", [url])
+    monkeypatch.setattr(Config, "WEBHOOK_SECRET", "s3cret")
+    monkeypatch.setattr(Config, "WEBHOOK_COALESCE_SECONDS", 0.0)
+
+    notifier = WebhookNotifier()
+    try:
+        assert notifier.send("first")
+        assert notifier.send("second")
+    finally:
+        notifier.close()
+
+    assert len({port for port, _ in http_server.requests}) == 1
+    assert all("X-Visa-Scheduler-Signature" in headers for _, headers in http_server.requests)
+    assert notifier.metrics()["requests"] == 2
+
+
+def test_email_reuses_smtp_session(smtp_config, monkeypatch):
+    with _smtp_servers(_SMTPServer()) as [server]:
+        monkeypatch.setattr(Config, "SMTP_HOSTS", [server.host])
+        notifier = EmailNotifier()
+        try:
+            assert notifier.send("first")
+            assert notifier.send("second")
+        finally:
+            notifier.close()
+
+        assert server.messages == 2
+        assert server.connections == 1
+
+
+def test_email_reconnects_after_server_hangs_up(smtp_config, monkeypatch):
+    with _smtp_servers(_SMTPServer(drop_after_message=True)) as [server]:
+        monkeypatch.setattr(Config, "SMTP_HOSTS", [server.host])
+        notifier = EmailNotifier()
+        try:
+            assert notifier.send("first")
+            assert notifier.send("second")
+        finally:
+            notifier.close()
+
+        assert server.messages == 2
+        assert server.connections == 2
+
+
+def test_email_falls_back_to_next_host(smtp_config, monkeypatch):
+    with _smtp_servers(_SMTPServer()) as [server]:
+        monkeypatch.setattr(Config, "SMTP_HOSTS", [f"127.0.0.1:{_closed_port()}", server.host])
+        notifier = EmailNotifier()
+        try:
+            assert notifier.send("alert")
+        finally:
+            notifier.close()
+
+        assert server.messages == 1
+
+
+def test_email_tries_each_host_once_when_all_are_down(smtp_config, monkeypatch):
+    with _smtp_servers(_SMTPServer(refuse=True), _SMTPServer(refuse=True)) as [first, second]:
+        monkeypatch.setattr(Config, "SMTP_HOSTS", [first.host, second.host])
+        notifier = EmailNotifier()
+        try:
+            assert notifier.send_batch("alert", None, ["a@example.com"]) == ["a@example.com"]
+        finally:
+            notifier.close()
+
+        assert first.connections == 1
+        assert second.connections == 1
+
+
+def test_webhook_event_id_is_the_alert_key(http_server, monkeypatch):
+    url = f"http://127.0.0.1:{http_server.server_address[1]}/hook"
+    monkeypatch.setattr(Config, "WEBHOOK_URLS", [])
+    monkeypatch.setattr(Config, "WEBHOOK_COALESCE_SECONDS", 0.0)
+
+    notifier = WebhookNotifier()
+    try:
+        assert notifier.enabled
+        assert notifier.send_batch("alert", None, [url], key="changed:ISTANBUL:2025-12:abc") == []
+    finally:
+        notifier.close()
+
+    assert http_server.bodies[-1]["events"][0]["id"] == "changed:ISTANBUL:2025-12:abc"